@@ -0,0 +1,210 @@
+"""
+Agregados diarios de analytics (tablas 'analytics_diarios' y
+'analytics_diarios_categorias').
+Cada día UTC completo se pliega una sola vez en una fila con sus totales; el
+dashboard suma esas filas y solo consulta las tablas crudas para el día en
+curso, así su costo no crece con el historial. Las consultas por día son
+rangos sobre las columnas 'fecha' indexadas.
+
+El plegado no corre en las peticiones: lo hacen la API al arrancar y cada
+AGREGADOS_INTERVALO segundos (iniciar_plegado_periodico), POST
+/analytics/rollup o este script. Mientras tanto el dashboard lee en crudo
+los días todavía sin plegar.
+
+Uso manual (por ejemplo desde cron):
+    python agregados_diarios.py [--desde AAAA-MM-DD]
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from sqlalchemy import delete, func, select, union
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import AnalyticsDiario, AnalyticsDiarioCategoria, Pregunta, ResultadoQuiz, Sesion
+
+UN_DIA = timedelta(days=1)
+# Un día se considera cerrado si se plegó después de este margen (filas que
+# llegan tarde desde la cola de escritura diferida de preguntas).
+MARGEN_CIERRE = timedelta(minutes=10)
+
+
+def inicio_dia(momento: datetime) -> datetime:
+    return datetime(momento.year, momento.month, momento.day)
+
+
+def _primer_dia_con_datos(db: Session) -> Optional[datetime]:
+    minimos = db.execute(select(
+        select(func.min(Pregunta.fecha)).scalar_subquery(),
+        select(func.min(ResultadoQuiz.fecha)).scalar_subquery(),
+        select(func.min(Sesion.fecha_inicio)).scalar_subquery()
+    )).one()
+    minimos = [m for m in minimos if m is not None]
+    return inicio_dia(min(minimos)) if minimos else None
+
+
+def totales_dia(db: Session, desde: datetime, hasta: datetime) -> Dict[str, Any]:
+    """Totales crudos de un rango [desde, hasta) leídos con consultas por rango de fecha."""
+    en_preguntas = (Pregunta.fecha >= desde, Pregunta.fecha < hasta)
+    en_quiz = (ResultadoQuiz.fecha >= desde, ResultadoQuiz.fecha < hasta)
+    en_sesiones = (Sesion.fecha_inicio >= desde, Sesion.fecha_inicio < hasta)
+
+    activos = union(
+        select(Pregunta.estudiante_id).where(*en_preguntas, Pregunta.estudiante_id.isnot(None)),
+        select(ResultadoQuiz.estudiante_id).where(*en_quiz, ResultadoQuiz.estudiante_id.isnot(None)),
+        select(Sesion.estudiante_id).where(*en_sesiones, Sesion.estudiante_id.isnot(None))
+    ).subquery()
+
+    fila = db.execute(select(
+        select(func.count(Pregunta.id)).where(*en_preguntas).scalar_subquery(),
+        select(func.count(ResultadoQuiz.id)).where(*en_quiz, ResultadoQuiz.puntaje.isnot(None)).scalar_subquery(),
+        select(func.avg(ResultadoQuiz.puntaje)).where(*en_quiz).scalar_subquery(),
+        select(func.count(Sesion.id)).where(*en_sesiones).scalar_subquery(),
+        select(func.count()).select_from(activos).scalar_subquery()
+    )).one()
+
+    categorias = db.execute(
+        select(Pregunta.categoria, func.count(Pregunta.id))
+        .where(*en_preguntas, Pregunta.categoria.isnot(None))
+        .group_by(Pregunta.categoria)
+    ).all()
+
+    return {
+        "total_preguntas": fila[0],
+        "total_quiz": fila[1],
+        "promedio_quiz": float(fila[2] or 0),
+        "total_sesiones": fila[3],
+        "estudiantes_activos": fila[4],
+        "categorias": {cat: total for cat, total in categorias}
+    }
+
+
+def plegar_dia(db: Session, dia: datetime) -> AnalyticsDiario:
+    """Recalcula y guarda (insert o update) la fila de un día UTC y sus categorías."""
+    fin = dia + UN_DIA
+    totales = totales_dia(db, dia, fin)
+    pregunta_top = db.execute(
+        select(Pregunta.pregunta)
+        .where(Pregunta.fecha >= dia, Pregunta.fecha < fin)
+        .group_by(Pregunta.pregunta)
+        .order_by(func.count(Pregunta.id).desc())
+        .limit(1)
+    ).scalar()
+    categorias = totales["categorias"]
+
+    fila = db.execute(select(AnalyticsDiario).where(AnalyticsDiario.fecha == dia)).scalar_one_or_none()
+    if fila is None:
+        fila = AnalyticsDiario(fecha=dia)
+        db.add(fila)
+    fila.total_estudiantes_activos = totales["estudiantes_activos"]
+    fila.total_preguntas = totales["total_preguntas"]
+    fila.total_quiz = totales["total_quiz"]
+    fila.total_sesiones = totales["total_sesiones"]
+    fila.promedio_puntaje_quiz = totales["promedio_quiz"]
+    fila.categoria_mas_consultada = max(categorias, key=categorias.get) if categorias else None
+    fila.pregunta_mas_frecuente = pregunta_top
+    fila.fecha_calculo = datetime.utcnow()
+
+    db.execute(delete(AnalyticsDiarioCategoria).where(AnalyticsDiarioCategoria.fecha == dia))
+    db.add_all([AnalyticsDiarioCategoria(fecha=dia, categoria=cat, total=total) for cat, total in categorias.items()])
+    return fila
+
+
+def dia_pendiente(db: Session) -> Optional[datetime]:
+    """Primer día cuyo agregado falta o se plegó antes de cerrar (None si no hay datos). Solo lee."""
+    ultima = db.execute(
+        select(AnalyticsDiario.fecha, AnalyticsDiario.fecha_calculo)
+        .order_by(AnalyticsDiario.fecha.desc()).limit(1)
+    ).first()
+    if ultima is None:
+        return _primer_dia_con_datos(db)
+    if ultima.fecha_calculo is None or ultima.fecha_calculo < ultima.fecha + UN_DIA + MARGEN_CIERRE:
+        return ultima.fecha
+    return ultima.fecha + UN_DIA
+
+
+def actualizar_agregados(db: Session, desde: Optional[datetime] = None) -> int:
+    """Pliega los días completos pendientes desde la última marca hasta ayer.
+    Si el último día se plegó antes de cerrar (más el margen) se vuelve a plegar.
+    Con 'desde' se recalcula a partir de ese día. Devuelve la cantidad de días plegados.
+    """
+    hoy = inicio_dia(datetime.utcnow())
+    desde = dia_pendiente(db) if desde is None else inicio_dia(desde)
+    if desde is None:
+        return 0
+
+    plegados = 0
+    dia = desde
+    while dia < hoy:
+        try:
+            plegar_dia(db, dia)
+            db.commit()
+            plegados += 1
+        except IntegrityError:
+            # Otro worker plegó el mismo día al mismo tiempo
+            db.rollback()
+        dia += UN_DIA
+    if plegados:
+        print(f"📊 Agregados diarios actualizados: {plegados} días")
+    return plegados
+
+
+def replegar_dias(db: Session, dias: Iterable[datetime]) -> int:
+    """Vuelve a plegar solo los días dados que ya estaban plegados (filas cargadas con fecha pasada).
+    Los días desde dia_pendiente en adelante los pliega el job normal; plegarlos aquí movería la
+    marca y dejaría sin plegar los días intermedios.
+    """
+    limite = dia_pendiente(db) or inicio_dia(datetime.utcnow())
+    plegados = 0
+    for dia in sorted({inicio_dia(d) for d in dias}):
+        if dia >= limite:
+            continue
+        try:
+            plegar_dia(db, dia)
+            db.commit()
+            plegados += 1
+        except IntegrityError:
+            db.rollback()
+    return plegados
+
+
+def iniciar_plegado_periodico(session_factory: Callable[[], Session], intervalo: float) -> threading.Event:
+    """Hilo que pliega los días pendientes al arrancar y luego cada 'intervalo' segundos.
+    Devuelve el Event que lo detiene.
+    """
+    detener = threading.Event()
+
+    def bucle():
+        while True:
+            db = session_factory()
+            try:
+                actualizar_agregados(db)
+            except Exception as e:
+                print(f"⚠️ No se pudieron actualizar los agregados diarios: {e}")
+            finally:
+                db.close()
+            if detener.wait(intervalo):
+                return
+
+    threading.Thread(target=bucle, name="agregados-diarios", daemon=True).start()
+    return detener
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database_config import SessionLocal, engine
+    from models import crear_tablas_e_indices
+
+    parser = argparse.ArgumentParser(description="Pliega los días completos en analytics_diarios")
+    parser.add_argument("--desde", help="Recalcular desde esta fecha (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    crear_tablas_e_indices(engine)
+    db = SessionLocal()
+    try:
+        actualizar_agregados(db, datetime.strptime(args.desde, "%Y-%m-%d") if args.desde else None)
+    finally:
+        db.close()
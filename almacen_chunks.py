@@ -0,0 +1,175 @@
+"""
+Metadatos de los chunks del índice (texto, archivo y página) en SQLite.
+Reemplaza a textos.json: en vez de cargar todos los textos como dicts al
+iniciar, AlmacenChunks se comporta como la lista de metadatos (len, [i],
+iteración, append/extend y huecos en None) pero lee de disco solo las filas
+que se piden, es decir, los top-k de cada búsqueda. La posición sigue siendo
+el id FAISS.
+
+Cada versión del índice tiene su propio archivo de metadatos: una vez
+publicado no se modifica (otros workers lo leen junto a su índice mapeado).
+Los cambios se hacen sobre una copia (copiar()) y quedan en una transacción
+abierta hasta confirmar(), que se llama al guardar el índice.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional
+from urllib.request import pathname2url
+
+
+class AlmacenChunks:
+    """Secuencia de metadatos por id FAISS, respaldada por una tabla SQLite.
+    Con crear=False el archivo tiene que existir (una versión publicada que otro proceso
+    pudo haber borrado no se recrea vacía).
+    """
+
+    def __init__(self, ruta: str, crear: bool = True):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        if crear:
+            self._conn = sqlite3.connect(ruta, timeout=30.0, check_same_thread=False)
+        else:
+            uri = f"file:{pathname2url(os.path.abspath(ruta))}?mode=rw"
+            self._conn = sqlite3.connect(uri, uri=True, timeout=30.0, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY, texto TEXT NOT NULL, archivo TEXT, pagina
+            );
+            CREATE TABLE IF NOT EXISTS propiedades (
+                clave TEXT PRIMARY KEY, valor INTEGER NOT NULL
+            );
+            """
+        )
+        fila = self._conn.execute("SELECT valor FROM propiedades WHERE clave = 'longitud'").fetchone()
+        self._longitud = fila[0] if fila else 0
+
+    def __len__(self) -> int:
+        return self._longitud
+
+    def __bool__(self) -> bool:
+        return self._longitud > 0
+
+    def _posicion(self, i: int) -> int:
+        if i < 0:
+            i += self._longitud
+        if not 0 <= i < self._longitud:
+            raise IndexError("índice de chunk fuera de rango")
+        return i
+
+    def __getitem__(self, i: int) -> Optional[Dict[str, Any]]:
+        i = self._posicion(i)
+        with self._lock:
+            fila = self._conn.execute("SELECT texto, archivo, pagina FROM chunks WHERE id = ?", (i,)).fetchone()
+        if fila is None:
+            return None
+        return {"texto": fila[0], "archivo": fila[1], "pagina": fila[2]}
+
+    def __setitem__(self, i: int, md: Optional[Dict[str, Any]]) -> None:
+        i = self._posicion(i)
+        with self._lock:
+            if md is None:
+                self._conn.execute("DELETE FROM chunks WHERE id = ?", (i,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chunks (id, texto, archivo, pagina) VALUES (?, ?, ?, ?)",
+                    (i, md["texto"], md.get("archivo", ""), md.get("pagina", ""))
+                )
+
+    def __iter__(self) -> Iterator[Optional[Dict[str, Any]]]:
+        """Recorre todos los ids en orden (None en los huecos), leyendo por bloques."""
+        siguiente = 0
+        ultimo = -1
+        while True:
+            with self._lock:
+                filas = self._conn.execute(
+                    "SELECT id, texto, archivo, pagina FROM chunks WHERE id > ? ORDER BY id LIMIT 1000", (ultimo,)
+                ).fetchall()
+            if not filas:
+                break
+            for id_, texto, archivo, pagina in filas:
+                while siguiente < id_:
+                    yield None
+                    siguiente += 1
+                yield {"texto": texto, "archivo": archivo, "pagina": pagina}
+                siguiente += 1
+            ultimo = filas[-1][0]
+        while siguiente < self._longitud:
+            yield None
+            siguiente += 1
+
+    def extend(self, metadatos: Iterable[Optional[Dict[str, Any]]]) -> None:
+        with self._lock:
+            inicio = self._longitud
+            filas = []
+            for md in metadatos:
+                if md is not None:
+                    filas.append((self._longitud, md["texto"], md.get("archivo", ""), md.get("pagina", "")))
+                self._longitud += 1
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, texto, archivo, pagina) VALUES (?, ?, ?, ?)", filas)
+            if self._longitud != inicio:
+                self._guardar_longitud()
+
+    def append(self, md: Optional[Dict[str, Any]]) -> None:
+        self.extend([md])
+
+    def vaciar(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._longitud = 0
+            self._guardar_longitud()
+
+    def _guardar_longitud(self) -> None:
+        self._conn.execute(
+            "INSERT INTO propiedades (clave, valor) VALUES ('longitud', ?) "
+            "ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor", (self._longitud,)
+        )
+
+    def confirmar(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def importar_json(self, ruta_json: str) -> int:
+        """Migra un textos.json (lista de metadatos con huecos en None) y lo confirma."""
+        with open(ruta_json, "r", encoding="utf-8") as f:
+            metadatos = json.load(f)
+        self.vaciar()
+        self.extend(metadatos)
+        self.confirmar()
+        return len(metadatos)
+
+    def copiar(self, ruta: str) -> "AlmacenChunks":
+        """Copia el almacén (lo ya confirmado) a 'ruta' y abre la copia, que se puede modificar."""
+        destino = sqlite3.connect(ruta)
+        try:
+            with self._lock:
+                self._conn.backup(destino)
+            # Sin WAL: las versiones publicadas no dejan archivos -wal/-shm al lado
+            destino.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            destino.close()
+        return AlmacenChunks(ruta)
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __del__(self):
+        # La conexión forma un ciclo con su caché de sentencias: sin esto, una versión
+        # reemplazada seguiría abierta hasta la próxima recolección de ciclos
+        conn = getattr(self, "_conn", None)
+        if conn is not None:
+            conn.close()
+
+
+def abrir_almacen(ruta: str, ruta_json_antiguo: Optional[str] = None) -> AlmacenChunks:
+    """Abre el almacén; si todavía existe un textos.json de la versión anterior, lo migra y lo borra."""
+    almacen = AlmacenChunks(ruta)
+    if ruta_json_antiguo and os.path.exists(ruta_json_antiguo):
+        cantidad = almacen.importar_json(ruta_json_antiguo)
+        os.remove(ruta_json_antiguo)
+        print(f"🗃️ Metadatos migrados de {os.path.basename(ruta_json_antiguo)} a SQLite ({cantidad} chunks)")
+    return almacen
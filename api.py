@@ -1,26 +1,71 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import os
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 # Importar funciones de búsqueda con manejo de errores
 try:
-    from embedding_utils import buscar_similares, cargar_o_crear_indice
+    from embedding_utils import (
+        buscar_similares, buscar_con_umbrales, buscar_sin_red, cargar_o_crear_indice, estadisticas_embeddings,
+        cache_consultas, embeber_consulta_async, esperar_escrituras_cache, huella_indice, obtener_cliente_async,
+        preparar_busqueda_lexica
+    )
 except ImportError:
     print("⚠️ embedding_utils no encontrado, usando funciones básicas")
     # Funciones básicas de fallback
-    def buscar_similares(pregunta, indice, textos, k=5, umbral=0.5):
+    def buscar_similares(pregunta, indice, textos, k=5, umbral=0.5, vector=None):
         return [{"texto": "Información del curso de Auxiliar de Farmacia", "archivo": "Manual", "pagina": "N/A", "similitud": 0.8}]
     
+    def buscar_con_umbrales(pregunta, indice, textos, k=5, umbrales=(0.5,), vector=None):
+        return buscar_similares(pregunta, indice, textos, k=k), umbrales[0]
+    
+    def buscar_sin_red(pregunta, textos, k=5):
+        return []
+    
+    def preparar_busqueda_lexica(textos):
+        pass
+    
+    estadisticas_embeddings = {"llamadas_consulta": 0, "llamadas_ahorradas": 0}
+    cache_consultas = None
+    
+    async def embeber_consulta_async(pregunta):
+        return None
+    
+    async def esperar_escrituras_cache():
+        pass
+    
+    def obtener_cliente_async():
+        return None
+    
+    def huella_indice(indice):
+        return "sin-indice"
+    
     def cargar_o_crear_indice(textos_existentes):
         return {"textos": []}, []
+import asyncio
 import random
+import json
+import time
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database_config import get_db
-from models import Estudiante, Sesion, Pregunta, ResultadoQuiz
+from database_config import get_db, SessionLocal, engine, async_engine, estadisticas_pool
+from models import Estudiante, Sesion, ResultadoQuiz
+from repositorio_analytics import analytics_estudiante, dashboard_general, preparar_base
+from esquemas import EstudianteRequest, QuizResultRequest, QuizResultLoteRequest, SesionLoteRequest
+from exportacion import FORMATOS, generar_exportacion, nombre_archivo
+from ingesta_masiva import ingerir, insertar_estudiantes, insertar_sesiones, insertar_resultados_quiz
+from api_async import router_async, disponible as async_disponible
+from agregados_diarios import actualizar_agregados, iniciar_plegado_periodico
+from cache_respuestas import CacheRespuestas
+from plantillas import RegistroPlantillas
+from casos_repositorio import RepositorioCasos
+from registro_preguntas import RegistroPreguntas
+from contadores import crear_contadores
+from carga_indice import CargaIndice
+from preguntas_quiz import PREGUNTAS_SUGERIDAS, PREGUNTAS_QUIZ
+from typing import Optional
 
 # Configuración
 load_dotenv()
@@ -34,6 +79,8 @@ if not api_key:
     )
 
 client = OpenAI(api_key=api_key)
+# Cliente asíncrono para /preguntar; comparte el pool HTTP de embedding_utils si está disponible
+cliente_async = obtener_cliente_async() or AsyncOpenAI(api_key=api_key)
 
 CARPETA_MATERIAL = "material"
 
@@ -44,29 +91,73 @@ except ImportError:
     UMBRAL_SIMILITUD_PRINCIPAL = 0.7
     UMBRAL_SIMILITUD_SECUNDARIO = 0.5
 
-# Estadísticas de uso
-estadisticas_uso = {
-    "preguntas_totales": 0,
-    "preguntas_por_categoria": {},
-    "preguntas_frecuentes": {},
-    "ultima_actualizacion": None
-}
+# Plantillas de prompt en memoria (se recargan al cambiar prompt.txt)
+plantillas = RegistroPlantillas(intervalo=float(os.getenv("PLANTILLAS_INTERVALO", "2")))
+plantillas.registrar(
+    "prompt", "prompt.txt",
+    respaldo="Eres un asistente educativo experto en farmacia y normativa sanitaria chilena."
+)
 
-# Cargar el índice y textos del material
-indice, textos = cargar_o_crear_indice([])
+# Caché semántico de respuestas (preguntas casi idénticas con el mismo contexto)
+cache_respuestas = CacheRespuestas(
+    distancia_max=float(os.getenv("CACHE_RESPUESTAS_DISTANCIA", "0.08")),
+    ttl_segundos=float(os.getenv("CACHE_RESPUESTAS_TTL", "86400")),
+    capacidad=int(os.getenv("CACHE_RESPUESTAS_CAPACIDAD", "500"))
+)
 
-# Inicialización para Render
-print("🚀 Inicializando sistema...")
-try:
-    from inicializar_render import inicializar_render
-    if inicializar_render():
-        print("✅ Sistema inicializado correctamente")
-        # Recargar el índice después de la inicialización
-        indice, textos = cargar_o_crear_indice([])
-    else:
-        print("⚠️ Problema en la inicialización, continuando con configuración actual")
-except Exception as e:
-    print(f"⚠️ Error en inicialización: {e}, continuando con configuración actual")
+# Registro de preguntas en la base de datos (escritura diferida por lotes)
+registro_preguntas = RegistroPreguntas(
+    SessionLocal,
+    tamano_lote=int(os.getenv("REGISTRO_TAMANO_LOTE", "50")),
+    intervalo=float(os.getenv("REGISTRO_INTERVALO", "2"))
+)
+
+# Estadísticas de uso (memoria acotada: Count-Min sketch + top-K; 'sqlite' las comparte entre workers
+# y es el valor por defecto con WEB_CONCURRENCY > 1)
+contadores = crear_contadores(
+    os.getenv("CONTADORES_BACKEND"),
+    ruta=os.getenv("CONTADORES_DB", "contadores_uso.sqlite")
+)
+
+# Índice y textos del material: se cargan en segundo plano al arrancar (ver carga_indice).
+# Van en una sola tupla que se reemplaza de una vez: cada consulta la lee una vez y nunca
+# combina el índice nuevo con los textos anteriores durante una recarga
+indice_cargado = (None, [])
+# Segundos que /preguntar espera al índice durante el arranque antes de responder sin contexto
+INDICE_ESPERA_MAX = float(os.getenv("INDICE_ESPERA_MAX", "5"))
+
+def publicar_indice(nuevo):
+    """Reemplaza (índice, textos). El almacén de textos anterior no se cierra aquí: las consultas
+    en curso lo siguen usando y su conexión se cierra cuando la última lo suelta."""
+    global indice_cargado
+    indice_cargado = nuevo
+    # El BM25 lee todos los chunks: se arma en segundo plano y no retrasa /ready
+    preparar_busqueda_lexica(nuevo[1])
+    return nuevo[0]
+
+def inicializar_indice():
+    """Inicialización para Render (si existe) y carga del índice, una sola vez."""
+    print("🚀 Inicializando sistema...")
+    try:
+        from inicializar_render import inicializar_render
+        if inicializar_render():
+            print("✅ Sistema inicializado correctamente")
+        else:
+            print("⚠️ Problema en la inicialización, continuando con configuración actual")
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Error en inicialización: {e}, continuando con configuración actual")
+    return publicar_indice(cargar_o_crear_indice([]))
+
+def recargar_indice():
+    return publicar_indice(cargar_o_crear_indice([]))
+
+carga_indice = CargaIndice(inicializar_indice)
+
+# Segundos entre plegados de los agregados diarios (ver agregados_diarios)
+AGREGADOS_INTERVALO = float(os.getenv("AGREGADOS_INTERVALO", "3600"))
+detener_agregados = None
 
 app = FastAPI()
 
@@ -78,188 +169,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Endpoints async de base de datos bajo /async (solo si hay driver aiosqlite/asyncpg)
+if async_disponible:
+    app.include_router(router_async)
+
 # --- MODELOS ---
 class PreguntaRequest(BaseModel):
     pregunta: str
+    estudiante_id: Optional[int] = None
+    sesion_id: Optional[int] = None
 
-class EstudianteRequest(BaseModel):
-    nombre: str
-    email: str
-    grupo: str = "General"
-
-class QuizResultRequest(BaseModel):
-    estudiante_id: int
-    puntaje: int
-    preguntas_correctas: int
-    total_preguntas: int
-    tiempo_completado_minutos: int
-
-# --- PREGUNTAS SUGERIDAS ---
-PREGUNTAS_SUGERIDAS = [
-    "¿Cuáles son las funciones del auxiliar de farmacia?",
-    "¿Qué es el Decreto 405?",
-    "¿Cómo se almacenan los medicamentos termolábiles?",
-    "¿Qué son los psicotrópicos?",
-    "¿Cuáles son las formas farmacéuticas más comunes?",
-    "¿Qué es la cadena de frío?",
-    "¿Cómo se debe atender al cliente en una farmacia?",
-    "¿Qué es el Decreto 79?",
-    "¿Qué son los medicamentos de venta libre?"
-]
-
-# --- PREGUNTAS DE QUIZ ---
-PREGUNTAS_QUIZ = [
-    {
-        "pregunta": "¿Cuál es la función principal del auxiliar de farmacia?",
-        "opciones": [
-            "Vender medicamentos sin receta",
-            "Asistir al farmacéutico en la dispensación y venta de medicamentos",
-            "Recetar medicamentos",
-            "Realizar diagnósticos médicos"
-        ],
-        "correcta": "Asistir al farmacéutico en la dispensación y venta de medicamentos"
-    },
-    {
-        "pregunta": "¿Qué establece el Decreto 405?",
-        "opciones": [
-            "Reglamento de farmacias",
-            "Control de psicotrópicos y estupefacientes",
-            "Venta de medicamentos",
-            "Almacenamiento de productos"
-        ],
-        "correcta": "Control de psicotrópicos y estupefacientes"
-    },
-    {
-        "pregunta": "¿A qué temperatura se deben almacenar los medicamentos termolábiles?",
-        "opciones": [
-            "Entre 2°C y 8°C",
-            "A temperatura ambiente",
-            "En congelador",
-            "Al sol"
-        ],
-        "correcta": "Entre 2°C y 8°C"
-    },
-    {
-        "pregunta": "¿Qué son los medicamentos de venta libre?",
-        "opciones": [
-            "Medicamentos que requieren receta médica",
-            "Medicamentos que se pueden vender sin receta",
-            "Medicamentos controlados",
-            "Medicamentos psicotrópicos"
-        ],
-        "correcta": "Medicamentos que se pueden vender sin receta"
-    },
-    {
-        "pregunta": "¿Qué documento regula la dispensación de psicotrópicos en Chile?",
-        "opciones": [
-            "Decreto 405",
-            "Decreto 79",
-            "Decreto 466",
-            "Ley 20.000"
-        ],
-        "correcta": "Decreto 405"
-    },
-    {
-        "pregunta": "¿Cuál es la temperatura recomendada para la cadena de frío?",
-        "opciones": [
-            "Entre 2°C y 8°C",
-            "Entre 15°C y 25°C",
-            "Menos de 0°C",
-            "Más de 30°C"
-        ],
-        "correcta": "Entre 2°C y 8°C"
-    },
-    {
-        "pregunta": "¿Qué debe hacer el auxiliar si un cliente presenta una receta ilegible?",
-        "opciones": [
-            "Interpretarla como pueda",
-            "Consultar al farmacéutico o al médico que la emitió",
-            "Entregar cualquier medicamento",
-            "No entregar nada y guardar la receta"
-        ],
-        "correcta": "Consultar al farmacéutico o al médico que la emitió"
-    },
-    {
-        "pregunta": "¿Cuál de las siguientes es una forma farmacéutica sólida?",
-        "opciones": [
-            "Jarabe",
-            "Comprimido",
-            "Solución",
-            "Suspensión"
-        ],
-        "correcta": "Comprimido"
-    },
-    {
-        "pregunta": "¿Qué es la farmacovigilancia?",
-        "opciones": [
-            "El estudio de la cadena de frío",
-            "La vigilancia de los efectos adversos de los medicamentos",
-            "El control de inventario en farmacia",
-            "La venta de medicamentos sin receta"
-        ],
-        "correcta": "La vigilancia de los efectos adversos de los medicamentos"
-    },
-    {
-        "pregunta": "¿Qué valor es fundamental en la ética profesional del auxiliar de farmacia?",
-        "opciones": [
-            "La confidencialidad",
-            "La rapidez",
-            "La simpatía",
-            "La creatividad"
-        ],
-        "correcta": "La confidencialidad"
-    },
-    {
-        "pregunta": "¿Qué debe hacer el auxiliar si detecta un medicamento vencido en el stock?",
-        "opciones": [
-            "Venderlo rápidamente",
-            "Retirarlo del stock y notificar al responsable",
-            "Mezclarlo con otros medicamentos",
-            "Ignorarlo"
-        ],
-        "correcta": "Retirarlo del stock y notificar al responsable"
-    },
-    {
-        "pregunta": "¿Cuál es el objetivo principal de la cadena de frío en farmacia?",
-        "opciones": [
-            "Evitar robos",
-            "Mantener la potencia y seguridad de los medicamentos termolábiles",
-            "Reducir costos",
-            "Aumentar la venta"
-        ],
-        "correcta": "Mantener la potencia y seguridad de los medicamentos termolábiles"
-    },
-    {
-        "pregunta": "¿Qué significa ATC en el contexto farmacéutico?",
-        "opciones": [
-            "Análisis Técnico de Cadena",
-            "Clasificación Anatómica, Terapéutica y Química",
-            "Atención Total al Cliente",
-            "Almacenamiento Técnico de Cadena"
-        ],
-        "correcta": "Clasificación Anatómica, Terapéutica y Química"
-    },
-    {
-        "pregunta": "¿Qué debe hacer el auxiliar si un cliente solicita información sobre un medicamento que no conoce?",
-        "opciones": [
-            "Inventar una respuesta",
-            "Consultar fuentes oficiales o al farmacéutico",
-            "Decir que no sabe y no ayudar",
-            "Vender el medicamento igual"
-        ],
-        "correcta": "Consultar fuentes oficiales o al farmacéutico"
-    },
-    {
-        "pregunta": "¿Cuál es la principal función del Decreto 79?",
-        "opciones": [
-            "Regular la venta de psicotrópicos",
-            "Normar los recetarios farmacéuticos",
-            "Controlar la temperatura de almacenamiento",
-            "Definir la ética profesional"
-        ],
-        "correcta": "Normar los recetarios farmacéuticos"
-    }
-]
 
 # --- ENDPOINTS ---
 @app.get("/")
@@ -268,15 +187,26 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    """Endpoint para verificar la salud de la API"""
+    """Endpoint para verificar la salud de la API (responde aunque el índice siga cargando)"""
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "version": "1.0.0",
         "service": "Chatbot Auxiliar de Farmacia",
-        "uptime": "running"
+        "uptime": "running",
+        "indice": carga_indice.estado
     }
 
+@app.get("/ready")
+def ready_check():
+    """200 cuando la búsqueda en el material está disponible; 503 mientras el índice carga o si falló"""
+    resumen = carga_indice.resumen()
+    if not carga_indice.listo:
+        return JSONResponse(status_code=503, content=resumen, headers={"Retry-After": "5"})
+    indice, _ = indice_cargado
+    resumen["chunks"] = indice.ntotal if indice is not None and hasattr(indice, "ntotal") else 0
+    return resumen
+
 @app.get("/ping")
 def ping():
     """Endpoint de ping para mantener el servidor activo"""
@@ -296,6 +226,21 @@ def keep_alive():
         "server": "running"
     }
 
+@app.get("/metricas")
+def obtener_metricas():
+    """Métricas internas de rendimiento (llamadas de embedding y caché de consultas)"""
+    return {
+        "embeddings": dict(estadisticas_embeddings),
+        "cache_embeddings": cache_consultas.estadisticas() if cache_consultas else None,
+        "cache_respuestas": cache_respuestas.estadisticas(),
+        "plantillas": plantillas.versiones(),
+        "registro_preguntas": dict(registro_preguntas.estadisticas),
+        "pool_db": estadisticas_pool(),
+        "pool_db_async": estadisticas_pool(async_engine) if async_engine is not None else None,
+        "indice": carga_indice.resumen(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/preguntas_sugeridas")
 def obtener_preguntas_sugeridas():
     return {"preguntas": random.sample(PREGUNTAS_SUGERIDAS, k=4)}
@@ -315,8 +260,10 @@ def obtener_preguntas_quiz(cantidad: int = 7):
 @app.get("/preguntas_frecuentes")
 def obtener_preguntas_frecuentes():
     """Endpoint para obtener reporte de preguntas más frecuentes"""
+    reporte = contadores.reporte(limite=8)
+    
     # Si no hay datos reales, mostrar datos de ejemplo
-    if estadisticas_uso["preguntas_totales"] == 0:
+    if reporte["preguntas_totales"] == 0:
         return {
             "preguntas_frecuentes": [
                 {
@@ -371,34 +318,9 @@ def obtener_preguntas_frecuentes():
             "es_ejemplo": True
         }
     
-    # Si hay datos reales, procesarlos
-    preguntas_frecuentes = []
-    for pregunta, datos in estadisticas_uso["preguntas_frecuentes"].items():
-        preguntas_frecuentes.append({
-            "pregunta": pregunta,
-            "frecuencia": datos["contador"],
-            "categoria": datos["categoria"]
-        })
-    
-    # Ordenar por frecuencia
-    preguntas_frecuentes.sort(key=lambda x: x["frecuencia"], reverse=True)
-    
-    # Procesar categorías
-    categorias_populares = []
-    for categoria, total in estadisticas_uso["preguntas_por_categoria"].items():
-        categorias_populares.append({
-            "categoria": categoria,
-            "total": total
-        })
-    
-    categorias_populares.sort(key=lambda x: x["total"], reverse=True)
-    
-    return {
-        "preguntas_frecuentes": preguntas_frecuentes[:8],  # Top 8
-        "categorias_populares": categorias_populares,
-        "preguntas_totales": estadisticas_uso["preguntas_totales"],
-        "es_ejemplo": False
-    }
+    # Si hay datos reales, el reporte ya viene ordenado (Top 8)
+    reporte["es_ejemplo"] = False
+    return reporte
 
 def detectar_categoria(pregunta):
     """Detecta la categoría de una pregunta basada en palabras clave"""
@@ -420,83 +342,274 @@ def detectar_categoria(pregunta):
     
     return "General"
 
-@app.post("/preguntar")
-def preguntar(req: PreguntaRequest):
-    pregunta = req.pregunta.strip()
-    if not pregunta:
-        return {"respuesta": "Por favor, escribe una pregunta válida."}
-    
-    # Actualizar estadísticas
-    estadisticas_uso["preguntas_totales"] += 1
+@app.on_event("startup")
+def iniciar_registro():
+    preparar_base(engine)
+    registro_preguntas.iniciar()
+    carga_indice.iniciar()
+    # Plegado de agregados diarios al arrancar y luego periódicamente (el dashboard solo lee)
+    global detener_agregados
+    detener_agregados = iniciar_plegado_periodico(SessionLocal, AGREGADOS_INTERVALO)
+
+@app.on_event("shutdown")
+async def cerrar_clientes():
+    registro_preguntas.detener()
+    if detener_agregados is not None:
+        detener_agregados.set()
+    await esperar_escrituras_cache()
+    await cliente_async.close()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+def registrar_estadisticas(pregunta):
+    """Actualiza las estadísticas de uso y devuelve la categoría detectada"""
     categoria = detectar_categoria(pregunta)
+    try:
+        contadores.registrar(pregunta, categoria)
+    except Exception as e:
+        print(f"⚠️ No se pudieron actualizar las estadísticas: {e}")
+    return categoria
+
+async def preparar_respuesta(pregunta):
+    """Recuperación de contexto y armado del prompt, compartido por /preguntar y /preguntar/stream"""
+    inicio = time.perf_counter()
     
-    # Actualizar contador por categoría
-    if categoria in estadisticas_uso["preguntas_por_categoria"]:
-        estadisticas_uso["preguntas_por_categoria"][categoria] += 1
-    else:
-        estadisticas_uso["preguntas_por_categoria"][categoria] = 1
-    
-    # Actualizar preguntas frecuentes
-    if pregunta in estadisticas_uso["preguntas_frecuentes"]:
-        estadisticas_uso["preguntas_frecuentes"][pregunta]["contador"] += 1
+    # Durante el arranque se espera al índice un tiempo acotado; si no llega se responde sin contexto
+    indice_listo = await carga_indice.esperar(INDICE_ESPERA_MAX)
+    indice, textos = indice_cargado
+    # Preguntas que citan normas o números ("Decreto 405"): BM25 basta y no se llama a la API de embeddings
+    resultados = await asyncio.to_thread(buscar_sin_red, pregunta, textos, 3) if indice_listo else []
+    if resultados:
+        vector, umbral_usado = None, UMBRAL_SIMILITUD_PRINCIPAL
+        t_embedding = time.perf_counter()
+    elif indice_listo:
+        # Un solo embedding sirve para ambos umbrales: si el alto no da resultados se usa el más bajo
+        vector = await embeber_consulta_async(pregunta)
+        t_embedding = time.perf_counter()
+        # Búsqueda FAISS + lectura de metadatos en SQLite (y embedding síncrono si el async falló) en un hilo
+        resultados, umbral_usado = await asyncio.to_thread(
+            buscar_con_umbrales, pregunta, indice, textos, k=3,
+            umbrales=(UMBRAL_SIMILITUD_PRINCIPAL, UMBRAL_SIMILITUD_SECUNDARIO),
+            vector=vector
+        )
     else:
-        estadisticas_uso["preguntas_frecuentes"][pregunta] = {
-            "contador": 1,
-            "categoria": categoria
-        }
-    
-    estadisticas_uso["ultima_actualizacion"] = str(datetime.now())
-    # Buscar contexto relevante con umbral alto de similitud
-    
-    resultados = buscar_similares(pregunta, indice, textos, k=3, umbral=UMBRAL_SIMILITUD_PRINCIPAL)
+        print(f"⚠️ Índice no disponible ({carga_indice.estado}), respondiendo sin material del curso")
+        vector, resultados, umbral_usado = None, [], UMBRAL_SIMILITUD_PRINCIPAL
+        t_embedding = time.perf_counter()
+    t_busqueda = time.perf_counter()
     contexto_partes = []
     
-    if not resultados:
-        # Si no hay resultados con umbral alto, buscar con umbral más bajo
-        print("No se encontraron resultados con umbral alto, buscando con umbral más bajo...")
-        resultados = buscar_similares(pregunta, indice, textos, k=3, umbral=UMBRAL_SIMILITUD_SECUNDARIO)
+    if umbral_usado != UMBRAL_SIMILITUD_PRINCIPAL:
+        print("No se encontraron resultados con umbral alto, se usó el umbral más bajo")
     
     for r in resultados:
         if isinstance(r, dict) and 'texto' in r:
             archivo = r.get('archivo', 'Desconocido')
             pagina = r.get('pagina', 'N/A')
             texto = r['texto']
-            similitud = r.get('similitud', 'N/A')
-            contexto_partes.append(f"[{archivo} - Página {pagina} - Similitud: {similitud:.3f}]\n{texto}")
+            similitud = r.get('similitud')
+            # Los pasajes que solo encontró BM25 no tienen similitud vectorial
+            puntaje = f"Similitud: {similitud:.3f}" if similitud is not None else f"BM25: {r.get('bm25', 0.0):.2f}"
+            contexto_partes.append(f"[{archivo} - Página {pagina} - {puntaje}]\n{texto}")
         elif isinstance(r, str):
             contexto_partes.append(r)
     
     contexto = "\n".join(contexto_partes)
     
     # Si no hay contexto relevante, continuar con respuesta genérica
-    if not contexto_partes:
+    if not indice_listo:
+        contexto = "El material del curso todavía se está cargando; responde con conocimiento general y acláralo."
+    elif not contexto_partes:
         contexto = "No se encontró información específica en los documentos del curso."
-    # Cargar el prompt desde el archivo de texto
-    try:
-        with open('prompt.txt', 'r', encoding='utf-8') as f:
-            prompt_base = f.read()
-    except FileNotFoundError:
-        # Fallback si no se encuentra el archivo
-        prompt_base = "Eres un asistente educativo experto en farmacia y normativa sanitaria chilena."
+    # Prompt desde el registro de plantillas (sin leer el archivo en cada pregunta)
+    plantilla = plantillas.obtener("prompt")
+    prompt_base = plantilla.texto
+    
+    # Respuesta cacheada de una pregunta casi idéntica que recuperó los mismos fragmentos
+    fragmentos = [r["id"] for r in resultados if isinstance(r, dict) and "id" in r]
+    version_prompt = plantilla.version
+    version_indice = huella_indice(indice)
+    cacheada = None
+    if vector is not None:
+        cacheada = cache_respuestas.buscar(vector, fragmentos, version_prompt, version_indice)
+    
+    return {
+        "prompt": f"{prompt_base}\n\nPregunta: {pregunta}\nContexto:\n{contexto}",
+        "resultados": resultados,
+        "vector": vector,
+        "fragmentos": fragmentos,
+        "version_prompt": version_prompt,
+        "version_indice": version_indice,
+        "cacheada": cacheada,
+        "sin_indice": not indice_listo,
+        "inicio": inicio,
+        "tiempos": {
+            "embedding_ms": round((t_embedding - inicio) * 1000, 1),
+            "busqueda_ms": round((t_busqueda - t_embedding) * 1000, 1)
+        }
+    }
+
+def guardar_en_cache(preparada, respuesta_final):
+    if preparada["vector"] is not None:
+        cache_respuestas.guardar(
+            preparada["vector"], preparada["fragmentos"],
+            preparada["version_prompt"], preparada["version_indice"], respuesta_final
+        )
+
+def registrar_pregunta(req, pregunta, respuesta, categoria, preparada):
+    """Encola la pregunta para guardarla en la tabla 'preguntas' sin esperar a la base de datos"""
+    registro_preguntas.registrar(
+        estudiante_id=req.estudiante_id,
+        sesion_id=req.sesion_id,
+        pregunta=pregunta,
+        respuesta=respuesta,
+        categoria=categoria,
+        fecha=datetime.utcnow(),
+        tiempo_respuesta_ms=int((time.perf_counter() - preparada["inicio"]) * 1000)
+    )
+
+def mensajes_chat(prompt):
+    return [{"role": "system", "content": "Eres un asistente educativo experto en farmacia."},
+            {"role": "user", "content": prompt}]
+
+@app.post("/preguntar")
+async def preguntar(req: PreguntaRequest):
+    pregunta = req.pregunta.strip()
+    if not pregunta:
+        return {"respuesta": "Por favor, escribe una pregunta válida."}
+    
+    categoria = await asyncio.to_thread(registrar_estadisticas, pregunta)
+    preparada = await preparar_respuesta(pregunta)
+    if preparada["cacheada"] is not None:
+        registrar_pregunta(req, pregunta, preparada["cacheada"], categoria, preparada)
+        return {"respuesta": preparada["cacheada"], "cache": True, "version_prompt": preparada["version_prompt"]}
     
-    prompt = f"{prompt_base}\n\nPregunta: {pregunta}\nContexto:\n{contexto}"
     try:
-        respuesta = client.chat.completions.create(
+        respuesta = await cliente_async.chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[{"role": "system", "content": "Eres un asistente educativo experto en farmacia."},
-                      {"role": "user", "content": prompt}],
+            messages=mensajes_chat(preparada["prompt"]),
             max_tokens=512,
             temperature=0.2
         )
         respuesta_final = respuesta.choices[0].message.content
         if respuesta_final:
             respuesta_final = respuesta_final.strip()
+            guardar_en_cache(preparada, respuesta_final)
         else:
             respuesta_final = "Lo siento, no pude generar una respuesta. Por favor, intenta reformular tu pregunta."
-        return {"respuesta": respuesta_final}
+        registrar_pregunta(req, pregunta, respuesta_final, categoria, preparada)
+        respuesta_api = {"respuesta": respuesta_final, "version_prompt": preparada["version_prompt"]}
+        if preparada["sin_indice"]:
+            respuesta_api["sin_indice"] = True
+        return respuesta_api
     except Exception as e:
         return {"respuesta": f"Error al consultar OpenAI: {e}"}
 
+def evento_sse(evento, datos):
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+def fuente_citada(r):
+    """Fuente para el cliente: 'similitud' queda en null en los pasajes que solo encontró BM25
+    y 'origen' indica qué búsqueda los trajo (vectorial, bm25 o ambas)"""
+    similitud = r.get("similitud")
+    fuente = {
+        "archivo": r.get("archivo", ""),
+        "pagina": r.get("pagina", ""),
+        "similitud": round(similitud, 3) if similitud is not None else None,
+    }
+    if "bm25" in r:
+        fuente["bm25"] = r["bm25"]
+        fuente["origen"] = "ambas" if similitud is not None else "bm25"
+    else:
+        fuente["origen"] = "vectorial"
+    return fuente
+
+@app.post("/preguntar/stream")
+async def preguntar_stream(req: PreguntaRequest):
+    """Igual que /preguntar pero envía la respuesta por Server-Sent Events.
+    Eventos: 'token' ({"texto": ...}) por cada fragmento generado y 'fin' con las
+    fuentes citadas y los tiempos; 'error' si falla la llamada a OpenAI.
+    """
+    pregunta = req.pregunta.strip()
+    
+    async def eventos():
+        if not pregunta:
+            yield evento_sse("token", {"texto": "Por favor, escribe una pregunta válida."})
+            yield evento_sse("fin", {"fuentes": [], "tiempos": {}})
+            return
+        
+        categoria = await asyncio.to_thread(registrar_estadisticas, pregunta)
+        preparada = await preparar_respuesta(pregunta)
+        tiempos = preparada["tiempos"]
+        fuentes = [fuente_citada(r) for r in preparada["resultados"] if isinstance(r, dict)]
+        
+        if preparada["cacheada"] is not None:
+            tiempos["primer_token_ms"] = round((time.perf_counter() - preparada["inicio"]) * 1000, 1)
+            yield evento_sse("token", {"texto": preparada["cacheada"]})
+            registrar_pregunta(req, pregunta, preparada["cacheada"], categoria, preparada)
+            tiempos["total_ms"] = tiempos["primer_token_ms"]
+            yield evento_sse("fin", {"fuentes": fuentes, "tiempos": tiempos, "cache": True,
+                                     "version_prompt": preparada["version_prompt"]})
+            return
+        
+        partes = []
+        try:
+            stream = await cliente_async.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=mensajes_chat(preparada["prompt"]),
+                max_tokens=512,
+                temperature=0.2,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                texto = chunk.choices[0].delta.content
+                if texto:
+                    if not partes:
+                        tiempos["primer_token_ms"] = round((time.perf_counter() - preparada["inicio"]) * 1000, 1)
+                    partes.append(texto)
+                    yield evento_sse("token", {"texto": texto})
+        except Exception as e:
+            yield evento_sse("error", {"mensaje": f"Error al consultar OpenAI: {e}"})
+            return
+        
+        respuesta_final = "".join(partes).strip()
+        if respuesta_final:
+            guardar_en_cache(preparada, respuesta_final)
+        else:
+            respuesta_final = "Lo siento, no pude generar una respuesta. Por favor, intenta reformular tu pregunta."
+            yield evento_sse("token", {"texto": respuesta_final})
+        registrar_pregunta(req, pregunta, respuesta_final, categoria, preparada)
+        tiempos["total_ms"] = round((time.perf_counter() - preparada["inicio"]) * 1000, 1)
+        yield evento_sse("fin", {"fuentes": fuentes, "tiempos": tiempos, "version_prompt": preparada["version_prompt"],
+                                 "sin_indice": preparada["sin_indice"]})
+    
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/plantillas/recargar")
+def recargar_plantillas():
+    """Fuerza la recarga de las plantillas de prompt (la usa el panel de administración al guardar)"""
+    plantillas.recargar()
+    return {"mensaje": "Plantillas recargadas", "versiones": plantillas.versiones()}
+
+@app.post("/indice/sincronizar")
+def sincronizar_indice():
+    """Recarga el índice y procesa solo los archivos de 'material/' nuevos, modificados o eliminados"""
+    try:
+        # Si la carga inicial sigue en curso, espera a que termine y luego sincroniza
+        indice = carga_indice.ejecutar(recargar_indice)
+        return {
+            "mensaje": "Índice sincronizado",
+            "chunks": indice.ntotal if indice is not None else 0
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error sincronizando índice: {str(e)}")
+
 # --- ENDPOINTS DE ANALYTICS ---
 
 @app.post("/init_db")
@@ -582,89 +695,73 @@ def guardar_resultado_quiz(resultado: QuizResultRequest, db: Session = Depends(g
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+async def cargar_lote(request, modelo, insertar):
+    try:
+        return await ingerir(request, modelo, insertar, SessionLocal)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/estudiantes/lote")
+async def registrar_estudiantes_lote(request: Request):
+    """Registrar estudiantes por lote (arreglo JSON o NDJSON); un email ya registrado actualiza nombre y grupo"""
+    return await cargar_lote(request, EstudianteRequest, insertar_estudiantes)
+
+@app.post("/sesiones/lote")
+async def registrar_sesiones_lote(request: Request):
+    """Importar sesiones por lote (arreglo JSON o NDJSON)"""
+    return await cargar_lote(request, SesionLoteRequest, insertar_sesiones)
+
+@app.post("/quiz/resultados/lote")
+async def guardar_resultados_quiz_lote(request: Request):
+    """Importar resultados de quiz por lote (arreglo JSON o NDJSON)"""
+    return await cargar_lote(request, QuizResultLoteRequest, insertar_resultados_quiz)
+
 @app.get("/analytics/estudiante/{estudiante_id}")
 def obtener_analytics_estudiante(estudiante_id: int, db: Session = Depends(get_db)):
     """Obtener analytics de un estudiante específico"""
     try:
-        estudiante = db.query(Estudiante).filter(Estudiante.id == estudiante_id).first()
-        if not estudiante:
-            raise HTTPException(status_code=404, detail="Estudiante no encontrado")
-        
-        # Estadísticas de sesiones
-        sesiones = db.query(Sesion).filter(Sesion.estudiante_id == estudiante_id).all()
-        total_sesiones = len(sesiones)
-        tiempo_total = sum(s.duracion_minutos or 0 for s in sesiones)
-        
-        # Estadísticas de preguntas
-        preguntas = db.query(Pregunta).filter(Pregunta.estudiante_id == estudiante_id).all()
-        total_preguntas = len(preguntas)
-        
-        # Categorías más consultadas
-        categorias = {}
-        for p in preguntas:
-            if p.categoria is not None:
-                categorias[p.categoria] = categorias.get(p.categoria, 0) + 1
-        
-        # Resultados de quiz
-        resultados = db.query(ResultadoQuiz).filter(ResultadoQuiz.estudiante_id == estudiante_id).all()
-        promedio_quiz = sum(r.puntaje for r in resultados) / len(resultados) if resultados else 0
-        
-        return {
-            "estudiante": {
-                "id": estudiante.id,
-                "nombre": estudiante.nombre,
-                "email": estudiante.email,
-                "grupo": estudiante.grupo
-            },
-            "estadisticas": {
-                "total_sesiones": total_sesiones,
-                "tiempo_total_minutos": tiempo_total,
-                "total_preguntas": total_preguntas,
-                "promedio_quiz": round(float(promedio_quiz), 2),
-                "categorias_consultadas": len(categorias)
-            },
-            "categorias_mas_consultadas": [
-                {"categoria": cat, "consultas": count}
-                for cat, count in sorted(categorias.items(), key=lambda x: x[1], reverse=True)[:5]
-            ]
-        }
+        # Sumas, conteos y promedios calculados en SQL (sin cargar las filas en Python)
+        analytics = analytics_estudiante(db, estudiante_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if analytics is None:
+        raise HTTPException(status_code=404, detail="Estudiante no encontrado")
+    return analytics
 
 @app.get("/analytics/dashboard")
 def obtener_dashboard(db: Session = Depends(get_db)):
-    """Obtener dashboard general"""
+    """Obtener dashboard general (agregados diarios + actividad de hoy)"""
     try:
-        # Métricas generales
-        total_estudiantes = db.query(Estudiante).count()
-        total_preguntas = db.query(Pregunta).count()
-        
-        # Sesiones de hoy
-        hoy = datetime.now().date()
-        sesiones_hoy = db.query(Sesion).filter(
-            Sesion.fecha_inicio >= hoy
-        ).count()
-        
-        # Promedio de quiz
-        resultados = db.query(ResultadoQuiz).all()
-        promedio_quiz = sum(r.puntaje for r in resultados) / len(resultados) if resultados else 0
-        
-        # Categorías más consultadas
-        categorias = db.query(Pregunta.categoria, func.count(Pregunta.id)).group_by(Pregunta.categoria).all()
-        categorias_populares = [{"categoria": cat, "total": count} for cat, count in categorias if cat]
-        
-        return {
-            "metricas_generales": {
-                "total_estudiantes": total_estudiantes,
-                "sesiones_hoy": sesiones_hoy,
-                "total_preguntas": total_preguntas,
-                "promedio_quiz_general": round(float(promedio_quiz), 2)
-            },
-            "categorias_populares": categorias_populares[:5]
-        }
+        return dashboard_general(db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analytics/rollup")
+def recalcular_agregados(desde: Optional[str] = None, db: Session = Depends(get_db)):
+    """Pliega los días pendientes en analytics_diarios; con 'desde' (AAAA-MM-DD) recalcula desde esa fecha"""
+    try:
+        inicio = datetime.strptime(desde, "%Y-%m-%d") if desde else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido, usa AAAA-MM-DD")
+    try:
+        return {"dias_plegados": actualizar_agregados(db, inicio)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/analytics/exportar/{tabla}")
+def exportar_tabla(tabla: str, formato: str = "csv", gzip: bool = False):
+    """Descarga una tabla de analytics en CSV o Parquet, generada por bloques (memoria acotada)"""
+    try:
+        contenido = generar_exportacion(engine, tabla, formato, gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    archivo = nombre_archivo(tabla, formato, gzip)
+    return StreamingResponse(
+        contenido,
+        media_type="application/gzip" if gzip and formato == "csv" else FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'}
+    )
+
 @app.get("/test_analytics")
 def test_analytics():
     """Endpoint de prueba para verificar que analytics funciona"""
@@ -793,6 +890,7 @@ Responde de forma clara y concisa.
 @app.get("/test_busqueda")
 def test_busqueda():
     """Endpoint de prueba para diagnosticar la función de búsqueda semántica"""
+    indice, textos = indice_cargado
     try:
         
         # Verificar que tenemos datos
@@ -896,6 +994,7 @@ def test_busqueda():
 @app.get("/test_busqueda_simple")
 def test_busqueda_simple():
     """Endpoint de prueba simple para diagnosticar errores en búsqueda"""
+    indice, textos = indice_cargado
     try:
         # Test 1: Verificar si el índice y textos están cargados
         info_basica = {
@@ -938,6 +1037,7 @@ def test_busqueda_simple():
 @app.get("/test_busqueda_paso_a_paso")
 def test_busqueda_paso_a_paso():
     """Endpoint de prueba paso a paso para identificar el error exacto"""
+    indice, textos = indice_cargado
     resultados = {}
     
     try:
@@ -1023,6 +1123,7 @@ def test_busqueda_paso_a_paso():
 @app.get("/test_basico")
 def test_basico():
     """Endpoint de diagnóstico básico sin importaciones adicionales"""
+    indice, textos = indice_cargado
     try:
         # Verificar variables globales básicas
         info_basica = {
@@ -1135,6 +1236,7 @@ def test_pregunta_simple():
     """
     Endpoint para probar una pregunta simple sin el prompt complejo
     """
+    indice, textos = indice_cargado
     try:
         pregunta = "¿Qué es la cadena de frío?"
         
@@ -1175,29 +1277,18 @@ def test_pregunta_simple():
         }
 
 # --- ENDPOINTS PARA CASOS CLÍNICOS ---
-import json
+# Casos clínicos en memoria, indexados por id; se recargan solo si cambia el archivo
+repositorio_casos = RepositorioCasos('casos_clinicos.json')
 
 def cargar_casos_clinicos():
-    """Cargar los casos clínicos desde el archivo JSON"""
-    try:
-        with open('casos_clinicos.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {"casos_clinicos": []}
-    except Exception as e:
-        print(f"Error al cargar casos clínicos: {e}")
-        return {"casos_clinicos": []}
+    """Casos clínicos vigentes (desde el repositorio en memoria)"""
+    return {"casos_clinicos": repositorio_casos.todos()}
 
 @app.get("/casos_clinicos")
 def obtener_casos_clinicos():
     """Obtener todos los casos clínicos disponibles"""
     try:
-        casos = cargar_casos_clinicos()
-        return {
-            "status": "success",
-            "casos": casos["casos_clinicos"],
-            "total_casos": len(casos["casos_clinicos"])
-        }
+        return Response(content=repositorio_casos.json_casos(), media_type="application/json")
     except Exception as e:
         return {
             "status": "error",
@@ -1208,8 +1299,7 @@ def obtener_casos_clinicos():
 def obtener_caso_clinico(caso_id: int):
     """Obtener un caso clínico específico por ID"""
     try:
-        casos = cargar_casos_clinicos()
-        caso = next((c for c in casos["casos_clinicos"] if c["id"] == caso_id), None)
+        caso = repositorio_casos.caso(caso_id)
         
         if caso:
             return {
@@ -1231,8 +1321,7 @@ def obtener_caso_clinico(caso_id: int):
 def obtener_preguntas_caso_clinico(caso_id: int):
     """Obtener las preguntas de un caso clínico específico"""
     try:
-        casos = cargar_casos_clinicos()
-        caso = next((c for c in casos["casos_clinicos"] if c["id"] == caso_id), None)
+        caso = repositorio_casos.caso(caso_id)
         
         if caso:
             return {
@@ -1258,27 +1347,8 @@ def obtener_preguntas_caso_clinico(caso_id: int):
 def obtener_quiz_casos_clinicos():
     """Obtener un quiz completo con todos los casos clínicos"""
     try:
-        casos = cargar_casos_clinicos()
-        
-        if not casos["casos_clinicos"]:
-            return {
-                "status": "error",
-                "message": "No hay casos clínicos disponibles"
-            }
-        
-        # Crear el quiz con todos los casos
-        quiz = {
-            "titulo": "Quiz de Casos Clínicos - Auxiliar de Farmacia",
-            "descripcion": "Evaluación basada en casos clínicos reales",
-            "casos": casos["casos_clinicos"],
-            "total_casos": len(casos["casos_clinicos"]),
-            "total_preguntas": sum(len(caso["preguntas"]) for caso in casos["casos_clinicos"])
-        }
-        
-        return {
-            "status": "success",
-            "quiz": quiz
-        }
+        # El quiz completo se serializa una sola vez por versión del archivo
+        return Response(content=repositorio_casos.json_quiz(), media_type="application/json")
     except Exception as e:
         return {
             "status": "error",
@@ -1294,16 +1364,13 @@ class RespuestaCasoClinico(BaseModel):
 def verificar_respuesta_caso_clinico(respuesta: RespuestaCasoClinico):
     """Verificar si una respuesta a un caso clínico es correcta"""
     try:
-        casos = cargar_casos_clinicos()
-        caso = next((c for c in casos["casos_clinicos"] if c["id"] == respuesta.caso_id), None)
-        
-        if not caso:
+        if not repositorio_casos.caso(respuesta.caso_id):
             return {
                 "status": "error",
                 "message": f"Caso clínico con ID {respuesta.caso_id} no encontrado"
             }
         
-        pregunta = next((p for p in caso["preguntas"] if p["id"] == respuesta.pregunta_id), None)
+        pregunta = repositorio_casos.pregunta(respuesta.caso_id, respuesta.pregunta_id)
         
         if not pregunta:
             return {
@@ -0,0 +1,114 @@
+"""
+Versiones async de los endpoints de estudiantes, sesiones, quiz y analytics,
+montadas bajo /async. Usan AsyncSession (aiosqlite / asyncpg), así la espera
+de la base de datos no ocupa un hilo del threadpool de FastAPI. Las consultas
+de analytics se reutilizan tal cual con run_sync.
+
+Si el driver async no está instalado (AsyncSessionLocal es None) el router
+no se monta y solo quedan los endpoints sync.
+"""
+
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_config import AsyncSessionLocal, get_db_async
+from esquemas import EstudianteRequest, QuizResultRequest
+from models import Estudiante, Sesion, ResultadoQuiz
+from repositorio_analytics import analytics_estudiante, dashboard_general
+
+router_async = APIRouter(prefix="/async", tags=["async"])
+disponible = AsyncSessionLocal is not None
+
+
+@router_async.post("/estudiantes/registrar")
+async def registrar_estudiante(estudiante: EstudianteRequest, db: AsyncSession = Depends(get_db_async)):
+    """Registrar un nuevo estudiante"""
+    try:
+        nuevo_estudiante = Estudiante(
+            nombre=estudiante.nombre,
+            email=estudiante.email,
+            grupo=estudiante.grupo
+        )
+        db.add(nuevo_estudiante)
+        await db.commit()
+        return {"id": nuevo_estudiante.id, "mensaje": "Estudiante registrado correctamente"}
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router_async.post("/sesiones/iniciar")
+async def iniciar_sesion(estudiante_id: int, db: AsyncSession = Depends(get_db_async)):
+    """Iniciar una nueva sesión para un estudiante"""
+    try:
+        sesion = Sesion(estudiante_id=estudiante_id)
+        db.add(sesion)
+        await db.commit()
+        return {"sesion_id": sesion.id, "mensaje": "Sesión iniciada"}
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router_async.post("/sesiones/finalizar")
+async def finalizar_sesion(sesion_id: int, db: AsyncSession = Depends(get_db_async)):
+    """Finalizar una sesión"""
+    try:
+        sesion = (await db.execute(select(Sesion).where(Sesion.id == sesion_id))).scalar_one_or_none()
+        if not sesion:
+            raise HTTPException(status_code=404, detail="Sesión no encontrada")
+
+        sesion.fecha_fin = datetime.now()
+        if sesion.fecha_inicio is not None and sesion.fecha_fin is not None:
+            duracion = (sesion.fecha_fin - sesion.fecha_inicio).total_seconds() / 60
+            sesion.duracion_minutos = int(duracion)
+
+        await db.commit()
+        return {"mensaje": "Sesión finalizada"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router_async.post("/quiz/resultado")
+async def guardar_resultado_quiz(resultado: QuizResultRequest, db: AsyncSession = Depends(get_db_async)):
+    """Guardar resultado de un quiz"""
+    try:
+        db.add(ResultadoQuiz(
+            estudiante_id=resultado.estudiante_id,
+            puntaje=resultado.puntaje,
+            preguntas_correctas=resultado.preguntas_correctas,
+            total_preguntas=resultado.total_preguntas,
+            tiempo_completado_minutos=resultado.tiempo_completado_minutos
+        ))
+        await db.commit()
+        return {"mensaje": "Resultado guardado correctamente"}
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router_async.get("/analytics/estudiante/{estudiante_id}")
+async def obtener_analytics_estudiante(estudiante_id: int, db: AsyncSession = Depends(get_db_async)):
+    """Obtener analytics de un estudiante específico"""
+    try:
+        analytics = await db.run_sync(analytics_estudiante, estudiante_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if analytics is None:
+        raise HTTPException(status_code=404, detail="Estudiante no encontrado")
+    return analytics
+
+
+@router_async.get("/analytics/dashboard")
+async def obtener_dashboard(db: AsyncSession = Depends(get_db_async)):
+    """Obtener dashboard general (agregados diarios + actividad de hoy)"""
+    try:
+        return await db.run_sync(dashboard_general)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,11 @@
 import streamlit as st
 import json
 import os
-import sqlite3
-from datetime import datetime
-import pandas as pd
+import threading
+from database_config import Base, SessionLocal, engine
+from repositorio_analytics import (estadisticas_generales, preguntas_recientes, preparar_base,
+                                   resultados_quiz_recientes)
+from exportacion import FORMATOS, TABLAS_EXPORTABLES, exportar_a_archivo, nombre_archivo, parquet_disponible
 
 # Configuración de la página
 st.set_page_config(
@@ -17,89 +19,51 @@ st.set_page_config(
 st.title("🏥 Panel de Administración - Bot Asistente Virtual de Farmacia")
 st.markdown("---")
 
-# Configuración de la base de datos
-DB_PATH = "chatbot_analytics.db"
+# Carpeta de exportaciones de analytics
+EXPORT_DIR = "analytics_exportados"
 
+# Segundos que se reutilizan los resultados de las consultas del panel si los datos no cambian
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", "60"))
+
+@st.cache_resource
 def init_db():
-    """Inicializar la base de datos si no existe"""
-    if not os.path.exists(DB_PATH):
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Crear tabla de sesiones
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT UNIQUE,
-                start_time TIMESTAMP,
-                end_time TIMESTAMP,
-                user_agent TEXT,
-                ip_address TEXT
-            )
-        ''')
-        
-        # Crear tabla de preguntas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT,
-                question TEXT,
-                response TEXT,
-                timestamp TIMESTAMP,
-                response_time REAL,
-                FOREIGN KEY (session_id) REFERENCES sessions (session_id)
-            )
-        ''')
-        
-        # Crear tabla de resultados de quiz
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quiz_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT,
-                quiz_id INTEGER,
-                score INTEGER,
-                total_questions INTEGER,
-                completion_time REAL,
-                timestamp TIMESTAMP,
-                FOREIGN KEY (session_id) REFERENCES sessions (session_id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        st.success("✅ Base de datos inicializada correctamente")
+    """Crear las tablas de analytics que falten (mismo esquema que la API), una vez por proceso"""
+    preparar_base(engine)
+
+@st.cache_resource
+def conexion_version():
+    """Conexión compartida para leer PRAGMA data_version (solo SQLite).
+    data_version cambia cuando otra conexión confirma una escritura, así que la
+    conexión tiene que ser siempre la misma entre ejecuciones del script.
+    """
+    if engine.dialect.name != "sqlite":
+        return None, None
+    return engine.connect(), threading.Lock()
+
+def version_datos():
+    """Versión de los datos para las claves de caché; sin SQLite solo aplica el TTL."""
+    conn, lock = conexion_version()
+    if conn is None:
+        return 0
+    with lock:
+        version = conn.exec_driver_sql("PRAGMA data_version").scalar()
+        conn.rollback()
+    return version
+
+@st.cache_data(ttl=ADMIN_CACHE_TTL, show_spinner=False)
+def consultar_estadisticas(version):
+    with SessionLocal() as db:
+        return estadisticas_generales(db)
+
+@st.cache_data(ttl=ADMIN_CACHE_TTL, show_spinner=False)
+def consultar_datos_recientes(version, limite=10):
+    with SessionLocal() as db:
+        return preguntas_recientes(db, limite=limite), resultados_quiz_recientes(db, limite=limite)
 
 def get_db_stats():
-    """Obtener estadísticas de la base de datos"""
+    """Obtener estadísticas de la base de datos (cacheadas mientras no cambien los datos)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        
-        # Estadísticas de sesiones
-        sessions_count = pd.read_sql_query("SELECT COUNT(*) as total FROM sessions", conn).iloc[0]['total']
-        
-        # Estadísticas de preguntas
-        questions_count = pd.read_sql_query("SELECT COUNT(*) as total FROM questions", conn).iloc[0]['total']
-        
-        # Estadísticas de quiz
-        quiz_count = pd.read_sql_query("SELECT COUNT(*) as total FROM quiz_results", conn).iloc[0]['total']
-        
-        # Última actividad
-        last_activity = pd.read_sql_query("""
-            SELECT MAX(timestamp) as last_activity FROM (
-                SELECT timestamp FROM questions
-                UNION ALL
-                SELECT timestamp FROM quiz_results
-            )
-        """, conn).iloc[0]['last_activity']
-        
-        conn.close()
-        
-        return {
-            'sessions': sessions_count,
-            'questions': questions_count,
-            'quiz_results': quiz_count,
-            'last_activity': last_activity
-        }
+        return consultar_estadisticas(version_datos())
     except Exception as e:
         st.error(f"❌ Error obteniendo estadísticas: {e}")
         return None
@@ -154,64 +118,49 @@ def load_casos_clinicos():
 def save_casos_clinicos(casos):
     """Guardar casos clínicos en archivo JSON"""
     try:
-        with open('casos_clinicos.json', 'w', encoding='utf-8') as f:
+        # Escribir en un temporal y reemplazar, para que la API nunca lea un archivo a medias
+        with open('casos_clinicos.json.tmp', 'w', encoding='utf-8') as f:
             json.dump(casos, f, ensure_ascii=False, indent=4)
+        os.replace('casos_clinicos.json.tmp', 'casos_clinicos.json')
         st.success("✅ Casos clínicos guardados correctamente")
         return True
     except Exception as e:
         st.error(f"❌ Error guardando casos clínicos: {e}")
         return False
 
-def export_analytics():
-    """Exportar analytics a CSV"""
+def export_analytics(formato="csv", comprimir=True):
+    """Exportar analytics por streaming (bloques de filas, memoria acotada)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        
-        # Exportar sesiones
-        sessions_df = pd.read_sql_query("SELECT * FROM sessions", conn)
-        sessions_df.to_csv("sessions_export.csv", index=False)
-        
-        # Exportar preguntas
-        questions_df = pd.read_sql_query("SELECT * FROM questions", conn)
-        questions_df.to_csv("questions_export.csv", index=False)
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        archivos = []
+        for tabla in TABLAS_EXPORTABLES:
+            archivo = nombre_archivo(tabla, formato, comprimir)
+            # Nombre fijo por tabla: cada exportación reemplaza a la anterior
+            exportar_a_archivo(engine, tabla, os.path.join(EXPORT_DIR, archivo), formato, comprimir)
+            archivos.append((tabla, archivo))
         
-        # Exportar resultados de quiz
-        quiz_df = pd.read_sql_query("SELECT * FROM quiz_results", conn)
-        quiz_df.to_csv("quiz_results_export.csv", index=False)
-        
-        conn.close()
-        
-        st.success("✅ Analytics exportados a CSV correctamente")
+        st.success("✅ Analytics exportados correctamente")
         
         # Proporcionar enlaces de descarga
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            with open("sessions_export.csv", "r") as f:
-                st.download_button(
-                    label="📥 Descargar Sesiones",
-                    data=f.read(),
-                    file_name="sessions_export.csv",
-                    mime="text/csv"
-                )
-        
-        with col2:
-            with open("questions_export.csv", "r") as f:
-                st.download_button(
-                    label="📥 Descargar Preguntas",
-                    data=f.read(),
-                    file_name="questions_export.csv",
-                    mime="text/csv"
-                )
-        
-        with col3:
-            with open("quiz_results_export.csv", "r") as f:
-                st.download_button(
-                    label="📥 Descargar Quiz",
-                    data=f.read(),
-                    file_name="quiz_results_export.csv",
-                    mime="text/csv"
-                )
+        columnas = st.columns(len(archivos))
+        for columna, (tabla, archivo) in zip(columnas, archivos):
+            with columna:
+                with open(os.path.join(EXPORT_DIR, archivo), "rb") as f:
+                    st.download_button(
+                        label=f"📥 {tabla.replace('_', ' ').capitalize()}",
+                        data=f,
+                        file_name=archivo,
+                        mime="application/gzip" if archivo.endswith(".gz") else FORMATOS[formato]
+                    )
+        
+        # Descarga directa desde la API (streaming, sin pasar por el panel)
+        api_url = os.getenv("API_URL")
+        if api_url:
+            enlaces = [
+                f"[{tabla}]({api_url}/analytics/exportar/{tabla}?formato={formato}&gzip={str(comprimir).lower()})"
+                for tabla in TABLAS_EXPORTABLES
+            ]
+            st.markdown("🔗 Descarga directa desde la API: " + " · ".join(enlaces))
                 
     except Exception as e:
         st.error(f"❌ Error exportando analytics: {e}")
@@ -236,17 +185,17 @@ if page == "📊 Dashboard":
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("👥 Sesiones", stats['sessions'])
+            st.metric("👥 Sesiones", stats['sesiones'])
         
         with col2:
-            st.metric("❓ Preguntas", stats['questions'])
+            st.metric("❓ Preguntas", stats['preguntas'])
         
         with col3:
-            st.metric("📝 Quiz Completados", stats['quiz_results'])
+            st.metric("📝 Quiz Completados", stats['resultados_quiz'])
         
         with col4:
-            if stats['last_activity']:
-                st.metric("🕒 Última Actividad", stats['last_activity'][:19])
+            if stats['ultima_actividad']:
+                st.metric("🕒 Última Actividad", str(stats['ultima_actividad'])[:19])
             else:
                 st.metric("🕒 Última Actividad", "N/A")
     
@@ -376,6 +325,20 @@ elif page == "📁 Gestión de Materiales":
                 f.write(uploaded_file.getbuffer())
             
             st.success(f"✅ {uploaded_file.name} subido correctamente")
+    
+    # Actualizar índice de búsqueda (solo reprocesa archivos nuevos o modificados)
+    st.subheader("🔄 Índice de Búsqueda")
+    st.caption("La API toma los cambios al reiniciar o con POST /indice/sincronizar.")
+    
+    if st.button("🔄 Actualizar Índice"):
+        try:
+            from embedding_utils import cargar_o_crear_indice
+            with st.spinner("Actualizando índice..."):
+                indice_actualizado, _ = cargar_o_crear_indice([])
+            total_chunks = indice_actualizado.ntotal if indice_actualizado is not None else 0
+            st.success(f"✅ Índice actualizado ({total_chunks} chunks)")
+        except Exception as e:
+            st.error(f"❌ Error actualizando índice: {e}")
 
 # Página de Analytics
 elif page == "📈 Analytics":
@@ -384,45 +347,35 @@ elif page == "📈 Analytics":
     # Exportar analytics
     st.subheader("📊 Exportar Datos")
     
-    if st.button("📥 Exportar Analytics a CSV"):
-        export_analytics()
+    formatos_exportacion = ["CSV (gzip)", "CSV"] + (["Parquet"] if parquet_disponible() else [])
+    formato_exportacion = st.radio("Formato:", formatos_exportacion, horizontal=True)
+    
+    if st.button("📥 Exportar Analytics"):
+        export_analytics(
+            formato="parquet" if formato_exportacion == "Parquet" else "csv",
+            comprimir=formato_exportacion == "CSV (gzip)"
+        )
     
     # Mostrar datos recientes
     st.subheader("📋 Datos Recientes")
     
     try:
-        conn = sqlite3.connect(DB_PATH)
+        recent_questions, recent_quiz = consultar_datos_recientes(version_datos(), limite=10)
         
         # Últimas preguntas
         st.write("**❓ Últimas Preguntas:**")
-        recent_questions = pd.read_sql_query("""
-            SELECT question, response, timestamp 
-            FROM questions 
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        """, conn)
-        
-        if not recent_questions.empty:
+        if recent_questions:
             st.dataframe(recent_questions)
         else:
             st.info("ℹ️ No hay preguntas registradas")
         
         # Resultados de quiz recientes
         st.write("**📝 Últimos Resultados de Quiz:**")
-        recent_quiz = pd.read_sql_query("""
-            SELECT score, total_questions, completion_time, timestamp 
-            FROM quiz_results 
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        """, conn)
-        
-        if not recent_quiz.empty:
+        if recent_quiz:
             st.dataframe(recent_quiz)
         else:
             st.info("ℹ️ No hay resultados de quiz registrados")
         
-        conn.close()
-        
     except Exception as e:
         st.error(f"❌ Error cargando datos: {e}")
 
@@ -452,6 +405,14 @@ elif page == "⚙️ Configuración":
                 with open("prompt.txt", "w", encoding="utf-8") as f:
                     f.write(edited_prompt)
                 st.success("✅ Prompt actualizado correctamente")
+                # Avisar a la API para que use el nuevo prompt de inmediato (si no, lo toma al detectar el cambio)
+                api_url = os.getenv("API_URL")
+                if api_url:
+                    try:
+                        import requests
+                        requests.post(f"{api_url}/plantillas/recargar", timeout=5)
+                    except Exception as e:
+                        st.warning(f"⚠️ No se pudo avisar a la API: {e}")
             except Exception as e:
                 st.error(f"❌ Error guardando prompt: {e}")
     else:
@@ -460,13 +421,11 @@ elif page == "⚙️ Configuración":
     st.subheader("🗄️ Base de Datos")
     
     if st.button("🔄 Reinicializar Base de Datos"):
-        if os.path.exists(DB_PATH):
-            os.remove(DB_PATH)
-            st.success("✅ Base de datos eliminada")
-            init_db()
-            st.rerun()
-        else:
-            st.info("ℹ️ No hay base de datos para reinicializar")
+        Base.metadata.drop_all(bind=engine)
+        st.success("✅ Base de datos eliminada")
+        preparar_base(engine)
+        st.cache_data.clear()
+        st.rerun()
 
 # Footer
 st.markdown("---")
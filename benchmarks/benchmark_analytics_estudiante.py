@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Compara /analytics/estudiante/{id} calculado en Python sobre objetos ORM
+(versión anterior) contra los agregados SQL de repositorio_analytics, sobre
+una base SQLite sintética.
+
+Uso:
+    python benchmarks/benchmark_analytics_estudiante.py [filas] [ruta_db]
+
+Por defecto genera 1.000.000 de filas (preguntas, sesiones y resultados de
+quiz) en un archivo temporal; el estudiante 1 es un usuario "pesado".
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from models import Base, Estudiante, Sesion, Pregunta, ResultadoQuiz, crear_tablas_e_indices  # noqa: E402
+from repositorio_analytics import analytics_estudiante  # noqa: E402
+
+CATEGORIAS = ["Funciones", "Normativas", "Almacenamiento", "Medicamentos", "Farmacología", "Atención al cliente", "General"]
+ESTUDIANTES = 2000
+FRACCION_PESADO = 0.05
+
+
+def generar(ruta, filas):
+    """Llena la base con ~filas repartidas 80% preguntas, 10% sesiones y 10% quiz."""
+    engine = create_engine(f"sqlite:///{ruta}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    rnd = random.Random(42)
+    base = datetime(2025, 1, 1)
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO estudiantes (id, nombre, email, grupo, fecha_registro) VALUES (?, ?, ?, ?, ?)",
+        [(i, f"Estudiante {i}", f"e{i}@ejemplo.cl", "General", base) for i in range(1, ESTUDIANTES + 1)]
+    )
+
+    def estudiante():
+        return 1 if rnd.random() < FRACCION_PESADO else rnd.randint(2, ESTUDIANTES)
+
+    n_preguntas, n_otros = int(filas * 0.8), int(filas * 0.1)
+    conn.executemany(
+        "INSERT INTO sesiones (estudiante_id, fecha_inicio, duracion_minutos, preguntas_realizadas) VALUES (?, ?, ?, 0)",
+        ((estudiante(), base + timedelta(minutes=i), rnd.randint(1, 90)) for i in range(n_otros))
+    )
+    conn.executemany(
+        "INSERT INTO preguntas (estudiante_id, pregunta, respuesta, categoria, fecha, tiempo_respuesta_ms) "
+        "VALUES (?, ?, '', ?, ?, ?)",
+        ((estudiante(), f"Pregunta {rnd.randint(1, 5000)}", rnd.choice(CATEGORIAS),
+          base + timedelta(seconds=i), rnd.randint(200, 4000)) for i in range(n_preguntas))
+    )
+    conn.executemany(
+        "INSERT INTO resultados_quiz (estudiante_id, puntaje, preguntas_correctas, total_preguntas, fecha) "
+        "VALUES (?, ?, 0, 10, ?)",
+        ((estudiante(), rnd.randint(0, 100), base + timedelta(minutes=i)) for i in range(n_otros))
+    )
+    conn.commit()
+    conn.close()
+
+
+def version_anterior(db, estudiante_id):
+    """Implementación previa del endpoint (carga todo en Python)."""
+    estudiante = db.query(Estudiante).filter(Estudiante.id == estudiante_id).first()
+    sesiones = db.query(Sesion).filter(Sesion.estudiante_id == estudiante_id).all()
+    tiempo_total = sum(s.duracion_minutos or 0 for s in sesiones)
+    preguntas = db.query(Pregunta).filter(Pregunta.estudiante_id == estudiante_id).all()
+    categorias = {}
+    for p in preguntas:
+        if p.categoria is not None:
+            categorias[p.categoria] = categorias.get(p.categoria, 0) + 1
+    resultados = db.query(ResultadoQuiz).filter(ResultadoQuiz.estudiante_id == estudiante_id).all()
+    promedio_quiz = sum(r.puntaje for r in resultados) / len(resultados) if resultados else 0
+    return estudiante.id, len(sesiones), tiempo_total, len(preguntas), round(float(promedio_quiz), 2), len(categorias)
+
+
+def medir(fn, repeticiones=3):
+    mejor, resultado = None, None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = fn()
+        t = time.perf_counter() - inicio
+        mejor = t if mejor is None else min(mejor, t)
+    return mejor, resultado
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ruta = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), f"bench_analytics_{filas}.db")
+    if not os.path.exists(ruta):
+        print(f"Generando {filas} filas en {ruta}...")
+        generar(ruta, filas)
+
+    engine = create_engine(f"sqlite:///{ruta}")
+    # Primera pasada sin los índices compuestos por estudiante
+    with engine.begin() as conn:
+        for tabla in Base.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                if "_estudiante_" in indice.name:
+                    conn.exec_driver_sql(f"DROP INDEX IF EXISTS {indice.name}")
+    db = sessionmaker(bind=engine)()
+
+    for etiqueta, estudiante_id in [("pesado", 1), ("típico", 2)]:
+        t_antes, antes = medir(lambda: version_anterior(db, estudiante_id))
+        t_sql_sin_indices, _ = medir(lambda: analytics_estudiante(db, estudiante_id))
+        print(f"Estudiante {etiqueta} ({antes[3]} preguntas):")
+        print(f"  Python sobre ORM:          {t_antes * 1000:9.1f} ms")
+        print(f"  SQL sin índices compuestos: {t_sql_sin_indices * 1000:8.1f} ms")
+
+    crear_tablas_e_indices(engine)
+    db.connection().exec_driver_sql("ANALYZE")
+    for etiqueta, estudiante_id in [("pesado", 1), ("típico", 2)]:
+        t_sql, nuevo = medir(lambda: analytics_estudiante(db, estudiante_id))
+        antes = version_anterior(db, estudiante_id)
+        e = nuevo["estadisticas"]
+        iguales = (e["total_sesiones"], e["tiempo_total_minutos"], e["total_preguntas"],
+                   e["promedio_quiz"], e["categorias_consultadas"]) == antes[1:]
+        print(f"Estudiante {etiqueta}: SQL con índices compuestos {t_sql * 1000:.1f} ms "
+              f"(mismo resultado: {'sí' if iguales else 'NO'})")
+
+
+if __name__ == "__main__":
+    main()
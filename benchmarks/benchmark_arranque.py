@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Mide el arranque en frío del índice: tiempo de carga y memoria residente
+(VmRSS y pico VmHWM de /proc) de dos formas, cada una en un proceso nuevo:
+
+- anterior: faiss.read_index en RAM + json.load de la lista de textos.
+- mmap:     índice mapeado (IO_FLAG_MMAP_IFC) + AlmacenChunks, que solo lee
+            de SQLite los textos de los top-k.
+
+Ambas hacen además una búsqueda k=5 y leen los textos de los resultados.
+Con mmap las páginas que toca la búsqueda (todas, en flat) cuentan en RSS
+pero son páginas del archivo compartidas entre workers y el kernel puede
+liberarlas; las del índice leído en RAM son memoria anónima de cada proceso.
+
+Uso:
+    python benchmarks/benchmark_arranque.py [vectores] [dimension]
+    python benchmarks/benchmark_arranque.py indice
+
+Por defecto genera 200.000 vectores de dimensión 384 con un texto de ~1 KB
+por chunk en un directorio temporal. Con 'indice' usa index_store (si ahí ya
+no está textos.json, se genera uno desde metadatos.sqlite para comparar).
+Solo Linux (lee /proc/self/status).
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import faiss  # noqa: E402
+
+from almacen_chunks import AlmacenChunks  # noqa: E402
+
+REPETICIONES = 3
+
+MEDIR = r"""
+import json, os, sys, time
+sys.path.insert(0, {raiz!r})
+import numpy as np
+import faiss
+from almacen_chunks import AlmacenChunks
+
+def memoria():
+    valores = {{}}
+    with open("/proc/self/status") as f:
+        for linea in f:
+            clave, _, resto = linea.partition(":")
+            if clave in ("VmRSS", "VmHWM"):
+                valores[clave] = int(resto.split()[0]) / 1024
+    return valores
+
+base = memoria()
+inicio = time.perf_counter()
+if {modo!r} == "anterior":
+    index = faiss.read_index({indice!r})
+    with open({json_path!r}, encoding="utf-8") as f:
+        textos = json.load(f)
+else:
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    index = faiss.read_index({indice!r}, flag)
+    textos = AlmacenChunks({db_path!r})
+carga = time.perf_counter() - inicio
+cargado = memoria()
+
+q = np.random.default_rng(3).standard_normal((1, index.d)).astype("float32")
+faiss.normalize_L2(q)
+inicio = time.perf_counter()
+_, I = index.search(q, 5)
+hits = [textos[int(i)] for i in I[0] if i >= 0]
+busqueda = time.perf_counter() - inicio
+fin = memoria()
+print(json.dumps({{
+    "carga_s": carga,
+    "busqueda_ms": busqueda * 1000,
+    "rss_carga_mb": cargado["VmRSS"] - base["VmRSS"],
+    "rss_mb": fin["VmRSS"] - base["VmRSS"],
+    "pico_mb": fin["VmHWM"] - base["VmRSS"],
+    "hits": len(hits),
+}}))
+"""
+
+
+def generar(directorio, n, dim):
+    """Índice flat envuelto en IndexIDMap2 + textos.json + metadatos.sqlite sintéticos."""
+    rng = np.random.default_rng(7)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    bloque = 20000
+    for desde in range(0, n, bloque):
+        x = rng.standard_normal((min(bloque, n - desde), dim)).astype("float32")
+        faiss.normalize_L2(x)
+        index.add_with_ids(x, np.arange(desde, desde + len(x), dtype="int64"))
+    indice = os.path.join(directorio, "indice.faiss")
+    faiss.write_index(index, indice)
+
+    relleno = "Conservar el medicamento entre 2 y 8 °C, protegido de la luz. " * 16
+    metadatos = [{"texto": f"{i} {relleno}", "archivo": f"modulo{i % 12}.pdf", "pagina": i % 300}
+                 for i in range(n)]
+    json_path = os.path.join(directorio, "textos.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(metadatos, f, ensure_ascii=False)
+    db_path = os.path.join(directorio, "metadatos.sqlite")
+    almacen = AlmacenChunks(db_path)
+    almacen.vaciar()
+    almacen.extend(metadatos)
+    almacen.confirmar()
+    almacen.cerrar()
+    return indice, json_path, db_path
+
+
+def desde_index_store(directorio):
+    """Versión vigente de index_store según el manifiesto (o los nombres del formato anterior)."""
+    store = "index_store"
+    try:
+        with open(os.path.join(store, "manifiesto.json"), encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError):
+        manifiesto = {}
+    indice = os.path.join(store, manifiesto.get("indice", "indice.faiss"))
+    db_path = os.path.join(store, manifiesto.get("metadatos", "metadatos.sqlite"))
+    json_path = os.path.join(store, "textos.json")
+    if not os.path.exists(json_path):
+        json_path = os.path.join(directorio, "textos.json")
+        almacen = AlmacenChunks(db_path)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(list(almacen), f, ensure_ascii=False)
+        almacen.cerrar()
+    return indice, json_path, db_path
+
+
+def correr(modo, indice, json_path, db_path):
+    codigo = MEDIR.format(raiz=RAIZ, modo=modo, indice=indice, json_path=json_path, db_path=db_path)
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        if len(sys.argv) > 1 and sys.argv[1] == "indice":
+            indice, json_path, db_path = desde_index_store(directorio)
+        else:
+            n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+            dim = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+            print(f"Generando {n} vectores x {dim}…")
+            indice, json_path, db_path = generar(directorio, n, dim)
+
+        print(f"índice: {os.path.getsize(indice) / 1e6:.1f} MB  textos.json: {os.path.getsize(json_path) / 1e6:.1f} MB  "
+              f"metadatos.sqlite: {os.path.getsize(db_path) / 1e6:.1f} MB\n")
+        print(f"{'modo':<10}{'carga s':>9}{'RSS carga MB':>14}{'búsqueda ms':>13}{'RSS MB':>9}{'pico MB':>9}")
+        for modo in ("anterior", "mmap"):
+            medidas = [correr(modo, indice, json_path, db_path) for _ in range(REPETICIONES)]
+            m = min(medidas, key=lambda r: r["carga_s"])
+            print(f"{modo:<10}{m['carga_s']:>9.3f}{m['rss_carga_mb']:>14.1f}{m['busqueda_ms']:>13.2f}{m['rss_mb']:>9.1f}{m['pico_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
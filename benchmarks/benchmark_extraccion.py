@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Compara la extracción de texto en serie y en paralelo (ProcessPoolExecutor)
+sobre los PDF/TXT de material/ y verifica que ambas den el mismo resultado.
+
+Uso:
+    python benchmarks/benchmark_extraccion.py [procesos] [repeticiones]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedding_utils  # noqa: E402
+
+
+def medir(paths, procesos, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = embedding_utils._extraer_documentos(paths, procesos=procesos)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    procesos = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    paths = [os.path.join(embedding_utils.MATERIAL_DIR, rel) for rel in embedding_utils._listar_archivos()]
+    if not paths:
+        print(f"No hay archivos en '{embedding_utils.MATERIAL_DIR}'")
+        return
+
+    t_serie, serie = medir(paths, 1, repeticiones)
+    t_paralelo, paralelo = medir(paths, procesos, repeticiones)
+
+    paginas = sum(len(d) for d in serie)
+    print(f"Archivos: {len(paths)} - Páginas con texto: {paginas}")
+    print(f"Serie:    {t_serie:.3f} s")
+    print(f"Paralelo: {t_paralelo:.3f} s ({procesos} procesos, {embedding_utils.PAGINAS_POR_TAREA} páginas por tarea)")
+    print(f"Aceleración: {t_serie / t_paralelo:.2f}x")
+    print(f"Mismo resultado: {'sí' if serie == paralelo else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
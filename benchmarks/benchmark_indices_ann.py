@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compara los tipos de índice de indices_faiss (hnsw, ivf, ivfpq) contra la
+búsqueda exacta (flat) sobre los mismos vectores: recall@k, latencia por
+consulta (p50/p95), tiempo de construcción y tamaño serializado, barriendo
+efSearch (HNSW) y nprobe (IVF).
+
+Uso:
+    python benchmarks/benchmark_indices_ann.py [vectores] [dimension] [k]
+    python benchmarks/benchmark_indices_ann.py indice [k]
+
+Por defecto genera 50.000 vectores sintéticos agrupados de dimensión 384.
+Con 'indice' usa los embeddings reales de la versión vigente de index_store.
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss  # noqa: E402
+
+from indices_faiss import configurar_busqueda, crear_indice, describir, vectores_e_ids  # noqa: E402
+
+CONSULTAS = 300
+EF_SEARCH = (16, 32, 64, 128, 256)
+NPROBE = (1, 4, 8, 16, 32)
+
+
+def sinteticos(n, dim, semilla=7):
+    """Vectores normalizados alrededor de centros, parecidos a temas de un curso."""
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((max(16, n // 250), dim)).astype("float32")
+    x = centros[rng.integers(0, len(centros), n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+
+def consultas_desde(x, semilla=11):
+    rng = np.random.default_rng(semilla)
+    q = x[rng.integers(0, len(x), CONSULTAS)] + 0.1 * rng.standard_normal((CONSULTAS, x.shape[1])).astype("float32")
+    faiss.normalize_L2(q)
+    return q
+
+
+def medir(index, q, exactos, k):
+    latencias = []
+    aciertos = 0
+    for i in range(len(q)):
+        inicio = time.perf_counter()
+        _, I = index.search(q[i:i + 1], k)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        aciertos += len(set(I[0]) & set(exactos[i]))
+    latencias.sort()
+    return aciertos / (len(q) * k), latencias[len(latencias) // 2], latencias[int(len(latencias) * 0.95)]
+
+
+def indice_vigente(store="index_store"):
+    """Archivo del índice que publica el manifiesto (o el nombre del formato anterior)."""
+    try:
+        with open(os.path.join(store, "manifiesto.json"), encoding="utf-8") as f:
+            return os.path.join(store, json.load(f).get("indice", "indice.faiss"))
+    except (OSError, ValueError):
+        return os.path.join(store, "indice.faiss")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "indice":
+        x, _ = vectores_e_ids(faiss.read_index(indice_vigente()))
+        k = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    else:
+        n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+        dim = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+        x = sinteticos(n, dim)
+    q = consultas_desde(x)
+    print(f"Vectores: {len(x)} x {x.shape[1]}  consultas: {len(q)}  k: {k}\n")
+
+    print(f"{'índice':<10}{'parámetro':<14}{'recall@k':>9}{'p50 ms':>9}{'p95 ms':>9}{'constr. s':>11}{'MB':>8}")
+    exactos = None
+    for tipo in ("flat", "hnsw", "ivf", "ivfpq"):
+        inicio = time.perf_counter()
+        index = crear_indice(x, tipo=tipo)
+        construccion = time.perf_counter() - inicio
+        # Con pocos vectores IVF/PQ no se pueden entrenar y crear_indice construye otro tipo
+        construido = describir(index)
+        if construido != tipo:
+            print(f"{tipo:<10}{'omitido':<14}  sin vectores suficientes para entrenarlo (se construiría {construido})")
+            continue
+        mb = len(faiss.serialize_index(index)) / 1e6
+        if tipo == "flat":
+            _, exactos = index.search(q, k)
+            barrido = [("-", None)]
+        elif tipo == "hnsw":
+            barrido = [(f"efSearch={v}", {"ef_search": v}) for v in EF_SEARCH]
+        else:
+            barrido = [(f"nprobe={v}", {"nprobe": v}) for v in NPROBE]
+        for etiqueta, parametros in barrido:
+            if parametros:
+                configurar_busqueda(index, **parametros)
+            recall, p50, p95 = medir(index, q, exactos, k)
+            print(f"{tipo:<10}{etiqueta:<14}{recall:>9.3f}{p50:>9.3f}{p95:>9.3f}{construccion:>11.2f}{mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
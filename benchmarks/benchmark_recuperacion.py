@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Benchmark repetible de calidad y latencia de la recuperación.
+Reproduce las preguntas con respuesta conocida (material/preguntas_tipo.txt y
+PREGUNTAS_QUIZ) en tres modos: solo vectorial y híbrida (buscar_similares con
+hibrida=False/True) y solo BM25 (buscar_lexico). Mide:
+
+- recall@k: fracción de preguntas con algún chunk que contiene la respuesta
+  entre los k primeros (k = 1, 3, 5, 10), y MRR;
+- latencia p50/p95/p99 del embedding, de la búsqueda y del total;
+- camino sin red (buscar_sin_red): cuántas preguntas responde solo BM25
+  y cuántas de ellas con la respuesta en el top 5;
+- memoria: RSS y pico del proceso, tamaño serializado del índice y del BM25.
+
+Un chunk "contiene la respuesta" si tiene la mayoría de los términos de la
+opción correcta; los chunks de preguntas_tipo.txt se descartan de los
+resultados (tienen la respuesta literal). Las preguntas cuya respuesta no
+está en ningún chunk se informan aparte y no cuentan en recall.
+
+Embedders:
+- local (por defecto): vector_determinista de servidor_embeddings_falso, sin
+  red. Se construye un índice propio (INDICE_TIPO o --tipo) con los chunks
+  de la versión vigente de index_store, o del material si no hay índice.
+- openai: el índice de index_store y el modelo EMBED_MODEL (requiere API).
+
+Los resultados se escriben en JSON (benchmarks/resultados/ por defecto);
+--comparar muestra las diferencias con una corrida anterior.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/benchmark_recuperacion.py [--embedder local|openai] [--tipo hnsw]
+        [--modos vectorial,hibrida,bm25] [--umbral 0.0] [--repeticiones 3]
+        [--salida archivo.json] [--comparar anterior.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import faiss  # noqa: E402
+
+import embedding_utils  # noqa: E402
+from almacen_chunks import AlmacenChunks  # noqa: E402
+from indice_bm25 import terminos  # noqa: E402
+from indices_faiss import crear_indice, describir  # noqa: E402
+from preguntas_quiz import PREGUNTAS_QUIZ  # noqa: E402
+from servidor_embeddings_falso import vector_determinista  # noqa: E402
+
+KS = (1, 3, 5, 10)
+MODOS = ("vectorial", "hibrida", "bm25")
+PREGUNTAS_PATH = os.path.join("material", "preguntas_tipo.txt")
+EXCLUIR = os.path.basename(PREGUNTAS_PATH)
+COBERTURA_MIN = 0.8  # fracción de términos de la opción correcta que debe tener el chunk
+
+
+def memoria_mb():
+    """RSS actual y pico del proceso en MB (/proc en Linux; si no, solo el pico de getrusage)."""
+    try:
+        valores = {}
+        with open("/proc/self/status") as f:
+            for linea in f:
+                clave, _, resto = linea.partition(":")
+                if clave in ("VmRSS", "VmHWM"):
+                    valores[clave] = round(int(resto.split()[0]) / 1024, 1)
+        return {"rss": valores.get("VmRSS"), "pico": valores.get("VmHWM")}
+    except OSError:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss": None, "pico": round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)}
+
+
+def percentiles(valores):
+    if not valores:
+        return {"p50": None, "p95": None, "p99": None}
+    return {f"p{p}": round(float(np.percentile(valores, p)), 3) for p in (50, 95, 99)}
+
+
+class EmbedderLocal:
+    """Bolsa de palabras con hashing, sin red (el mismo vector que sirve servidor_embeddings_falso)."""
+
+    nombre = "local"
+
+    def embeber(self, textos):
+        return np.vstack([vector_determinista(t) for t in textos]).astype("float32")
+
+
+class EmbedderOpenAI:
+    """EMBED_MODEL por el cliente de embedding_utils, sin pasar por el caché de consultas."""
+
+    nombre = "openai"
+
+    def __init__(self):
+        if embedding_utils._client is None:
+            raise SystemExit("❌ El embedder openai requiere OPENAI_API_KEY")
+
+    def embeber(self, textos):
+        datos = embedding_utils._client.embeddings.create(model=embedding_utils.EMBED_MODEL, input=textos).data
+        arr = np.array([d.embedding for d in datos], dtype="float32")
+        faiss.normalize_L2(arr)
+        return arr
+
+
+def leer_preguntas(path=PREGUNTAS_PATH):
+    """[(pregunta, texto de la opción correcta)] desde el formato numerado con 'Respuesta: X'."""
+    with open(path, encoding="utf-8") as f:
+        bloques = re.split(r"\n\s*\n", f.read())
+    preguntas = []
+    for bloque in bloques:
+        lineas = [l.strip() for l in bloque.strip().splitlines() if l.strip()]
+        if len(lineas) < 3 or not re.match(r"\d+\.", lineas[0]):
+            continue
+        opciones = {m.group(1): m.group(2) for m in (re.match(r"([A-D])\)\s*(.+)", l) for l in lineas) if m}
+        respuesta = next((re.sub(r"Respuesta:\s*", "", l) for l in lineas if l.startswith("Respuesta:")), "")
+        correcta = opciones.get(respuesta.strip()[:1])
+        if correcta:
+            preguntas.append((re.sub(r"^\d+\.\s*", "", lineas[0]), correcta))
+    return preguntas
+
+
+def es_acierto(texto, correcta):
+    esperados = set(terminos(correcta))
+    if not esperados:
+        return False
+    return len(esperados & set(terminos(texto))) / len(esperados) >= COBERTURA_MIN
+
+
+def cargar_preguntas(fuente):
+    preguntas = []
+    if fuente in ("tipo", "todas"):
+        preguntas += [{"fuente": "preguntas_tipo", "pregunta": p, "respuesta": r} for p, r in leer_preguntas()]
+    if fuente in ("quiz", "todas"):
+        preguntas += [{"fuente": "quiz", "pregunta": q["pregunta"], "respuesta": q["correcta"]} for q in PREGUNTAS_QUIZ]
+    return preguntas
+
+
+def chunks_locales():
+    """Los mismos chunks de la versión vigente del índice o, si no hay, extraídos del material."""
+    _, ruta_metadatos = embedding_utils.rutas_publicadas()
+    if os.path.exists(ruta_metadatos):
+        almacen = AlmacenChunks(ruta_metadatos, crear=False)
+        chunks = list(almacen)
+        almacen.cerrar()
+        if any(chunks):
+            return chunks
+    chunks = []
+    rutas = [os.path.join(embedding_utils.MATERIAL_DIR, rel) for rel in embedding_utils._listar_archivos()]
+    for docs in embedding_utils._extraer_documentos(rutas):
+        for doc in docs:
+            for texto in embedding_utils._chunk_text(doc["texto"]):
+                chunks.append({"texto": texto, "archivo": doc["archivo"], "pagina": doc["pagina"]})
+    return chunks
+
+
+def preparar_indice(embedder, tipo):
+    """(índice, chunks, segundos de construcción) para el embedder elegido."""
+    inicio = time.perf_counter()
+    if embedder.nombre == "openai":
+        indice, textos = embedding_utils.cargar_o_crear_indice([])
+        return indice, textos, time.perf_counter() - inicio
+    textos = chunks_locales()
+    ids = np.array([i for i, md in enumerate(textos) if md is not None], dtype="int64")
+    vectores = embedder.embeber([textos[i]["texto"] for i in ids])
+    indice = crear_indice(vectores, ids, tipo)
+    return indice, textos, time.perf_counter() - inicio
+
+
+def respuestas_en_corpus(preguntas, textos):
+    """ids de los chunks (fuera de preguntas_tipo.txt) que contienen la respuesta de cada pregunta."""
+    for p in preguntas:
+        p["chunks_respuesta"] = {i for i, md in enumerate(textos)
+                                 if md is not None and md.get("archivo") != EXCLUIR
+                                 and es_acierto(md["texto"], p["respuesta"])}
+
+
+def buscar(modo, pregunta, vector, indice, textos, k, umbral):
+    if modo == "bm25":
+        return embedding_utils.buscar_lexico(pregunta, textos, k)
+    return embedding_utils.buscar_similares(pregunta, indice, textos, k=k, umbral=umbral, vector=vector,
+                                            hibrida=modo == "hibrida")
+
+
+def posicion_respuesta(resultados, chunks_respuesta, kmax):
+    """Posición (desde 1) del primer chunk con la respuesta entre los kmax primeros, o None."""
+    ids = [r["id"] for r in resultados if r.get("archivo") != EXCLUIR][:kmax]
+    return next((n for n, i in enumerate(ids, start=1) if i in chunks_respuesta), None)
+
+
+def medir_modo(modo, preguntas, embedder, indice, textos, umbral, repeticiones, extra):
+    kmax = max(KS)
+    t_embedding, t_busqueda, t_total = [], [], []
+    aciertos = {k: 0 for k in KS}
+    rr = []
+    for p in preguntas:
+        for repeticion in range(repeticiones):
+            inicio = time.perf_counter()
+            vector = embedder.embeber([p["pregunta"]]) if modo != "bm25" else None
+            medio = time.perf_counter()
+            resultados = buscar(modo, p["pregunta"], vector, indice, textos, kmax + extra, umbral)
+            fin = time.perf_counter()
+            t_embedding.append((medio - inicio) * 1000)
+            t_busqueda.append((fin - medio) * 1000)
+            t_total.append((fin - inicio) * 1000)
+        if not p["chunks_respuesta"]:
+            continue
+        posicion = posicion_respuesta(resultados, p["chunks_respuesta"], kmax)
+        rr.append(1.0 / posicion if posicion else 0.0)
+        for k in KS:
+            if posicion and posicion <= k:
+                aciertos[k] += 1
+    evaluadas = len(rr)
+    return {
+        "recall": {f"@{k}": round(aciertos[k] / evaluadas, 3) if evaluadas else None for k in KS},
+        "mrr": round(sum(rr) / evaluadas, 3) if evaluadas else None,
+        "latencia_ms": {
+            "embedding": percentiles(t_embedding),
+            "busqueda": percentiles(t_busqueda),
+            "total": percentiles(t_total)
+        }
+    }
+
+
+def medir_sin_red(preguntas, textos, extra, k=5):
+    """Preguntas que toma buscar_sin_red (sin embedding) y cuántas tienen la respuesta en el top k."""
+    directas = aciertos = 0
+    for p in preguntas:
+        resultados = embedding_utils.buscar_sin_red(p["pregunta"], textos, k + extra)
+        if not resultados:
+            continue
+        directas += 1
+        if posicion_respuesta(resultados, p["chunks_respuesta"], k):
+            aciertos += 1
+    return {"preguntas": directas, f"aciertos@{k}": aciertos}
+
+
+def comparar(actual, anterior_path):
+    with open(anterior_path, encoding="utf-8") as f:
+        anterior = json.load(f)
+    print(f"\nComparación con {anterior_path} ({anterior.get('fecha', '?')}):")
+    for modo, r in actual["modos"].items():
+        previo = anterior.get("modos", {}).get(modo)
+        if not previo:
+            continue
+        d_recall = (r["recall"]["@5"] or 0) - (previo["recall"]["@5"] or 0)
+        p95, p95_previo = r["latencia_ms"]["busqueda"]["p95"], previo["latencia_ms"]["busqueda"]["p95"]
+        print(f"  {modo:<10} recall@5 {d_recall:+.3f}   búsqueda p95 {p95_previo} → {p95} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de recuperación sobre preguntas con respuesta conocida")
+    parser.add_argument("--embedder", choices=("local", "openai"), default="local")
+    parser.add_argument("--tipo", default=None, help="tipo de índice para el embedder local (flat/hnsw/ivf/ivfpq)")
+    parser.add_argument("--modos", default=",".join(MODOS))
+    parser.add_argument("--fuente", choices=("tipo", "quiz", "todas"), default="todas")
+    parser.add_argument("--umbral", type=float, default=0.0)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", default=None)
+    parser.add_argument("--comparar", default=None)
+    args = parser.parse_args()
+
+    memoria_inicial = memoria_mb()
+    embedder = EmbedderLocal() if args.embedder == "local" else EmbedderOpenAI()
+    preguntas = cargar_preguntas(args.fuente)
+    indice, textos, construccion = preparar_indice(embedder, args.tipo)
+    if indice is None:
+        raise SystemExit("❌ No hay índice ni chunks: agrega material y vuelve a intentar")
+    inicio = time.perf_counter()
+    lexico = embedding_utils.indice_lexico(textos)
+    construccion_bm25 = time.perf_counter() - inicio
+    respuestas_en_corpus(preguntas, textos)
+    memoria_indice = memoria_mb()
+    # Resultados de más para poder descartar los chunks de preguntas_tipo.txt sin acortar el top-k
+    extra = sum(1 for md in textos if md is not None and md.get("archivo") == EXCLUIR)
+
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "configuracion": {
+            "embedder": embedder.nombre,
+            "modelo": embedding_utils.EMBED_MODEL if embedder.nombre == "openai" else "vector_determinista",
+            "indice": describir(indice),
+            "umbral": args.umbral,
+            "repeticiones": args.repeticiones,
+            "fuente": args.fuente,
+            "python": platform.python_version(),
+            "faiss": getattr(faiss, "__version__", "?")
+        },
+        "corpus": {
+            "chunks": indice.ntotal,
+            "preguntas": len(preguntas),
+            "sin_respuesta_en_material": sum(1 for p in preguntas if not p["chunks_respuesta"]),
+            "construccion_indice_s": round(construccion, 3),
+            "construccion_bm25_s": round(construccion_bm25, 3)
+        },
+        "modos": {},
+        "memoria_mb": {
+            "inicial": memoria_inicial,
+            "con_indice": memoria_indice,
+            "indice_serializado": round(len(faiss.serialize_index(indice)) / 1e6, 2),
+            "bm25": lexico.estadisticas() if lexico else None
+        }
+    }
+
+    for modo in [m.strip() for m in args.modos.split(",") if m.strip()]:
+        if modo not in MODOS:
+            raise SystemExit(f"❌ Modo desconocido: {modo}. Opciones: {', '.join(MODOS)}")
+        resultado["modos"][modo] = medir_modo(modo, preguntas, embedder, indice, textos,
+                                              args.umbral, args.repeticiones, extra)
+    resultado["sin_red"] = medir_sin_red(preguntas, textos, extra)
+    resultado["memoria_mb"]["final"] = memoria_mb()
+
+    c = resultado["corpus"]
+    print(f"Embedder: {embedder.nombre}  índice: {describir(indice)}  chunks: {c['chunks']}  "
+          f"preguntas: {c['preguntas']} ({c['sin_respuesta_en_material']} sin respuesta en el material)\n")
+    print(f"{'modo':<11}" + "".join(f"{'R@' + str(k):>7}" for k in KS)
+          + f"{'MRR':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for modo, r in resultado["modos"].items():
+        lat = r["latencia_ms"]["total"]
+        print(f"{modo:<11}" + "".join(f"{r['recall']['@' + str(k)] or 0:>7.3f}" for k in KS)
+              + f"{r['mrr'] or 0:>7.3f}{lat['p50']:>9.3f}{lat['p95']:>9.3f}{lat['p99']:>9.3f}")
+    s = resultado["sin_red"]
+    print(f"\nSin red (solo BM25): {s['preguntas']}/{c['preguntas']} preguntas, "
+          f"{s['aciertos@5']} con la respuesta en el top 5")
+    m = resultado["memoria_mb"]
+    print(f"Memoria: RSS {m['inicial']['rss']} → {m['final']['rss']} MB (pico {m['final']['pico']} MB), "
+          f"índice {m['indice_serializado']} MB")
+
+    salida = args.salida or os.path.join(
+        RAIZ, "benchmarks", "resultados", f"recuperacion_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados en {salida}")
+
+    if args.comparar:
+        comparar(resultado, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
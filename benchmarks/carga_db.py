@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Generador de carga local para comparar los endpoints de base de datos sync
+con sus versiones async (/async/...). Lanza N peticiones con C en vuelo y
+muestra peticiones por segundo y latencias p50/p95 de cada variante.
+
+Uso (con la API corriendo, por ejemplo `uvicorn api:app --port 8000`):
+    python benchmarks/carga_db.py [url_base] [peticiones] [concurrencia]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+
+ESCENARIOS = {
+    "analytics_estudiante": lambda ids: ("GET", f"/analytics/estudiante/{random.choice(ids)}", None),
+    "quiz_resultado": lambda ids: ("POST", "/quiz/resultado", {
+        "estudiante_id": random.choice(ids), "puntaje": random.randint(0, 100),
+        "preguntas_correctas": 5, "total_preguntas": 7, "tiempo_completado_minutos": 4
+    }),
+    "dashboard": lambda ids: ("GET", "/analytics/dashboard", None),
+}
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else 0.0
+
+
+async def correr(cliente, prefijo, escenario, ids, peticiones, concurrencia):
+    latencias, errores = [], 0
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def una():
+        nonlocal errores
+        metodo, ruta, cuerpo = ESCENARIOS[escenario](ids)
+        async with semaforo:
+            inicio = time.perf_counter()
+            r = await cliente.request(metodo, prefijo + ruta, json=cuerpo)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if r.status_code >= 400:
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una() for _ in range(peticiones)))
+    total = time.perf_counter() - inicio
+    return peticiones / total, percentil(latencias, 0.5), percentil(latencias, 0.95), errores
+
+
+async def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:8000"
+    peticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    concurrencia = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    limites = httpx.Limits(max_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60) as cliente:
+        ids = []
+        for i in range(20):
+            r = await cliente.post("/estudiantes/registrar", json={
+                "nombre": f"Carga {i}", "email": f"carga{i}-{time.time_ns()}@ejemplo.cl", "grupo": "Carga"
+            })
+            ids.append(r.json()["id"])
+
+        print(f"{'escenario':<22}{'variante':<8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errores':>9}")
+        for escenario in ESCENARIOS:
+            for variante, prefijo in (("sync", ""), ("async", "/async")):
+                rps, p50, p95, errores = await correr(cliente, prefijo, escenario, ids, peticiones, concurrencia)
+                print(f"{escenario:<22}{variante:<8}{rps:>9.1f}{p50:>9.1f}{p95:>9.1f}{errores:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Reproduce un log de preguntas contra buscar_con_umbrales y muestra
+cuántas llamadas de embedding se ahorran al reutilizar el vector de la
+pregunta entre el umbral principal y el secundario.
+
+Uso:
+    python benchmarks/reproducir_preguntas.py [archivo_log]
+
+El log tiene una pregunta por línea. Sin argumento se usan las preguntas
+de material/preguntas_tipo.txt.
+"""
+
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_utils import (  # noqa: E402
+    buscar_con_umbrales, cargar_o_crear_indice, estadisticas_embeddings, indice_lexico
+)
+
+UMBRAL_PRINCIPAL = float(os.getenv("UMBRAL_SIMILITUD_PRINCIPAL", "0.7"))
+UMBRAL_SECUNDARIO = float(os.getenv("UMBRAL_SIMILITUD_SECUNDARIO", "0.5"))
+PREGUNTAS_TIPO = os.path.join("material", "preguntas_tipo.txt")
+
+
+def leer_preguntas(ruta):
+    """Lee una pregunta por línea; en preguntas_tipo.txt toma solo los enunciados numerados."""
+    with open(ruta, "r", encoding="utf-8") as f:
+        lineas = [l.strip() for l in f if l.strip()]
+    numeradas = [re.sub(r"^\d+\.\s*", "", l) for l in lineas if re.match(r"^\d+\.\s", l)]
+    return numeradas or lineas
+
+
+def main():
+    ruta = sys.argv[1] if len(sys.argv) > 1 else PREGUNTAS_TIPO
+    preguntas = leer_preguntas(ruta)
+    indice, textos = cargar_o_crear_indice([])
+    indice_lexico(textos)  # BM25 listo antes de medir (en la API se arma en segundo plano)
+
+    fallback = 0
+    for pregunta in preguntas:
+        _, umbral = buscar_con_umbrales(pregunta, indice, textos, k=3,
+                                        umbrales=(UMBRAL_PRINCIPAL, UMBRAL_SECUNDARIO))
+        if umbral != UMBRAL_PRINCIPAL:
+            fallback += 1
+
+    llamadas = estadisticas_embeddings["llamadas_consulta"]
+    ahorradas = estadisticas_embeddings["llamadas_ahorradas"]
+    print(f"Preguntas reproducidas: {len(preguntas)}")
+    print(f"Preguntas que usaron el umbral secundario: {fallback}")
+    print(f"Llamadas de embedding realizadas: {llamadas}")
+    print(f"Llamadas con el flujo anterior: {llamadas + ahorradas}")
+    print(f"Llamadas ahorradas: {ahorradas}")
+
+
+if __name__ == "__main__":
+    main()
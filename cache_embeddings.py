@@ -0,0 +1,137 @@
+"""
+Caché de embeddings de consultas en dos niveles:
+un LRU acotado en memoria y una tabla SQLite en disco (junto al índice FAISS)
+para que las preguntas repetidas no vuelvan a llamar a OpenAI y el caché
+sobreviva a los reinicios.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def normalizar_consulta(texto: str) -> str:
+    """Normaliza una consulta para usarla como clave (minúsculas y espacios colapsados)."""
+    return " ".join(texto.lower().split())
+
+
+class CacheEmbeddings:
+    """Caché LRU en memoria con respaldo persistente en SQLite."""
+
+    def __init__(self, ruta_db: str, modelo: str, capacidad_memoria: int = 1024, capacidad_disco: int = 50000):
+        self.ruta_db = ruta_db
+        self.modelo = modelo
+        self.capacidad_memoria = capacidad_memoria
+        self.capacidad_disco = capacidad_disco
+        self._memoria: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats = {
+            "hits_memoria": 0,
+            "hits_disco": 0,
+            "misses": 0,
+            "evicciones_memoria": 0,
+            "evicciones_disco": 0
+        }
+
+    def _clave(self, texto: str) -> str:
+        return hashlib.sha256(f"{self.modelo}\n{normalizar_consulta(texto)}".encode("utf-8")).hexdigest()
+
+    def _conexion(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.ruta_db) or ".", exist_ok=True)
+                conn = sqlite3.connect(self.ruta_db, check_same_thread=False)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings_consulta ("
+                    "clave TEXT PRIMARY KEY, modelo TEXT, vector BLOB, ultimo_uso REAL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_embeddings_consulta_uso ON embeddings_consulta (ultimo_uso)"
+                )
+                conn.commit()
+                self._conn = conn
+            except Exception as e:
+                print(f"⚠️ Caché de embeddings sin disco: {e}")
+                return None
+        return self._conn
+
+    def _guardar_memoria(self, clave: str, vector: np.ndarray) -> None:
+        self._memoria[clave] = vector
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.capacidad_memoria:
+            self._memoria.popitem(last=False)
+            self._stats["evicciones_memoria"] += 1
+
+    def obtener(self, texto: str) -> Optional[np.ndarray]:
+        """Devuelve el vector guardado para la consulta o None si no está."""
+        clave = self._clave(texto)
+        with self._lock:
+            vector = self._memoria.get(clave)
+            if vector is not None:
+                self._memoria.move_to_end(clave)
+                self._stats["hits_memoria"] += 1
+                return vector
+
+            conn = self._conexion()
+            fila = None
+            if conn is not None:
+                try:
+                    fila = conn.execute(
+                        "SELECT vector FROM embeddings_consulta WHERE clave = ?", (clave,)
+                    ).fetchone()
+                    if fila is not None:
+                        conn.execute(
+                            "UPDATE embeddings_consulta SET ultimo_uso = ? WHERE clave = ?", (time.time(), clave)
+                        )
+                        conn.commit()
+                except sqlite3.Error:
+                    fila = None
+            if fila is None:
+                self._stats["misses"] += 1
+                return None
+
+            vector = np.frombuffer(fila[0], dtype="float32")
+            self._stats["hits_disco"] += 1
+            self._guardar_memoria(clave, vector)
+            return vector
+
+    def guardar(self, texto: str, vector: np.ndarray) -> None:
+        """Guarda el vector (float32, ya normalizado) en memoria y en disco."""
+        clave = self._clave(texto)
+        vector = np.ascontiguousarray(vector, dtype="float32").reshape(-1)
+        with self._lock:
+            self._guardar_memoria(clave, vector)
+            conn = self._conexion()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO embeddings_consulta (clave, modelo, vector, ultimo_uso) VALUES (?, ?, ?, ?)",
+                    (clave, self.modelo, vector.tobytes(), time.time())
+                )
+                total = conn.execute("SELECT COUNT(*) FROM embeddings_consulta").fetchone()[0]
+                exceso = total - self.capacidad_disco
+                if exceso > 0:
+                    conn.execute(
+                        "DELETE FROM embeddings_consulta WHERE clave IN ("
+                        "SELECT clave FROM embeddings_consulta ORDER BY ultimo_uso LIMIT ?)", (exceso,)
+                    )
+                    self._stats["evicciones_disco"] += exceso
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ No se pudo guardar embedding en disco: {e}")
+
+    def estadisticas(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["en_memoria"] = len(self._memoria)
+        consultas = stats["hits_memoria"] + stats["hits_disco"] + stats["misses"]
+        stats["tasa_acierto"] = round((stats["hits_memoria"] + stats["hits_disco"]) / consultas, 4) if consultas else 0.0
+        return stats
@@ -0,0 +1,108 @@
+"""
+Caché semántico de respuestas para /preguntar.
+Reutiliza la respuesta de una pregunta anterior cuando la nueva pregunta es
+casi idéntica (distancia coseno pequeña entre embeddings) y recupera los
+mismos fragmentos del material con la misma versión del prompt e índice.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class _Entrada:
+    __slots__ = ("vector", "fragmentos", "respuesta", "creado")
+
+    def __init__(self, vector: np.ndarray, fragmentos: Tuple[int, ...], respuesta: str):
+        self.vector = vector
+        self.fragmentos = fragmentos
+        self.respuesta = respuesta
+        self.creado = time.time()
+
+
+class CacheRespuestas:
+    """Caché LRU con TTL de respuestas indexado por los fragmentos recuperados."""
+
+    def __init__(self, distancia_max: float = 0.08, ttl_segundos: float = 86400, capacidad: int = 500):
+        self.distancia_max = distancia_max
+        self.ttl_segundos = ttl_segundos
+        self.capacidad = capacidad
+        self._entradas: "OrderedDict[int, _Entrada]" = OrderedDict()
+        self._por_fragmentos: Dict[Tuple[int, ...], List[int]] = {}
+        self._version: Optional[Tuple[str, str]] = None
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expiradas": 0, "evicciones": 0, "invalidaciones": 0}
+
+    def _quitar(self, clave: int) -> None:
+        entrada = self._entradas.pop(clave)
+        grupo = self._por_fragmentos.get(entrada.fragmentos)
+        if grupo is not None:
+            grupo.remove(clave)
+            if not grupo:
+                del self._por_fragmentos[entrada.fragmentos]
+
+    def _verificar_version(self, version_prompt: str, version_indice: str) -> None:
+        """Vacía el caché si cambió el prompt o el índice."""
+        version = (version_prompt, version_indice)
+        if self._version != version:
+            if self._entradas:
+                self._stats["invalidaciones"] += 1
+            self._entradas.clear()
+            self._por_fragmentos.clear()
+            self._version = version
+
+    def buscar(self, vector: np.ndarray, fragmentos: Sequence[int], version_prompt: str, version_indice: str) -> Optional[str]:
+        """Devuelve la respuesta cacheada más parecida o None."""
+        fragmentos = tuple(fragmentos)
+        vector = np.asarray(vector, dtype="float32").reshape(-1)
+        ahora = time.time()
+        with self._lock:
+            self._verificar_version(version_prompt, version_indice)
+            mejor_clave, mejor_similitud = None, 1.0 - self.distancia_max
+            for clave in list(self._por_fragmentos.get(fragmentos, [])):
+                entrada = self._entradas[clave]
+                if ahora - entrada.creado > self.ttl_segundos:
+                    self._quitar(clave)
+                    self._stats["expiradas"] += 1
+                    continue
+                similitud = float(np.dot(entrada.vector, vector))
+                if similitud >= mejor_similitud:
+                    mejor_clave, mejor_similitud = clave, similitud
+            if mejor_clave is None:
+                self._stats["misses"] += 1
+                return None
+            self._entradas.move_to_end(mejor_clave)
+            self._stats["hits"] += 1
+            return self._entradas[mejor_clave].respuesta
+
+    def guardar(self, vector: np.ndarray, fragmentos: Sequence[int], version_prompt: str, version_indice: str, respuesta: str) -> None:
+        fragmentos = tuple(fragmentos)
+        vector = np.array(vector, dtype="float32").reshape(-1)
+        with self._lock:
+            self._verificar_version(version_prompt, version_indice)
+            clave = next(self._ids)
+            self._entradas[clave] = _Entrada(vector, fragmentos, respuesta)
+            self._por_fragmentos.setdefault(fragmentos, []).append(clave)
+            while len(self._entradas) > self.capacidad:
+                self._quitar(next(iter(self._entradas)))
+                self._stats["evicciones"] += 1
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._por_fragmentos.clear()
+            self._version = None
+            self._stats["invalidaciones"] += 1
+
+    def estadisticas(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["entradas"] = len(self._entradas)
+        consultas = stats["hits"] + stats["misses"]
+        stats["tasa_acierto"] = round(stats["hits"] / consultas, 4) if consultas else 0.0
+        return stats
@@ -0,0 +1,118 @@
+"""
+Carga del índice FAISS en segundo plano.
+Cargar o reconstruir el índice puede tardar (embeddings del material nuevo),
+así que la API no lo hace al importarse: el evento de startup lanza un hilo y
+uvicorn abre el puerto de inmediato. /health responde siempre; /ready y
+/preguntar consultan el estado. Las recargas posteriores (/indice/sincronizar)
+pasan por el mismo candado para no procesar el material dos veces a la vez.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PENDIENTE = "pendiente"
+CARGANDO = "cargando"
+LISTO = "listo"
+ERROR = "error"
+
+
+class CargaIndice:
+    """Estado de carga del índice; 'cargar' hace el trabajo y deja el índice donde lo use la API."""
+
+    def __init__(self, cargar: Callable[[], Any]):
+        self.cargar = cargar
+        self.estado = PENDIENTE
+        self.error: Optional[str] = None
+        self.duracion_s: Optional[float] = None
+        self.listo_desde: Optional[datetime] = None
+        self._listo = threading.Event()
+        self._candado = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        # Consultas esperando la primera carga: (su event loop, su asyncio.Event)
+        self._esperando: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._candado_esperando = threading.Lock()
+
+    @property
+    def listo(self) -> bool:
+        return self._listo.is_set()
+
+    def iniciar(self) -> None:
+        """Lanza la primera carga en un hilo (no bloquea el arranque)."""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._primera_carga, name="carga-indice", daemon=True)
+            self._hilo.start()
+
+    def _primera_carga(self) -> None:
+        try:
+            self.ejecutar()
+        except Exception as e:
+            print(f"❌ Error cargando el índice: {e}")
+
+    def ejecutar(self, cargar: Optional[Callable[[], Any]] = None) -> Any:
+        """Carga (o recarga, con otra función) el índice en el hilo actual.
+        Un índice ya listo sigue sirviendo mientras tanto.
+        """
+        with self._candado:
+            if not self.listo:
+                self.estado = CARGANDO
+            inicio = time.perf_counter()
+            try:
+                resultado = (cargar or self.cargar)()
+            except Exception as e:
+                self.error = str(e)
+                if not self.listo:
+                    self.estado = ERROR
+                    self._avisar()
+                raise
+            self.duracion_s = round(time.perf_counter() - inicio, 3)
+            self.error = None
+            self.estado = LISTO
+            if not self.listo:
+                self.listo_desde = datetime.now()
+                self._listo.set()
+                self._avisar()
+            return resultado
+
+    def _avisar(self) -> None:
+        """Despierta, desde el hilo de carga, a las consultas que esperan en sus event loops."""
+        with self._candado_esperando:
+            esperando, self._esperando = self._esperando, []
+        for loop, evento in esperando:
+            try:
+                loop.call_soon_threadsafe(evento.set)
+            except RuntimeError:
+                pass  # el loop ya se cerró
+
+    async def esperar(self, timeout: float) -> bool:
+        """Espera hasta 'timeout' segundos a que el índice esté listo sin bloquear el event loop
+        ni ocupar un hilo del executor por cada consulta en espera.
+        """
+        if self.listo or timeout <= 0 or self.estado == ERROR:
+            return self.listo
+        espera = (asyncio.get_running_loop(), asyncio.Event())
+        with self._candado_esperando:
+            # Revisado bajo el candado: _avisar marca el estado antes de vaciar la lista
+            if self.listo or self.estado == ERROR:
+                return self.listo
+            self._esperando.append(espera)
+        try:
+            await asyncio.wait_for(espera[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._candado_esperando:
+                if espera in self._esperando:
+                    self._esperando.remove(espera)
+        return self.listo
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            "estado": self.estado,
+            "listo": self.listo,
+            "error": self.error,
+            "duracion_s": self.duracion_s,
+            "listo_desde": self.listo_desde.isoformat() if self.listo_desde else None
+        }
@@ -0,0 +1,107 @@
+"""
+Repositorio en memoria de los casos clínicos.
+Lee casos_clinicos.json una vez, lo indexa por caso_id y por
+(caso_id, pregunta_id) y deja serializadas las respuestas que no dependen de
+parámetros. Solo vuelve a leer el archivo cuando cambia su fecha de
+modificación (el panel de administración lo edita con save_casos_clinicos).
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+class _Instantanea(NamedTuple):
+    mtime: float
+    casos: List[Dict[str, Any]]
+    por_id: Dict[int, Dict[str, Any]]
+    por_pregunta: Dict[Tuple[int, int], Dict[str, Any]]
+    json_casos: bytes
+    json_quiz: bytes
+
+
+def _serializar(datos: Dict[str, Any]) -> bytes:
+    return json.dumps(datos, ensure_ascii=False).encode("utf-8")
+
+
+class RepositorioCasos:
+    """Casos clínicos indexados, recargados solo cuando cambia el archivo."""
+
+    def __init__(self, ruta: str = "casos_clinicos.json", intervalo: float = 2.0):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._ultima_revision = 0.0
+        self._instantanea = self._construir(-1.0, [])
+
+    def _construir(self, mtime: float, casos: List[Dict[str, Any]]) -> _Instantanea:
+        por_id = {c["id"]: c for c in casos}
+        por_pregunta = {(c["id"], p["id"]): p for c in casos for p in c.get("preguntas", [])}
+        json_casos = _serializar({
+            "status": "success",
+            "casos": casos,
+            "total_casos": len(casos)
+        })
+        if casos:
+            json_quiz = _serializar({
+                "status": "success",
+                "quiz": {
+                    "titulo": "Quiz de Casos Clínicos - Auxiliar de Farmacia",
+                    "descripcion": "Evaluación basada en casos clínicos reales",
+                    "casos": casos,
+                    "total_casos": len(casos),
+                    "total_preguntas": sum(len(caso["preguntas"]) for caso in casos)
+                }
+            })
+        else:
+            json_quiz = _serializar({
+                "status": "error",
+                "message": "No hay casos clínicos disponibles"
+            })
+        return _Instantanea(mtime, casos, por_id, por_pregunta, json_casos, json_quiz)
+
+    def _actual(self) -> _Instantanea:
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < self.intervalo:
+            return self._instantanea
+        self._ultima_revision = ahora
+        try:
+            mtime = os.path.getmtime(self.ruta)
+        except OSError:
+            mtime = 0.0
+        if mtime == self._instantanea.mtime:
+            return self._instantanea
+
+        with self._lock:
+            if mtime == self._instantanea.mtime:
+                return self._instantanea
+            casos: List[Dict[str, Any]] = []
+            if mtime:
+                try:
+                    with open(self.ruta, "r", encoding="utf-8") as f:
+                        casos = json.load(f).get("casos_clinicos", [])
+                except Exception as e:
+                    print(f"Error al cargar casos clínicos: {e}")
+                    return self._instantanea
+            self._instantanea = self._construir(mtime, casos)
+            print(f"📋 Casos clínicos cargados: {len(casos)}")
+        return self._instantanea
+
+    def todos(self) -> List[Dict[str, Any]]:
+        return self._actual().casos
+
+    def caso(self, caso_id: int) -> Optional[Dict[str, Any]]:
+        return self._actual().por_id.get(caso_id)
+
+    def pregunta(self, caso_id: int, pregunta_id: int) -> Optional[Dict[str, Any]]:
+        return self._actual().por_pregunta.get((caso_id, pregunta_id))
+
+    def json_casos(self) -> bytes:
+        """Respuesta completa de /casos_clinicos ya serializada."""
+        return self._actual().json_casos
+
+    def json_quiz(self) -> bytes:
+        """Respuesta completa de /quiz_casos_clinicos ya serializada."""
+        return self._actual().json_quiz
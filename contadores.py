@@ -0,0 +1,225 @@
+"""
+Contadores de uso para el reporte de preguntas frecuentes.
+Las frecuencias por pregunta se estiman con un Count-Min sketch y solo se
+guardan las K preguntas más frecuentes, así la memoria queda acotada aunque
+lleguen miles de preguntas distintas y el reporte cuesta O(K).
+
+Hay dos implementaciones con la misma interfaz:
+- ContadoresMemoria: dentro del proceso, sin locks al registrar (un fragmento por hilo).
+- ContadoresSQLite: compartida entre workers de uvicorn a través de un archivo SQLite.
+Con más de un worker (WEB_CONCURRENCY) la memoria de cada proceso ve solo sus
+preguntas, por eso crear_contadores elige SQLite si no se indica el backend.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def _columnas(pregunta: str, profundidad: int, ancho: int) -> List[int]:
+    """Una columna por fila del sketch; hash estable entre procesos (no usa hash())."""
+    digest = hashlib.blake2b(pregunta.encode("utf-8"), digest_size=8 * profundidad).digest()
+    return [int.from_bytes(digest[8 * i:8 * (i + 1)], "little") % ancho for i in range(profundidad)]
+
+
+def _armar_reporte(top: List[Tuple[str, str, int]], categorias: Dict[str, int], total: int, limite: int) -> Dict[str, Any]:
+    preguntas_frecuentes = [
+        {"pregunta": pregunta, "frecuencia": frecuencia, "categoria": categoria}
+        for pregunta, categoria, frecuencia in sorted(top, key=lambda x: x[2], reverse=True)[:limite]
+    ]
+    categorias_populares = [
+        {"categoria": categoria, "total": n}
+        for categoria, n in sorted(categorias.items(), key=lambda x: x[1], reverse=True)
+    ]
+    return {
+        "preguntas_frecuentes": preguntas_frecuentes,
+        "categorias_populares": categorias_populares,
+        "preguntas_totales": total
+    }
+
+
+class _Fragmento:
+    """Sketch, top-K y totales que solo escribe un hilo."""
+
+    def __init__(self, profundidad: int, ancho: int):
+        self.sketch = np.zeros((profundidad, ancho), dtype="int64")
+        self.top: Dict[str, List[Any]] = {}  # pregunta -> [frecuencia en este fragmento, categoria]
+        self.categorias: Dict[str, int] = {}
+        self.total = 0
+
+
+class ContadoresMemoria:
+    """Count-Min sketch + top-K en memoria del proceso.
+    Cada hilo escribe en su propio fragmento, así registrar no toma locks; reporte suma los
+    sketches (el Count-Min es lineal) y reestima el top con la suma. El lock solo protege el
+    alta de un fragmento, una vez por hilo.
+    """
+
+    def __init__(self, ancho: int = 2048, profundidad: int = 4, top_k: int = 50):
+        self.ancho = ancho
+        self.profundidad = profundidad
+        self.top_k = top_k
+        self._local = threading.local()
+        self._fragmentos: List[_Fragmento] = []
+        self._lock_fragmentos = threading.Lock()
+
+    def _fragmento(self) -> _Fragmento:
+        fragmento = getattr(self._local, "fragmento", None)
+        if fragmento is None:
+            fragmento = _Fragmento(self.profundidad, self.ancho)
+            with self._lock_fragmentos:
+                self._fragmentos.append(fragmento)
+            self._local.fragmento = fragmento
+        return fragmento
+
+    def registrar(self, pregunta: str, categoria: str) -> None:
+        columnas = _columnas(pregunta, self.profundidad, self.ancho)
+        filas = np.arange(self.profundidad)
+        f = self._fragmento()
+        f.total += 1
+        f.categorias[categoria] = f.categorias.get(categoria, 0) + 1
+        f.sketch[filas, columnas] += 1
+        estimado = int(f.sketch[filas, columnas].min())
+        if pregunta in f.top:
+            f.top[pregunta][0] = estimado
+        elif len(f.top) < self.top_k:
+            f.top[pregunta] = [estimado, categoria]
+        else:
+            minima = min(f.top, key=lambda p: f.top[p][0])
+            if estimado > f.top[minima][0]:
+                del f.top[minima]
+                f.top[pregunta] = [estimado, categoria]
+
+    def reporte(self, limite: int = 8) -> Dict[str, Any]:
+        with self._lock_fragmentos:
+            fragmentos = list(self._fragmentos)
+        sketch = np.zeros((self.profundidad, self.ancho), dtype="int64")
+        candidatas: Dict[str, str] = {}
+        categorias: Dict[str, int] = {}
+        total = 0
+        filas = np.arange(self.profundidad)
+        # Lecturas sin lock: un registro en curso puede quedar fuera del reporte, nada más
+        for f in fragmentos:
+            sketch += f.sketch
+            for pregunta, (_, categoria) in dict(f.top).items():
+                candidatas.setdefault(pregunta, categoria)
+            for categoria, n in dict(f.categorias).items():
+                categorias[categoria] = categorias.get(categoria, 0) + n
+            total += f.total
+        top = [(p, c, int(sketch[filas, _columnas(p, self.profundidad, self.ancho)].min()))
+               for p, c in candidatas.items()]
+        top = sorted(top, key=lambda x: x[2], reverse=True)[:self.top_k]
+        return _armar_reporte(top, categorias, total, limite)
+
+
+class ContadoresSQLite:
+    """Count-Min sketch + top-K en un archivo SQLite compartido por todos los workers.
+    Cada registro es una transacción corta de UPSERTs; SQLite serializa a los escritores.
+    """
+
+    def __init__(self, ruta: str, ancho: int = 2048, profundidad: int = 4, top_k: int = 50):
+        self.ruta = ruta
+        self.ancho = ancho
+        self.profundidad = profundidad
+        self.top_k = top_k
+        self._local = threading.local()
+        conn = self._conexion()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS cms (
+                fila INTEGER, columna INTEGER, valor INTEGER NOT NULL,
+                PRIMARY KEY (fila, columna)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS top_preguntas (
+                pregunta TEXT PRIMARY KEY, categoria TEXT, frecuencia INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_top_preguntas_frecuencia ON top_preguntas (frecuencia);
+            CREATE TABLE IF NOT EXISTS categorias (
+                categoria TEXT PRIMARY KEY, total INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS totales (
+                clave TEXT PRIMARY KEY, valor REAL NOT NULL
+            );
+            """
+        )
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def registrar(self, pregunta: str, categoria: str) -> None:
+        columnas = _columnas(pregunta, self.profundidad, self.ancho)
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            estimado = None
+            for fila, columna in enumerate(columnas):
+                valor = conn.execute(
+                    "INSERT INTO cms (fila, columna, valor) VALUES (?, ?, 1) "
+                    "ON CONFLICT (fila, columna) DO UPDATE SET valor = valor + 1 RETURNING valor",
+                    (fila, columna)
+                ).fetchone()[0]
+                estimado = valor if estimado is None else min(estimado, valor)
+            conn.execute(
+                "INSERT INTO categorias (categoria, total) VALUES (?, 1) "
+                "ON CONFLICT (categoria) DO UPDATE SET total = total + 1", (categoria,)
+            )
+            conn.execute(
+                "INSERT INTO totales (clave, valor) VALUES ('preguntas_totales', 1) "
+                "ON CONFLICT (clave) DO UPDATE SET valor = valor + 1"
+            )
+            conn.execute(
+                "INSERT INTO totales (clave, valor) VALUES ('ultima_actualizacion', ?) "
+                "ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor", (time.time(),)
+            )
+            actualizada = conn.execute(
+                "UPDATE top_preguntas SET frecuencia = ? WHERE pregunta = ?", (estimado, pregunta)
+            ).rowcount
+            if not actualizada:
+                cantidad, minima = conn.execute(
+                    "SELECT COUNT(*), MIN(frecuencia) FROM top_preguntas"
+                ).fetchone()
+                if cantidad < self.top_k or estimado > minima:
+                    conn.execute(
+                        "INSERT INTO top_preguntas (pregunta, categoria, frecuencia) VALUES (?, ?, ?)",
+                        (pregunta, categoria, estimado)
+                    )
+                    if cantidad >= self.top_k:
+                        conn.execute(
+                            "DELETE FROM top_preguntas WHERE pregunta = ("
+                            "SELECT pregunta FROM top_preguntas ORDER BY frecuencia LIMIT 1)"
+                        )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reporte(self, limite: int = 8) -> Dict[str, Any]:
+        conn = self._conexion()
+        top = conn.execute(
+            "SELECT pregunta, categoria, frecuencia FROM top_preguntas ORDER BY frecuencia DESC LIMIT ?", (limite,)
+        ).fetchall()
+        categorias = dict(conn.execute("SELECT categoria, total FROM categorias").fetchall())
+        fila = conn.execute("SELECT valor FROM totales WHERE clave = 'preguntas_totales'").fetchone()
+        return _armar_reporte(top, categorias, int(fila[0]) if fila else 0, limite)
+
+
+def crear_contadores(backend: Optional[str] = None, ruta: str = "contadores_uso.sqlite", top_k: int = 50):
+    """Fábrica según CONTADORES_BACKEND: 'memoria' (por proceso) o 'sqlite' (compartido entre workers).
+    Sin backend se usa 'sqlite' si uvicorn corre con más de un worker (WEB_CONCURRENCY > 1).
+    """
+    if backend is None:
+        backend = "sqlite" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "memoria"
+    if backend == "sqlite":
+        return ContadoresSQLite(ruta, top_k=top_k)
+    return ContadoresMemoria(top_k=top_k)
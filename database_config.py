@@ -1,7 +1,12 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from collections import deque
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,20 +14,187 @@ load_dotenv()
 # Configuración de base de datos
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./chatbot_analytics.db")
 
-# Para desarrollo local, usar SQLite
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
+# Pool de conexiones (se aplica a PostgreSQL y a SQLite en archivo)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Render cierra conexiones inactivas; se reciclan antes y se validan al sacarlas del pool
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+
+# PRAGMAs de SQLite aplicados a cada conexión nueva
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Capa async (aiosqlite / asyncpg); si falta el driver queda desactivada
+DB_ASYNC = os.getenv("DB_ASYNC", "1") != "0"
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout hasta obtener una conexión."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_medicion = threading.Lock()
+        self._esperas = deque(maxlen=1000)
+        self.medicion = {"checkouts": 0, "espera_total_ms": 0.0, "espera_max_ms": 0.0, "timeouts": 0}
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._lock_medicion:
+                self.medicion["timeouts"] += 1
+            raise
+        finally:
+            espera_ms = (time.perf_counter() - inicio) * 1000
+            with self._lock_medicion:
+                self.medicion["checkouts"] += 1
+                self.medicion["espera_total_ms"] += espera_ms
+                self.medicion["espera_max_ms"] = max(self.medicion["espera_max_ms"], espera_ms)
+                self._esperas.append(espera_ms)
+
+    def recreate(self):
+        # El pool recreado (por ejemplo tras dispose) sigue midiendo y conserva los totales
+        nuevo = super().recreate()
+        nuevo._lock_medicion, nuevo._esperas, nuevo.medicion = self._lock_medicion, self._esperas, self.medicion
+        return nuevo
+
+    def estadisticas(self):
+        with self._lock_medicion:
+            medicion = dict(self.medicion)
+            esperas = sorted(self._esperas)
+        checkouts = medicion["checkouts"]
+        medicion["espera_promedio_ms"] = round(medicion["espera_total_ms"] / checkouts, 3) if checkouts else 0.0
+        medicion["espera_p95_ms"] = round(esperas[int(len(esperas) * 0.95) - 1], 3) if esperas else 0.0
+        medicion["espera_total_ms"] = round(medicion["espera_total_ms"], 3)
+        medicion["espera_max_ms"] = round(medicion["espera_max_ms"], 3)
+        medicion.update({
+            "tamano": self.size(),
+            "en_uso": self.checkedout(),
+            "disponibles": self.checkedin(),
+            "overflow": self.overflow()
+        })
+        return medicion
+
+
+class PoolMedidoAsync(PoolMedido, AsyncAdaptedQueuePool):
+    """Variante de PoolMedido para el engine async."""
+
+
+def _configurar_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+def _normalizar_url(url):
+    # Render entrega URLs 'postgres://', que SQLAlchemy 2 ya no acepta
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _opciones_pool(poolclass):
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE
+    }
+
+
+def _es_sqlite_en_memoria(url):
+    return url.split("?")[0] in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def crear_motor(url=None):
+    """Crea el engine según DATABASE_URL y las variables DB_POOL_* / SQLITE_*."""
+    url = _normalizar_url(url or DATABASE_URL)
+    opciones_pool = _opciones_pool(PoolMedido)
+
+    # Para desarrollo local, usar SQLite
+    if url.startswith("sqlite"):
+        if _es_sqlite_en_memoria(url):
+            # Una base en memoria vive en una sola conexión; no admite pool ni WAL
+            return create_engine(url, connect_args={"check_same_thread": False})
+        motor = create_engine(url, connect_args={"check_same_thread": False}, **opciones_pool)
+        event.listen(motor, "connect", _configurar_sqlite)
+        return motor
+
     # Para producción (PostgreSQL)
-    engine = create_engine(DATABASE_URL)
+    return create_engine(url, **opciones_pool)
+
+
+def url_async(url):
+    """Misma base con el driver async: sqlite -> aiosqlite, postgresql -> asyncpg."""
+    url = _normalizar_url(url)
+    esquema, resto = url.split("://", 1)
+    if esquema.startswith("sqlite"):
+        return "sqlite+aiosqlite://" + resto
+    if esquema.startswith("postgresql"):
+        return "postgresql+asyncpg://" + resto
+    return url
+
+
+def crear_motor_async(url=None):
+    """AsyncEngine con los mismos ajustes de pool y PRAGMAs que crear_motor.
+    Devuelve None si el driver async no está instalado.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = url_async(url or DATABASE_URL)
+    try:
+        import greenlet  # noqa: F401  (lo necesita AsyncSession de SQLAlchemy)
+        if url.startswith("sqlite"):
+            if _es_sqlite_en_memoria(url):
+                return create_async_engine(url)
+            motor = create_async_engine(url, **_opciones_pool(PoolMedidoAsync))
+            event.listen(motor.sync_engine, "connect", _configurar_sqlite)
+            return motor
+        return create_async_engine(url, **_opciones_pool(PoolMedidoAsync))
+    except ImportError as e:
+        driver = "aiosqlite" if url.startswith("sqlite") else "asyncpg"
+        print(f"⚠️ Capa async de base de datos desactivada: falta {getattr(e, 'name', None) or driver} "
+              f"(pip install {driver} greenlet); los endpoints /async no se montan")
+        return None
+
+
+def estadisticas_pool(motor=None):
+    """Espera de checkout y ocupación del pool, para /metricas."""
+    motor = motor or engine
+    pool = getattr(motor, "sync_engine", motor).pool
+    if isinstance(pool, PoolMedido):
+        return pool.estadisticas()
+    return {"pool": type(pool).__name__}
+
+
+engine = crear_motor()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = crear_motor_async() if DB_ASYNC else None
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False) if async_engine is not None else None
+
 def get_db():
     """Obtener sesión de base de datos"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_db_async():
+    """Obtener sesión async de base de datos"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
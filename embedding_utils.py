@@ -4,9 +4,14 @@ Lee PDFs desde el directorio 'material/', genera embeddings (OpenAI)
 y construye un índice FAISS para recuperar pasajes relevantes.
 """
 
+import asyncio
 import os
 import json
-from typing import List, Tuple, Dict, Any
+import hashlib
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Dict, Any, Optional, Sequence, Set
 
 import numpy as np
 
@@ -21,7 +26,14 @@ except Exception:
     fitz = None
 
 from dotenv import load_dotenv
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from almacen_chunks import AlmacenChunks, abrir_almacen
+from cache_embeddings import CacheEmbeddings
+from indice_bm25 import IndiceBM25, es_consulta_lexica, fusion_rrf, terminos
+from indices_faiss import asegurar_tipo, crear_indice, quitar_ids, describir as describir_indice
+from motor_embeddings import MotorEmbeddings
 
 load_dotenv()
 
@@ -29,24 +41,72 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 MATERIAL_DIR = os.getenv("MATERIAL_DIR", "material")
 INDEX_DIR = os.getenv("INDEX_DIR", "index_store")
+# Nombres del formato anterior; ahora cada versión guardada tiene su propio par de archivos
+# (indice-<version>.faiss y metadatos-<version>.sqlite) y el manifiesto dice cuál es la vigente
 INDEX_PATH = os.path.join(INDEX_DIR, "indice.faiss")
-METADATA_PATH = os.path.join(INDEX_DIR, "textos.json")
+METADATA_PATH = os.path.join(INDEX_DIR, "textos.json")  # formato anterior, se migra a METADATA_DB_PATH
+METADATA_DB_PATH = os.path.join(INDEX_DIR, "metadatos.sqlite")
+# Abrir indice.faiss con mmap (solo lectura, páginas bajo demanda) en vez de leerlo entero a memoria
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") != "0"
+MANIFEST_PATH = os.path.join(INDEX_DIR, "manifiesto.json")
+EXTRACCION_PROCESOS = int(os.getenv("EXTRACCION_PROCESOS", "0"))  # 0 = número de CPUs
+PAGINAS_POR_TAREA = int(os.getenv("PAGINAS_POR_TAREA", "16"))
+CACHE_EMBEDDINGS_PATH = os.getenv("CACHE_EMBEDDINGS_PATH", os.path.join(INDEX_DIR, "cache_consultas.sqlite"))
+CACHE_EMBEDDINGS_CAPACIDAD = int(os.getenv("CACHE_EMBEDDINGS_CAPACIDAD", "1024"))
 
 _client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
+# Cliente asíncrono compartido (un solo pool de conexiones HTTP para embeddings y chat)
+# Búsqueda híbrida: BM25 sobre los mismos chunks, fusionado con FAISS por RRF
+BUSQUEDA_HIBRIDA = os.getenv("BUSQUEDA_HIBRIDA", "1") != "0"
+BUSQUEDA_CANDIDATOS = int(os.getenv("BUSQUEDA_CANDIDATOS", "4"))  # cada lista aporta k * este valor a la fusión
+# Preguntas que citan normas o números se responden solo con BM25 (sin embedding) si sus números aparecen
+BUSQUEDA_LEXICA_DIRECTA = os.getenv("BUSQUEDA_LEXICA_DIRECTA", "1") != "0"
+# Un pasaje de BM25 entra a la fusión sin pasar el umbral de similitud si su puntaje llega a esta
+# fracción del máximo posible para la consulta (todos sus términos en el chunk)
+BUSQUEDA_BM25_MIN = float(os.getenv("BUSQUEDA_BM25_MIN", "0.2"))
+OPENAI_MAX_CONEXIONES = int(os.getenv("OPENAI_MAX_CONEXIONES", "200"))
+_async_client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=OPENAI_MAX_CONEXIONES, max_keepalive_connections=OPENAI_MAX_CONEXIONES // 4),
+        timeout=httpx.Timeout(60.0, connect=10.0)
+    )
+) if OPENAI_API_KEY else None
+
+# Motor de embeddings por lotes para construir el índice (concurrente, con reintentos y checkpoints)
+_motor = MotorEmbeddings(
+    EMBED_MODEL,
+    api_key=OPENAI_API_KEY,
+    concurrencia=int(os.getenv("EMBED_CONCURRENCIA", "4")),
+    max_tokens_lote=int(os.getenv("EMBED_MAX_TOKENS_LOTE", "20000")),
+    reintentos=int(os.getenv("EMBED_REINTENTOS", "6")),
+    dir_checkpoint=os.path.join(INDEX_DIR, "checkpoint_embeddings")
+)
+
+# Contadores de llamadas de embedding para consultas
+estadisticas_embeddings = {
+    "llamadas_consulta": 0,
+    "llamadas_ahorradas": 0,
+    "consultas_solo_bm25": 0
+}
+
+# Caché de embeddings de consultas (memoria + SQLite junto al índice)
+cache_consultas = CacheEmbeddings(CACHE_EMBEDDINGS_PATH, EMBED_MODEL, capacidad_memoria=CACHE_EMBEDDINGS_CAPACIDAD)
+
 
 def _ensure_dirs() -> None:
     os.makedirs(INDEX_DIR, exist_ok=True)
 
 
-def _read_pdf_text(pdf_path: str) -> List[Dict[str, Any]]:
-    """Extrae texto por página de un PDF. Devuelve lista de dicts con texto, archivo y página."""
+def _read_pdf_pages(pdf_path: str, inicio: int = 0, fin: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Extrae texto de las páginas [inicio, fin) de un PDF. Devuelve lista de dicts con texto, archivo y página."""
     if fitz is None:
         return []
     out: List[Dict[str, Any]] = []
     try:
         with fitz.open(pdf_path) as doc:
-            for page_num in range(len(doc)):
+            for page_num in range(inicio, min(len(doc), fin) if fin is not None else len(doc)):
                 page = doc.load_page(page_num)
                 text = page.get_text("text").strip()
                 if text:
@@ -60,6 +120,21 @@ def _read_pdf_text(pdf_path: str) -> List[Dict[str, Any]]:
     return out
 
 
+def _read_pdf_text(pdf_path: str) -> List[Dict[str, Any]]:
+    """Extrae texto por página de un PDF. Devuelve lista de dicts con texto, archivo y página."""
+    return _read_pdf_pages(pdf_path)
+
+
+def _contar_paginas(pdf_path: str) -> int:
+    if fitz is None:
+        return 0
+    try:
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    except Exception:
+        return 0
+
+
 def _read_txt_text(txt_path: str) -> List[Dict[str, Any]]:
     """Lee texto de un archivo .txt y devuelve un solo registro tipo página."""
     try:
@@ -94,123 +169,614 @@ def _chunk_text(text: str, max_chars: int = 1200, overlap: int = 200) -> List[st
 def _embed_texts(texts: List[str]) -> np.ndarray:
     if _client is None:
         raise RuntimeError("OPENAI_API_KEY no configurada para embeddings")
-    vectors: List[List[float]] = []
-    for i in range(0, len(texts), 100):
-        batch = texts[i:i+100]
-        resp = _client.embeddings.create(model=EMBED_MODEL, input=batch)
-        vectors.extend([d.embedding for d in resp.data])
-    arr = np.array(vectors, dtype="float32")
+    arr = _motor.embeber_sync(texts)
     if faiss is not None:
         faiss.normalize_L2(arr)
     return arr
 
 
-def _build_faiss_index(embeddings: np.ndarray):
-    if faiss is None:
-        return None
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
+def _build_faiss_index(embeddings: np.ndarray, ids: Optional[np.ndarray] = None):
+    """Índice por producto interno (tipo según INDICE_TIPO) envuelto en IndexIDMap2 para añadir y quitar por id."""
+    return crear_indice(embeddings, ids)
+
+
+def _listar_archivos() -> List[str]:
+    """Rutas (relativas a MATERIAL_DIR, con '/') de los PDF/TXT del material, en orden estable."""
+    rutas: List[str] = []
+    if os.path.isdir(MATERIAL_DIR):
+        for root, _dirs, files in os.walk(MATERIAL_DIR):
+            for fname in files:
+                if fname.lower().endswith(('.pdf', '.txt')):
+                    rel = os.path.relpath(os.path.join(root, fname), MATERIAL_DIR)
+                    rutas.append(rel.replace(os.sep, "/"))
+    return sorted(rutas)
+
+
+def _hash_archivo(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _extraer_documentos(paths: List[str], procesos: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """Extrae las páginas de varios documentos repartiendo PDFs por rangos de páginas
+    en un ProcessPoolExecutor. El resultado sigue el orden de 'paths' y de las páginas,
+    igual que la extracción en serie.
+    """
+    procesos = procesos if procesos is not None else (EXTRACCION_PROCESOS or os.cpu_count() or 1)
+
+    # Tareas (documento, función, argumentos) en el orden final del resultado
+    tareas: List[Tuple[int, Any, Tuple[Any, ...]]] = []
+    for i, path in enumerate(paths):
+        if path.lower().endswith('.pdf'):
+            total = _contar_paginas(path)
+            for inicio in range(0, total, PAGINAS_POR_TAREA):
+                tareas.append((i, _read_pdf_pages, (path, inicio, inicio + PAGINAS_POR_TAREA)))
+        else:
+            tareas.append((i, _read_txt_text, (path,)))
+
+    salida: List[List[Dict[str, Any]]] = [[] for _ in paths]
+    if procesos > 1 and len(tareas) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(procesos, len(tareas))) as ex:
+                futuros = [(i, ex.submit(fn, *args)) for i, fn, args in tareas]
+                for i, futuro in futuros:
+                    salida[i].extend(futuro.result())
+            return salida
+        except Exception as e:
+            print(f"⚠️ Extracción en paralelo no disponible ({e}), se usará extracción en serie")
+            salida = [[] for _ in paths]
+
+    for i, fn, args in tareas:
+        salida[i].extend(fn(*args))
+    return salida
+
+
+def _cargar_manifiesto() -> Dict[str, Any]:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {"archivos": {}}
+
+
+def rutas_publicadas(manifiesto: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+    """(índice, metadatos) de la versión vigente según el manifiesto; sin versión, los nombres anteriores."""
+    if manifiesto is None:
+        manifiesto = _cargar_manifiesto()
+    return (os.path.join(INDEX_DIR, manifiesto.get("indice", os.path.basename(INDEX_PATH))),
+            os.path.join(INDEX_DIR, manifiesto.get("metadatos", os.path.basename(METADATA_DB_PATH))))
+
+
+def _ruta_version(prefijo: str, extension: str) -> str:
+    return os.path.join(INDEX_DIR, f"{prefijo}-{time.time_ns():x}{extension}")
+
+
+def _borrar_version(manifiesto_previo: Dict[str, Any], manifiesto: Dict[str, Any]) -> None:
+    """Borra los archivos de la versión reemplazada. Los procesos que todavía la tienen abierta
+    (mmap o conexión SQLite) la siguen leyendo hasta soltarla; en Windows el borrado puede fallar.
+    """
+    vigentes = set(rutas_publicadas(manifiesto))
+    for ruta in rutas_publicadas(manifiesto_previo):
+        if ruta in vigentes:
+            continue
+        for archivo in (ruta, ruta + "-wal", ruta + "-shm"):
+            try:
+                os.remove(archivo)
+            except OSError:
+                pass
+
+
+def _escribir_atomico(path: str, escribir) -> None:
+    """Escribe en un archivo temporal y lo reemplaza, para no dejar archivos a medias."""
+    tmp = path + ".tmp"
+    escribir(tmp)
+    os.replace(tmp, path)
+
+
+# Índice abierto con mmap (y su archivo): es de solo lectura y modificarlo aborta el proceso
+_indice_mapeado: Any = None
+_ruta_indice_mapeado: Optional[str] = None
+# Almacén de metadatos de la versión publicada: tampoco se modifica (ver _metadatos_modificables)
+_almacen_publicado: Optional[AlmacenChunks] = None
+# Archivo del índice vigente, para huella_indice
+_ruta_indice_publicado = INDEX_PATH
+
+
+def _leer_indice(path: str) -> Any:
+    """Abre el índice con mmap si FAISS lo permite; si no, lo lee completo a memoria."""
+    global _indice_mapeado, _ruta_indice_mapeado
+    bandera = getattr(faiss, "IO_FLAG_MMAP_IFC", None) or getattr(faiss, "IO_FLAG_MMAP", None)
+    if FAISS_MMAP and bandera:
+        try:
+            _indice_mapeado = faiss.read_index(path, bandera)
+            _ruta_indice_mapeado = path
+            return _indice_mapeado
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir el índice con mmap ({e}), se carga en memoria")
+    return faiss.read_index(path)
+
+
+def _indice_modificable(index: Any) -> Any:
+    """Antes de añadir o quitar vectores, relee en memoria un índice abierto con mmap."""
+    global _indice_mapeado
+    if index is not None and index is _indice_mapeado:
+        index = faiss.read_index(_ruta_indice_mapeado)
+        _indice_mapeado = None
     return index
 
 
-def cargar_o_crear_indice(textos_existentes: List[str]) -> Tuple[Any, List[Dict[str, Any]]]:
-    """Crea o carga índice FAISS y metadatos desde 'material/'.
+def _abrir_metadatos(ruta: str) -> AlmacenChunks:
+    """Almacén publicado en 'ruta' (el mismo objeto si ya está abierto en este proceso)."""
+    global _almacen_publicado
+    if _almacen_publicado is None or _almacen_publicado.ruta != ruta:
+        if ruta == METADATA_DB_PATH:
+            # Formato anterior: migra textos.json la primera vez
+            _almacen_publicado = abrir_almacen(ruta, METADATA_PATH)
+        else:
+            _almacen_publicado = AlmacenChunks(ruta, crear=False)
+    return _almacen_publicado
+
+
+def _metadatos_modificables(metadatos: Any) -> Any:
+    """Antes de quitar o añadir chunks, copia el almacén publicado a una versión nueva: los
+    workers y las consultas en curso siguen leyendo el publicado junto a su índice, y si se
+    modificara en el lugar sus ids FAISS apuntarían a otros textos.
+    """
+    global _almacen_publicado
+    if metadatos is not None and metadatos is _almacen_publicado:
+        metadatos = metadatos.copiar(_ruta_version("metadatos", ".sqlite"))
+        _almacen_publicado = None
+    return metadatos
+
+
+def _descartar_metadatos(metadatos: Any) -> None:
+    """Borra una versión de metadatos que no llegó a publicarse."""
+    if isinstance(metadatos, AlmacenChunks) and metadatos is not _almacen_publicado:
+        metadatos.cerrar()
+        try:
+            os.remove(metadatos.ruta)
+        except OSError:
+            pass
+
+
+def _guardar_indice(index: Any, metadatos: Any, manifiesto: Dict[str, Any]) -> bool:
+    """Escribe el índice en un archivo nuevo y publica la versión (índice + metadatos) al
+    reemplazar el manifiesto, que es lo único que cambia en el lugar."""
+    global _almacen_publicado, _ruta_indice_publicado
+    if index is None or faiss is None:
+        return False
+    try:
+        previo = _cargar_manifiesto()
+        metadatos.confirmar()
+        ruta_indice = _ruta_version("indice", ".faiss")
+        _escribir_atomico(ruta_indice, lambda p: faiss.write_index(index, p))
+        manifiesto["indice"] = os.path.basename(ruta_indice)
+        manifiesto["metadatos"] = os.path.basename(metadatos.ruta)
+
+        def _json(data):
+            def escribir(p):
+                with open(p, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+            return escribir
+
+        # El manifiesto va al final: si algo falla antes, la próxima carga vuelve a sincronizar
+        _escribir_atomico(MANIFEST_PATH, _json(manifiesto))
+        _almacen_publicado = metadatos
+        _ruta_indice_publicado = ruta_indice
+        _borrar_version(previo, manifiesto)
+        return True
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el índice: {e}")
+        return False
+
+
+def actualizar_indice(index: Any, metadatos: Any,
+                      manifiesto: Dict[str, Any]) -> Tuple[Any, Any, Dict[str, int]]:
+    """Sincroniza el índice con 'material/' usando el manifiesto ruta → hash → rango de ids.
+    Solo se vuelven a extraer y embeber los archivos nuevos o modificados; los borrados o
+    modificados se quitan del índice con remove_ids. La posición en metadatos (AlmacenChunks
+    o lista) es el id FAISS (los huecos de documentos eliminados quedan en None).
+    """
+    archivos = manifiesto.setdefault("archivos", {})
+    resumen = {"nuevos": 0, "modificados": 0, "eliminados": 0, "sin_cambios": 0}
+
+    actuales = _listar_archivos()
+    pendientes: List[str] = []
+    for rel in actuales:
+        path = os.path.join(MATERIAL_DIR, rel)
+        st = os.stat(path)
+        previo = archivos.get(rel)
+        # Tamaño y fecha iguales: no hace falta ni calcular el hash
+        if previo and previo.get("tamano") == st.st_size and previo.get("mtime") == st.st_mtime:
+            resumen["sin_cambios"] += 1
+            continue
+        hash_actual = _hash_archivo(path)
+        if previo and previo.get("hash") == hash_actual:
+            previo.update({"tamano": st.st_size, "mtime": st.st_mtime})
+            resumen["sin_cambios"] += 1
+            continue
+        resumen["modificados" if previo else "nuevos"] += 1
+        pendientes.append(rel)
+        archivos[rel] = {"hash": hash_actual, "tamano": st.st_size, "mtime": st.st_mtime, "ids": None}
+        if previo:
+            archivos[rel]["ids_previos"] = previo.get("ids")
+
+    # Quitar del índice los chunks de archivos eliminados o modificados
+    a_quitar: List[int] = []
+    presentes = set(actuales)
+    for rel in [r for r in archivos if r not in presentes]:
+        rango = archivos.pop(rel).get("ids")
+        resumen["eliminados"] += 1
+        if rango:
+            a_quitar.extend(range(rango[0], rango[1]))
+    for rel in pendientes:
+        rango = archivos[rel].pop("ids_previos", None)
+        if rango:
+            a_quitar.extend(range(rango[0], rango[1]))
+    if a_quitar and index is not None:
+        index = quitar_ids(_indice_modificable(index), np.array(a_quitar, dtype="int64"))
+        metadatos = _metadatos_modificables(metadatos)
+        for i in a_quitar:
+            if i < len(metadatos):
+                metadatos[i] = None
+
+    if not pendientes:
+        return index, metadatos, resumen
+
+    # Extraer y fragmentar solo los archivos pendientes
+    textos: List[str] = []
+    nuevos_md: List[Dict[str, Any]] = []
+    siguiente = len(metadatos)
+    paginas = _extraer_documentos([os.path.join(MATERIAL_DIR, rel) for rel in pendientes])
+    for rel, docs in zip(pendientes, paginas):
+        inicio = siguiente + len(nuevos_md)
+        for doc in docs:
+            for chunk in _chunk_text(doc["texto"]):
+                textos.append(chunk)
+                nuevos_md.append({
+                    "texto": chunk,
+                    "archivo": doc["archivo"],
+                    "pagina": doc["pagina"]
+                })
+        archivos[rel]["ids"] = [inicio, siguiente + len(nuevos_md)]
+
+    if textos:
+        embeddings = _embed_texts(textos)
+        ids = np.arange(siguiente, siguiente + len(textos), dtype="int64")
+        if index is None:
+            index = _build_faiss_index(embeddings, ids)
+        else:
+            index = _indice_modificable(index)
+            index.add_with_ids(embeddings, ids)
+        metadatos = _metadatos_modificables(metadatos)
+        metadatos.extend(nuevos_md)
+    return index, metadatos, resumen
+
+
+def cargar_o_crear_indice(textos_existentes: List[str]) -> Tuple[Any, Any]:
+    """Carga el índice FAISS (con mmap) y el almacén de metadatos y los sincroniza con 'material/'.
+    Solo se reprocesan los archivos que cambiaron desde la última carga. Los metadatos se
+    devuelven como AlmacenChunks: se indexan igual que la lista anterior pero se leen bajo demanda.
     Ignora el parámetro textos_existentes para compatibilidad con llamadas previas.
     """
     _ensure_dirs()
     print("📚 Cargando índice (FAISS)…")
+    if faiss is None:
+        print("⚠️ FAISS no disponible, búsqueda semántica desactivada")
+        return None, []
 
-    # Intentar cargar desde disco (si existe)
-    if os.path.exists(INDEX_PATH) and os.path.exists(METADATA_PATH) and faiss is not None:
+    global _ruta_indice_publicado
+    index: Any = None
+    metadatos: Any = None
+    manifiesto: Dict[str, Any] = {"archivos": {}}
+
+    # Intentar cargar desde disco la versión que indica el manifiesto
+    if os.path.exists(MANIFEST_PATH):
+        manifiesto = _cargar_manifiesto()
+        ruta_indice, ruta_metadatos = rutas_publicadas(manifiesto)
         try:
-            index = faiss.read_index(INDEX_PATH)
-            with open(METADATA_PATH, "r", encoding="utf-8") as f:
-                metadatos = json.load(f)
-            print(f"✅ Índice cargado con {len(metadatos)} chunks")
-            return index, metadatos
+            index = _leer_indice(ruta_indice)
+            metadatos = _abrir_metadatos(ruta_metadatos)
+            _ruta_indice_publicado = ruta_indice
+            print(f"✅ Índice cargado con {index.ntotal} chunks ({describir_indice(index)})")
         except Exception:
             print("⚠️ No se pudo cargar índice previo. Se regenerará.")
-
-    # Recolectar documentos (PDF y TXT) de forma recursiva
-    documentos: List[Dict[str, Any]] = []
-    total_archivos = 0
-    if os.path.isdir(MATERIAL_DIR):
-        for root, _dirs, files in os.walk(MATERIAL_DIR):
-            for fname in files:
-                path = os.path.join(root, fname)
-                lower = fname.lower()
-                if lower.endswith('.pdf'):
-                    total_archivos += 1
-                    documentos.extend(_read_pdf_text(path))
-                elif lower.endswith('.txt'):
-                    total_archivos += 1
-                    documentos.extend(_read_txt_text(path))
-
-    if total_archivos:
-        print(f"🔎 Detectados {total_archivos} archivos en '{MATERIAL_DIR}' (PDF/TXT)")
-
-    if not documentos:
+            index, manifiesto = None, {"archivos": {}}
+    elif os.path.exists(INDEX_PATH):
+        print("⚠️ Índice previo sin manifiesto. Se regenerará una vez.")
+    if index is None:
+        # Versión nueva vacía; la publicada (si hay) no se toca
+        metadatos = AlmacenChunks(_ruta_version("metadatos", ".sqlite"))
+
+    index, metadatos, resumen = actualizar_indice(index, metadatos, manifiesto)
+    tipo_previo = describir_indice(index)
+    index = asegurar_tipo(index)
+    if describir_indice(index) != tipo_previo:
+        _guardar_indice(index, metadatos, manifiesto)
+    if resumen["nuevos"] or resumen["modificados"] or resumen["eliminados"]:
+        print(f"🔎 Material: {resumen['nuevos']} nuevos, {resumen['modificados']} modificados, "
+              f"{resumen['eliminados']} eliminados, {resumen['sin_cambios']} sin cambios")
+        if _guardar_indice(index, metadatos, manifiesto):
+            _motor.limpiar_checkpoints()
+
+    if index is None or index.ntotal == 0:
+        _descartar_metadatos(metadatos)
         print("✅ Índice cargado con 0 documentos (no se encontraron PDFs/TXTs)")
         return None, []
 
-    # Chunking y metadatos
-    textos: List[str] = []
-    metadatos: List[Dict[str, Any]] = []
-    for doc in documentos:
-        for chunk in _chunk_text(doc["texto"]):
-            textos.append(chunk)
-            metadatos.append({
-                "texto": chunk,
-                "archivo": doc["archivo"],
-                "pagina": doc["pagina"]
-            })
-
-    # Embeddings e índice
-    embeddings = _embed_texts(textos)
-    index = _build_faiss_index(embeddings)
-
-    # Guardar (si FAISS disponible)
-    if index is not None and faiss is not None:
-        try:
-            faiss.write_index(index, INDEX_PATH)
-            with open(METADATA_PATH, "w", encoding="utf-8") as f:
-                json.dump(metadatos, f, ensure_ascii=False)
-        except Exception:
-            pass
-
-    print(f"✅ Índice generado con {len(metadatos)} chunks")
+    print(f"✅ Índice listo con {index.ntotal} chunks")
     return index, metadatos
 
 
 def _embed_query(query: str) -> np.ndarray:
+    cacheado = cache_consultas.obtener(query)
+    if cacheado is not None:
+        return cacheado.reshape(1, -1)
+    estadisticas_embeddings["llamadas_consulta"] += 1
     vec = _client.embeddings.create(model=EMBED_MODEL, input=[query]).data[0].embedding
     arr = np.array([vec], dtype="float32")
     if faiss is not None:
         faiss.normalize_L2(arr)
+    cache_consultas.guardar(query, arr[0])
     return arr
 
 
-def buscar_similares(pregunta: str, indice: Any, textos: List[Dict[str, Any]], k: int = 5, umbral: float = 0.5) -> List[Dict[str, Any]]:
-    """Retorna hasta k pasajes con similitud >= umbral usando FAISS. Si no hay índice, lista vacía."""
-    if indice is None or not textos or faiss is None or _client is None:
+def _pasaje(idx: int, md: Dict[str, Any], similitud: Optional[float]) -> Dict[str, Any]:
+    return {
+        "id": idx,
+        "texto": md["texto"],
+        "archivo": md.get("archivo", ""),
+        "pagina": md.get("pagina", ""),
+        "similitud": similitud
+    }
+
+
+def _vecinos(qv: np.ndarray, indice: Any, k: int) -> List[Tuple[int, float]]:
+    """(id, similitud) de los k vectores más cercanos, sin leer los metadatos."""
+    D, I = indice.search(qv, k)
+    return [(int(idx), float(score)) for score, idx in zip(D[0], I[0]) if idx != -1]
+
+
+def _buscar_puntuados(qv: np.ndarray, indice: Any, textos: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """Busca los k pasajes más cercanos a un vector ya normalizado, sin aplicar umbral."""
+    resultados: List[Dict[str, Any]] = []
+    for idx, score in _vecinos(qv, indice, k):
+        md = textos[idx]
+        if md is None:
+            continue
+        resultados.append(_pasaje(idx, md, score))
+    return resultados
+
+
+# BM25 de los metadatos cargados: (metadatos de origen, su longitud, índice)
+_lexico: Tuple[Any, int, Optional[IndiceBM25]] = (None, -1, None)
+_lexico_lock = threading.Lock()
+
+
+def indice_lexico(textos: Any, esperar: bool = True) -> Optional[IndiceBM25]:
+    """Índice BM25 de 'textos'; se construye una vez por conjunto de metadatos cargado.
+    Construirlo lee todos los chunks de SQLite: con esperar=False, si todavía no está, se
+    construye en un hilo aparte y se devuelve None (la consulta sigue solo con FAISS).
+    """
+    global _lexico
+    if not textos:
+        return None
+    origen, longitud, lexico = _lexico
+    if origen is textos and longitud == len(textos):
+        return lexico
+    if not esperar:
+        if not _lexico_lock.locked():
+            threading.Thread(target=indice_lexico, args=(textos,), name="indice-bm25", daemon=True).start()
+        return None
+    with _lexico_lock:
+        origen, longitud, lexico = _lexico
+        if origen is textos and longitud == len(textos):
+            return lexico
+        inicio = time.perf_counter()
+        lexico = IndiceBM25.desde_chunks(textos)
+        _lexico = (textos, len(textos), lexico)
+        print(f"🔤 Índice BM25 con {len(lexico)} chunks y {len(lexico.postings)} términos "
+              f"({time.perf_counter() - inicio:.2f} s)")
+        return lexico
+
+
+def preparar_busqueda_lexica(textos: Any) -> None:
+    """Con BUSQUEDA_HIBRIDA, lanza en segundo plano el BM25 de un índice recién publicado."""
+    global _lexico
+    # Suelta el BM25 anterior: retiene sus metadatos y con ellos la conexión a la versión reemplazada
+    if _lexico[0] is not textos:
+        _lexico = (None, -1, None)
+    if BUSQUEDA_HIBRIDA:
+        # Aunque haya otro BM25 en construcción: al terminar, el último en armarse es el de esta versión
+        threading.Thread(target=indice_lexico, args=(textos,), name="indice-bm25", daemon=True).start()
+
+
+def buscar_lexico(pregunta: str, textos: Any, k: int = 5, esperar: bool = True) -> List[Dict[str, Any]]:
+    """Top-k por BM25 sin llamar a la API; 'similitud' queda en None y el puntaje va en 'bm25'."""
+    lexico = indice_lexico(textos, esperar)
+    if lexico is None:
+        return []
+    resultados = []
+    for idx, puntaje in lexico.buscar(pregunta, k):
+        md = textos[idx]
+        if md is not None:
+            resultados.append(dict(_pasaje(idx, md, None), bm25=round(puntaje, 3)))
+    return resultados
+
+
+def buscar_sin_red(pregunta: str, textos: Any, k: int = 5) -> List[Dict[str, Any]]:
+    """Camino sin embedding para preguntas que citan normas o números (BUSQUEDA_LEXICA_DIRECTA).
+    Solo devuelve resultados si todos los números de la pregunta aparecen en alguno de ellos;
+    si no (o la pregunta no es léxica), lista vacía y se usa la búsqueda híbrida.
+    """
+    if not (BUSQUEDA_HIBRIDA and BUSQUEDA_LEXICA_DIRECTA) or not es_consulta_lexica(pregunta):
+        return []
+    numeros = {t for t in terminos(pregunta) if t.isdigit()}
+    if not numeros:
+        return []
+    resultados = buscar_lexico(pregunta, textos, k, esperar=False)
+    encontrados = set()
+    for r in resultados:
+        encontrados.update(numeros.intersection(terminos(r["texto"])))
+    if encontrados != numeros:
+        return []
+    estadisticas_embeddings["consultas_solo_bm25"] += 1
+    return resultados
+
+
+def _fusionar(vecinos: List[Tuple[int, float]], lexicos: List[Tuple[int, float]],
+              umbral: float, textos: Any, k: int) -> List[Dict[str, Any]]:
+    """Fusión RRF de los vecinos que superan el umbral con el ranking BM25, ordenada por RRF.
+    El umbral solo filtra a los vecinos: los pasajes de BM25 ya pasaron el piso BUSQUEDA_BM25_MIN
+    y conservan las coincidencias exactas (nombres de fármacos, números de decreto) aunque
+    su similitud vectorial sea baja. Solo se leen los metadatos de los k pasajes que quedan.
+    """
+    vectoriales = [i for i, score in vecinos if score >= umbral]
+    if not vectoriales and not lexicos:
         return []
+    similitudes = dict(vecinos)
+    bm25 = dict(lexicos)
+    resultados = []
+    for idx, puntaje in fusion_rrf([vectoriales, [i for i, _ in lexicos]]):
+        md = textos[idx]
+        if md is None:
+            continue
+        r = _pasaje(idx, md, similitudes.get(idx))
+        r["rrf"] = round(puntaje, 5)
+        if idx in bm25:
+            r["bm25"] = round(bm25[idx], 3)
+        resultados.append(r)
+        if len(resultados) == k:
+            break
+    return resultados
+
+
+# Escrituras del caché de consultas lanzadas sin esperar: se guardan para registrar sus
+# errores y para que el apagado de la API no las pierda
+_escrituras_cache: Set[asyncio.Future] = set()
+
+
+def _escritura_cache_terminada(futuro: asyncio.Future) -> None:
+    _escrituras_cache.discard(futuro)
+    if not futuro.cancelled() and futuro.exception() is not None:
+        print(f"⚠️ No se pudo guardar el embedding de la consulta en caché: {futuro.exception()}")
+
+
+async def esperar_escrituras_cache() -> None:
+    """Espera las escrituras pendientes del caché de consultas (al apagar la API)."""
+    if _escrituras_cache:
+        await asyncio.gather(*list(_escrituras_cache), return_exceptions=True)
+
+
+async def _embed_query_async(query: str) -> np.ndarray:
+    # El caché toca SQLite (UPDATE/INSERT + commit): se consulta en un hilo para no frenar el event loop
+    cacheado = await asyncio.to_thread(cache_consultas.obtener, query)
+    if cacheado is not None:
+        return cacheado.reshape(1, -1)
+    estadisticas_embeddings["llamadas_consulta"] += 1
+    resp = await _async_client.embeddings.create(model=EMBED_MODEL, input=[query])
+    arr = np.array([resp.data[0].embedding], dtype="float32")
+    if faiss is not None:
+        faiss.normalize_L2(arr)
+    # La escritura no retrasa la respuesta
+    futuro = asyncio.get_running_loop().run_in_executor(None, cache_consultas.guardar, query, arr[0])
+    _escrituras_cache.add(futuro)
+    futuro.add_done_callback(_escritura_cache_terminada)
+    return arr
+
+
+def obtener_cliente_async() -> Optional[AsyncOpenAI]:
+    """Cliente AsyncOpenAI compartido, o None si no hay API key."""
+    return _async_client
+
+
+async def embeber_consulta_async(pregunta: str) -> Optional[np.ndarray]:
+    """Versión asíncrona de embeber_consulta sobre el cliente compartido."""
+    if _async_client is None:
+        return None
     try:
-        qv = _embed_query(pregunta)
-        D, I = indice.search(qv, k)
-        resultados: List[Dict[str, Any]] = []
-        for score, idx in zip(D[0], I[0]):
-            if idx == -1:
-                continue
-            if float(score) < umbral:
-                continue
-            md = textos[int(idx)]
-            resultados.append({
-                "texto": md["texto"],
-                "archivo": md.get("archivo", ""),
-                "pagina": md.get("pagina", ""),
-                "similitud": float(score)
-            })
-        return resultados
+        return await _embed_query_async(pregunta)
     except Exception:
-        return []
+        return None
+
+
+def embeber_consulta(pregunta: str) -> Optional[np.ndarray]:
+    """Vector normalizado (1 x dim) de la pregunta, o None si no hay cliente o falla la llamada."""
+    if _client is None:
+        return None
+    try:
+        return _embed_query(pregunta)
+    except Exception:
+        return None
+
+
+def huella_indice(indice: Any) -> str:
+    """Identifica la versión del índice cargado (tamaño y fecha del archivo en disco)."""
+    if indice is None:
+        return "sin-indice"
+    mtime = os.path.getmtime(_ruta_indice_publicado) if os.path.exists(_ruta_indice_publicado) else 0
+    return f"{getattr(indice, 'ntotal', 0)}-{mtime:.0f}"
+
+
+def buscar_con_umbrales(pregunta: str, indice: Any, textos: List[Dict[str, Any]], k: int = 5,
+                        umbrales: Sequence[float] = (0.5,), vector: Optional[np.ndarray] = None,
+                        hibrida: Optional[bool] = None) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+    """Embebe la pregunta una sola vez (o usa el vector dado) y prueba los umbrales en orden.
+    Devuelve los pasajes del primer umbral que tenga resultados y ese umbral (None si ninguno).
+    Con BUSQUEDA_HIBRIDA los pasajes que superan el umbral se fusionan por RRF con los del top
+    BM25 que pasan el piso BUSQUEDA_BM25_MIN (ver _fusionar); un umbral alto sin coincidencias
+    léxicas fuertes deja la lista vacía y se prueba el siguiente. Sin embedding disponible se usa
+    solo BM25 (sin umbral). Mientras el BM25 se construye en segundo plano, solo FAISS.
+    'hibrida' elige el modo para esta llamada (None = BUSQUEDA_HIBRIDA).
+    """
+    if indice is None or not textos or faiss is None or not umbrales:
+        return [], None
+    if hibrida is None:
+        hibrida = BUSQUEDA_HIBRIDA
+    lexico = indice_lexico(textos, esperar=False) if hibrida else None
+    qv = vector
+    if qv is None and _client is not None:
+        try:
+            qv = _embed_query(pregunta)
+        except Exception:
+            qv = None
+    if qv is None:
+        resultados = buscar_lexico(pregunta, textos, k) if lexico is not None else []
+        return (resultados, umbrales[0]) if resultados else ([], None)
+
+    try:
+        lexicos = []
+        if lexico is not None:
+            piso = BUSQUEDA_BM25_MIN * lexico.puntaje_maximo(pregunta)
+            lexicos = [(i, p) for i, p in lexico.buscar(pregunta, k * BUSQUEDA_CANDIDATOS) if p >= piso]
+        if lexicos:
+            vecinos = _vecinos(qv, indice, k * BUSQUEDA_CANDIDATOS)
+        else:
+            puntuados = _buscar_puntuados(qv, indice, textos, k)
+    except Exception:
+        return [], None
+    for i, umbral in enumerate(umbrales):
+        if i > 0:
+            # Sin este reaprovechamiento, cada umbral extra costaba otro embedding
+            estadisticas_embeddings["llamadas_ahorradas"] += 1
+        if lexicos:
+            resultados = _fusionar(vecinos, lexicos, umbral, textos, k)
+        else:
+            resultados = [r for r in puntuados if r["similitud"] >= umbral]
+        if resultados:
+            return resultados, umbral
+    return [], None
+
+
+def buscar_similares(pregunta: str, indice: Any, textos: List[Dict[str, Any]], k: int = 5, umbral: float = 0.5,
+                     vector: Optional[np.ndarray] = None, hibrida: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """Retorna hasta k pasajes con similitud >= umbral usando FAISS. Si no hay índice, lista vacía.
+    'vector' permite pasar el embedding ya calculado (por ejemplo, con otro modelo en un benchmark)
+    y 'hibrida' forzar la búsqueda solo vectorial (False) o híbrida (True).
+    """
+    resultados, _ = buscar_con_umbrales(pregunta, indice, textos, k=k, umbrales=(umbral,), vector=vector,
+                                        hibrida=hibrida)
+    return resultados
@@ -0,0 +1,48 @@
+"""
+Modelos de request compartidos por los endpoints sync (api.py), async
+(api_async.py) y de carga por lotes (ingesta_masiva.py).
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import BaseModel, field_validator
+
+
+def a_utc_sin_zona(valor: Optional[datetime]) -> Optional[datetime]:
+    """Las columnas guardan UTC sin zona horaria: '2025-01-01T10:00:00-03:00' queda como 13:00."""
+    if valor is not None and valor.tzinfo is not None:
+        return valor.astimezone(timezone.utc).replace(tzinfo=None)
+    return valor
+
+
+class EstudianteRequest(BaseModel):
+    nombre: str
+    email: str
+    grupo: str = "General"
+
+
+class QuizResultRequest(BaseModel):
+    estudiante_id: int
+    puntaje: int
+    preguntas_correctas: int
+    total_preguntas: int
+    tiempo_completado_minutos: int
+
+
+class SesionLoteRequest(BaseModel):
+    """Sesión importada por lote; sin fechas se registra como iniciada ahora."""
+    estudiante_id: int
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+    duracion_minutos: Optional[int] = None
+    preguntas_realizadas: int = 0
+
+    _fechas_utc = field_validator("fecha_inicio", "fecha_fin")(a_utc_sin_zona)
+
+
+class QuizResultLoteRequest(QuizResultRequest):
+    """Resultado de quiz importado por lote; 'fecha' permite cargar resultados de periodos anteriores."""
+    fecha: Optional[datetime] = None
+
+    _fecha_utc = field_validator("fecha")(a_utc_sin_zona)
@@ -0,0 +1,171 @@
+"""
+Exportación de tablas de analytics a CSV o Parquet por streaming.
+Las filas se leen con un cursor del lado del servidor (stream_results +
+yield_per) en bloques de EXPORTACION_TAMANO_BLOQUE filas y cada bloque se
+convierte en bytes y se entrega de inmediato, así la memoria queda acotada
+por el tamaño del bloque y no por el de la tabla. CSV admite gzip;
+Parquet (requiere pyarrow, opcional) escribe un row group por bloque.
+Solo se pueden exportar las tablas de TABLAS_EXPORTABLES.
+"""
+
+import csv
+import io
+import os
+import zlib
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import DateTime, Float, Integer, Table, select
+
+from models import AnalyticsDiario, Estudiante, Pregunta, ResultadoQuiz, Sesion
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORTACION_TAMANO_BLOQUE = int(os.getenv("EXPORTACION_TAMANO_BLOQUE", "5000"))
+
+TABLAS_EXPORTABLES = {
+    "estudiantes": Estudiante.__table__,
+    "sesiones": Sesion.__table__,
+    "preguntas": Pregunta.__table__,
+    "resultados_quiz": ResultadoQuiz.__table__,
+    "analytics_diarios": AnalyticsDiario.__table__,
+}
+
+FORMATOS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_disponible() -> bool:
+    return pq is not None
+
+
+def tabla_exportable(nombre: str) -> Table:
+    """Tabla de la lista permitida; ValueError si no está (el nombre nunca llega al SQL)."""
+    tabla = TABLAS_EXPORTABLES.get(nombre)
+    if tabla is None:
+        raise ValueError(f"Tabla no exportable: {nombre}. Opciones: {', '.join(TABLAS_EXPORTABLES)}")
+    return tabla
+
+
+def nombre_archivo(tabla: str, formato: str, comprimir: bool = False) -> str:
+    return f"{tabla}.{formato}" + (".gz" if comprimir and formato == "csv" else "")
+
+
+def leer_bloques(engine, tabla: Table, tamano_bloque: int = EXPORTACION_TAMANO_BLOQUE) -> Iterator[Sequence]:
+    """Bloques de filas en orden de clave primaria, leídos con cursor del lado del servidor."""
+    with engine.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=tamano_bloque).execute(
+            select(tabla).order_by(*tabla.primary_key.columns)
+        )
+        for bloque in resultado.partitions():
+            yield bloque
+
+
+def _comprimir(trozos: Iterator[bytes]) -> Iterator[bytes]:
+    compresor = zlib.compressobj(wbits=31)  # 31 = formato gzip
+    for trozo in trozos:
+        comprimido = compresor.compress(trozo)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def _csv_sin_comprimir(engine, tabla: Table, tamano_bloque: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([c.name for c in tabla.columns])
+    for bloque in leer_bloques(engine, tabla, tamano_bloque):
+        escritor.writerows(bloque)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def generar_csv(engine, tabla: Table, comprimir: bool = False,
+                tamano_bloque: int = EXPORTACION_TAMANO_BLOQUE) -> Iterator[bytes]:
+    trozos = _csv_sin_comprimir(engine, tabla, tamano_bloque)
+    return _comprimir(trozos) if comprimir else trozos
+
+
+def _tipo_arrow(columna):
+    if isinstance(columna.type, Integer):
+        return pa.int64()
+    if isinstance(columna.type, Float):
+        return pa.float64()
+    if isinstance(columna.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+class _Drenaje(io.RawIOBase):
+    """Destino de ParquetWriter que acumula lo escrito para entregarlo por partes."""
+
+    def __init__(self):
+        super().__init__()
+        self._partes: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self) -> bytes:
+        datos, self._partes = b"".join(self._partes), []
+        return datos
+
+
+def generar_parquet(engine, tabla: Table, comprimir: bool = False,
+                    tamano_bloque: int = EXPORTACION_TAMANO_BLOQUE) -> Iterator[bytes]:
+    """Un row group por bloque; 'comprimir' usa gzip dentro del archivo en vez de snappy."""
+    if pq is None:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+    columnas = [c.name for c in tabla.columns]
+    esquema = pa.schema([(c.name, _tipo_arrow(c)) for c in tabla.columns])
+    destino = _Drenaje()
+    escritor = pq.ParquetWriter(destino, esquema, compression="gzip" if comprimir else "snappy")
+    try:
+        for bloque in leer_bloques(engine, tabla, tamano_bloque):
+            arreglos = [pa.array([fila[i] for fila in bloque], type=esquema.field(i).type)
+                        for i in range(len(columnas))]
+            escritor.write_table(pa.Table.from_arrays(arreglos, schema=esquema))
+            datos = destino.vaciar()
+            if datos:
+                yield datos
+    finally:
+        escritor.close()
+    yield destino.vaciar()
+
+
+def generar_exportacion(engine, nombre_tabla: str, formato: str = "csv", comprimir: bool = False,
+                        tamano_bloque: Optional[int] = None) -> Iterator[bytes]:
+    """Valida tabla y formato antes de empezar y devuelve el generador de bytes."""
+    tabla = tabla_exportable(nombre_tabla)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}. Opciones: {', '.join(FORMATOS)}")
+    if formato == "parquet" and not parquet_disponible():
+        raise ValueError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+    generador = generar_parquet if formato == "parquet" else generar_csv
+    return generador(engine, tabla, comprimir, tamano_bloque or EXPORTACION_TAMANO_BLOQUE)
+
+
+def exportar_a_archivo(engine, nombre_tabla: str, ruta: str, formato: str = "csv",
+                       comprimir: bool = False) -> int:
+    """Escribe la exportación en 'ruta' (vía archivo temporal + reemplazo atómico). Devuelve los bytes escritos."""
+    total = 0
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        for trozo in generar_exportacion(engine, nombre_tabla, formato, comprimir):
+            f.write(trozo)
+            total += len(trozo)
+    os.replace(temporal, ruta)
+    return total
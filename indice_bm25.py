@@ -0,0 +1,150 @@
+"""
+Índice invertido BM25 sobre los mismos chunks que el índice FAISS.
+Las preguntas de normativa dependen de tokens exactos ("Decreto 405",
+"Norma Técnica N°147", "466") que los embeddings ordenan mal; BM25 los
+encuentra sin llamar a la API. Los textos se normalizan (minúsculas, sin
+tildes), se quitan las palabras vacías y se reducen con un stemmer liviano
+de español (plurales y vocal final); los números se conservan tal cual.
+
+fusion_rrf combina dos rankings por reciprocal rank fusion: cada documento
+suma 1 / (RRF_K + posición) por cada lista en la que aparece.
+"""
+
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+PALABRAS_VACIAS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuales cuando de del desde
+donde durante e el ella ellas ellos en entre era eran es esa esas ese eso esos esta estan estas este esto
+estos fue fueron ha han hasta hay la las le les lo los mas me mi mientras muy ni no nos o otra otras otro
+otros para pero poco por porque que quien quienes se segun ser si sin sobre son su sus tambien tan te
+tiene tienen todo todos tu un una unas uno unos y ya
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Tokens que hacen "léxica" una consulta: números de normas y referencias legales
+_REFERENCIA_LEGAL = re.compile(r"\b(decreto|ley|norma|resolucion|articulo|reglamento|nt)\b|\d{2,}")
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas y sin tildes ni diéresis (la ñ queda como n)."""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def raiz(token: str) -> str:
+    """Stemmer liviano de español: quita el plural y la vocal final de género."""
+    if token.isdigit() or len(token) <= 3:
+        return token
+    if token.endswith("es") and len(token) > 5:
+        token = token[:-2]
+    elif token.endswith("s") and len(token) > 4:
+        token = token[:-1]
+    if token[-1] in "aoe" and len(token) > 4:
+        token = token[:-1]
+    return token
+
+
+def terminos(texto: str) -> List[str]:
+    """Términos indexables de un texto (plegado, sin palabras vacías, con raíz)."""
+    return [raiz(t) for t in _TOKEN.findall(plegar(texto))
+            if t not in PALABRAS_VACIAS and (len(t) > 1 or t.isdigit())]
+
+
+def es_consulta_lexica(pregunta: str) -> bool:
+    """True si la pregunta cita normas o números: BM25 solo suele bastar para responderla."""
+    return bool(_REFERENCIA_LEGAL.search(plegar(pregunta)))
+
+
+class IndiceBM25:
+    """Listas de postings (ids y frecuencias en arreglos numpy) por término."""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.longitudes = np.zeros(0, dtype="float32")
+        self.documentos = 0
+        self.longitud_media = 0.0
+
+    @classmethod
+    def desde_chunks(cls, chunks: Iterable[Optional[Dict[str, Any]]], **kwargs) -> "IndiceBM25":
+        """Construye el índice recorriendo los metadatos por id (los huecos en None se saltan)."""
+        indice = cls(**kwargs)
+        ids_por_termino: Dict[str, List[int]] = {}
+        tf_por_termino: Dict[str, List[int]] = {}
+        longitudes: List[int] = []
+        for i, md in enumerate(chunks):
+            if md is None:
+                longitudes.append(0)
+                continue
+            conteo = Counter(terminos(md.get("texto", "")))
+            longitudes.append(sum(conteo.values()))
+            for termino, tf in conteo.items():
+                ids_por_termino.setdefault(termino, []).append(i)
+                tf_por_termino.setdefault(termino, []).append(tf)
+        indice.postings = {
+            t: (np.array(ids, dtype="int64"), np.array(tf_por_termino[t], dtype="float32"))
+            for t, ids in ids_por_termino.items()
+        }
+        indice.longitudes = np.array(longitudes, dtype="float32")
+        presentes = indice.longitudes[indice.longitudes > 0]
+        indice.documentos = len(presentes)
+        indice.longitud_media = float(presentes.mean()) if len(presentes) else 0.0
+        return indice
+
+    def __len__(self) -> int:
+        return self.documentos
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self.documentos - df + 0.5) / (df + 0.5))
+
+    def buscar(self, consulta: str, k: int = 10) -> List[Tuple[int, float]]:
+        """(id, puntaje BM25) de los k mejores chunks, de mayor a menor."""
+        if not self.documentos:
+            return []
+        puntajes = np.zeros(len(self.longitudes), dtype="float32")
+        normalizacion = self.k1 * (1 - self.b + self.b * self.longitudes / self.longitud_media)
+        for termino in set(terminos(consulta)):
+            posting = self.postings.get(termino)
+            if posting is None:
+                continue
+            ids, tf = posting
+            puntajes[ids] += self._idf(len(ids)) * tf * (self.k1 + 1) / (tf + normalizacion[ids])
+        candidatos = np.flatnonzero(puntajes)
+        if not len(candidatos):
+            return []
+        if len(candidatos) > k:
+            candidatos = candidatos[np.argpartition(-puntajes[candidatos], k - 1)[:k]]
+        candidatos = candidatos[np.argsort(-puntajes[candidatos], kind="stable")]
+        return [(int(i), float(puntajes[i])) for i in candidatos]
+
+    def puntaje_maximo(self, consulta: str) -> float:
+        """Cota del puntaje de 'consulta': cada término aporta a lo más idf * (k1 + 1).
+        Sirve para fijar pisos relativos que no dependen del tamaño del corpus.
+        """
+        return sum(self._idf(len(self.postings[t][0]) if t in self.postings else 0) * (self.k1 + 1)
+                   for t in set(terminos(consulta)))
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {"chunks": self.documentos, "terminos": len(self.postings),
+                "longitud_media": round(self.longitud_media, 1)}
+
+
+def fusion_rrf(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion de varias listas de ids ordenadas; devuelve (id, puntaje) de mayor a menor."""
+    puntajes: Dict[int, float] = {}
+    for ranking in rankings:
+        for posicion, id_ in enumerate(ranking, start=1):
+            puntajes[id_] = puntajes.get(id_, 0.0) + 1.0 / (k + posicion)
+    return sorted(puntajes.items(), key=lambda par: par[1], reverse=True)
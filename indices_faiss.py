@@ -0,0 +1,165 @@
+"""
+Fábrica de índices FAISS para la búsqueda semántica.
+Según INDICE_TIPO se construye:
+- flat:  búsqueda exacta (IndexFlatIP), la opción por defecto.
+- hnsw:  grafo HNSW; INDICE_HNSW_EF_BUSQUEDA regula recall vs latencia.
+- ivf:   lista invertida con centroides entrenados; INDICE_IVF_NPROBE listas por consulta.
+- ivfpq: IVF con vectores comprimidos por product quantization (menos memoria, recall aproximado).
+
+Todos usan producto interno (los vectores van normalizados) y quedan
+envueltos en IndexIDMap2, así el resto del código sigue añadiendo y buscando
+por id igual que con el índice exacto. Si no hay vectores suficientes para
+entrenar IVF/PQ se construye flat; asegurar_tipo lo reconstruye cuando ya
+alcanzan.
+"""
+
+import math
+import os
+from typing import Any, Optional
+
+import numpy as np
+
+try:
+    import faiss  # faiss-cpu
+except Exception:
+    faiss = None
+
+INDICE_TIPO = os.getenv("INDICE_TIPO", "flat").lower()
+INDICE_HNSW_M = int(os.getenv("INDICE_HNSW_M", "32"))
+INDICE_HNSW_EF_CONSTRUCCION = int(os.getenv("INDICE_HNSW_EF_CONSTRUCCION", "200"))
+INDICE_HNSW_EF_BUSQUEDA = int(os.getenv("INDICE_HNSW_EF_BUSQUEDA", "64"))
+INDICE_IVF_NLIST = int(os.getenv("INDICE_IVF_NLIST", "0"))  # 0 = automático según la cantidad de vectores
+INDICE_IVF_NPROBE = int(os.getenv("INDICE_IVF_NPROBE", "8"))
+INDICE_PQ_M = int(os.getenv("INDICE_PQ_M", "0"))  # 0 = automático (subvectores de ~8 dimensiones)
+INDICE_PQ_BITS = int(os.getenv("INDICE_PQ_BITS", "8"))
+
+TIPOS = ("flat", "hnsw", "ivf", "ivfpq")
+# k-means de FAISS pide ~39 puntos por centroide para entrenar sin advertencias
+PUNTOS_POR_CENTROIDE = 39
+
+
+def _nlist(n: int) -> int:
+    if INDICE_IVF_NLIST:
+        return INDICE_IVF_NLIST
+    return max(1, min(int(4 * math.sqrt(n)), n // PUNTOS_POR_CENTROIDE))
+
+
+def _pq_m(dim: int) -> int:
+    """Cantidad de subvectores PQ: debe dividir a la dimensión."""
+    m = INDICE_PQ_M or max(1, dim // 8)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def tipo_efectivo(tipo: str, n: int) -> str:
+    """Tipo que realmente se construye con n vectores (flat si no alcanzan para entrenar)."""
+    if tipo not in TIPOS:
+        print(f"⚠️ INDICE_TIPO '{tipo}' desconocido, se usa flat")
+        return "flat"
+    if tipo == "ivf" and n < PUNTOS_POR_CENTROIDE * max(_nlist(n), 1):
+        return "flat"
+    if tipo == "ivfpq" and (n < PUNTOS_POR_CENTROIDE * max(_nlist(n), 1) or n < PUNTOS_POR_CENTROIDE * 2 ** INDICE_PQ_BITS):
+        return "flat"
+    return tipo
+
+
+def crear_indice(embeddings: np.ndarray, ids: Optional[np.ndarray] = None, tipo: Optional[str] = None):
+    """Construye el índice del tipo pedido (o INDICE_TIPO) con los vectores e ids dados."""
+    if faiss is None:
+        return None
+    n, dim = embeddings.shape
+    tipo = tipo_efectivo(tipo or INDICE_TIPO, n)
+    if ids is None:
+        ids = np.arange(n, dtype="int64")
+
+    if tipo == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, INDICE_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = INDICE_HNSW_EF_CONSTRUCCION
+    elif tipo in ("ivf", "ivfpq"):
+        cuantizador = faiss.IndexFlatIP(dim)
+        nlist = _nlist(n)
+        if tipo == "ivf":
+            base = faiss.IndexIVFFlat(cuantizador, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            base = faiss.IndexIVFPQ(cuantizador, dim, nlist, _pq_m(dim), INDICE_PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+        base.train(embeddings)
+    else:
+        base = faiss.IndexFlatIP(dim)
+
+    index = faiss.IndexIDMap2(base)
+    index.add_with_ids(embeddings, ids)
+    configurar_busqueda(index)
+    return index
+
+
+def _interno(index: Any) -> Any:
+    return faiss.downcast_index(index.index) if hasattr(index, "id_map") else faiss.downcast_index(index)
+
+
+def describir(index: Any) -> str:
+    """Tipo del índice cargado: flat, hnsw, ivf o ivfpq."""
+    if index is None or faiss is None:
+        return "ninguno"
+    interno = _interno(index)
+    if isinstance(interno, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(interno, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(interno, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def configurar_busqueda(index: Any, ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> None:
+    """Aplica efSearch (HNSW) o nprobe (IVF); no se guardan en el archivo sino en cada carga."""
+    if index is None or faiss is None:
+        return
+    interno = _interno(index)
+    if isinstance(interno, faiss.IndexHNSW):
+        interno.hnsw.efSearch = ef_search or INDICE_HNSW_EF_BUSQUEDA
+    elif isinstance(interno, faiss.IndexIVF):
+        interno.nprobe = min(nprobe or INDICE_IVF_NPROBE, interno.nlist)
+
+
+def vectores_e_ids(index: Any):
+    """Vectores almacenados y sus ids (exactos en flat/hnsw/ivf; aproximados en ivfpq)."""
+    interno = _interno(index)
+    if isinstance(interno, faiss.IndexIVF):
+        interno.make_direct_map()
+    vectores = interno.reconstruct_n(0, interno.ntotal)
+    return vectores, faiss.vector_to_array(index.id_map).astype("int64")
+
+
+def quitar_ids(index: Any, ids: np.ndarray):
+    """remove_ids para cualquier tipo. HNSW no admite borrar: se reconstruye sin esos ids."""
+    if index is None or len(ids) == 0:
+        return index
+    if describir(index) != "hnsw":
+        index.remove_ids(np.asarray(ids, dtype="int64"))
+        return index
+    vectores, actuales = vectores_e_ids(index)
+    conservar = ~np.isin(actuales, ids)
+    if not conservar.any():
+        return crear_indice(np.empty((0, index.d), dtype="float32"), np.empty(0, dtype="int64"), "flat")
+    return crear_indice(vectores[conservar], actuales[conservar], "hnsw")
+
+
+def asegurar_tipo(index: Any):
+    """Reconstruye el índice si INDICE_TIPO cambió o si ya hay vectores suficientes para entrenarlo.
+    Un índice ivfpq no se convierte (sus vectores son aproximados): hay que regenerarlo desde el material.
+    """
+    if index is None or faiss is None or index.ntotal == 0:
+        return index
+    actual = describir(index)
+    deseado = tipo_efectivo(INDICE_TIPO, index.ntotal)
+    if actual == deseado:
+        configurar_busqueda(index)
+        return index
+    if actual == "ivfpq":
+        print(f"⚠️ El índice es ivfpq y INDICE_TIPO pide {deseado}: borra index_store para regenerarlo")
+        configurar_busqueda(index)
+        return index
+    print(f"🔁 Reconstruyendo índice: {actual} → {deseado} ({index.ntotal} vectores)")
+    vectores, ids = vectores_e_ids(index)
+    return crear_indice(vectores, ids, deseado)
@@ -0,0 +1,269 @@
+"""
+Carga por lotes de estudiantes, sesiones y resultados de quiz.
+Los endpoints reciben un arreglo JSON o un flujo NDJSON (una fila por línea,
+leído a medida que llega), validan cada fila con Pydantic e insertan en
+transacciones de INGESTA_TAMANO_LOTE filas: un commit por lote en vez de uno
+por fila. Las filas inválidas no detienen la carga; se informan con su número
+(desde 0) en 'errores'. Los emails repetidos actualizan nombre y grupo del
+estudiante existente (upsert), así reenviar la misma planilla no duplica nada.
+Las fechas con zona horaria se convierten a UTC sin zona (esquemas.a_utc_sin_zona).
+Si llegan filas de días ya cerrados, solo esos días se vuelven a plegar en los
+agregados, en segundo plano y después de responder.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Set, Tuple, Type
+
+from fastapi import Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from agregados_diarios import inicio_dia, replegar_dias
+from models import Estudiante, Sesion, ResultadoQuiz
+
+INGESTA_TAMANO_LOTE = int(os.getenv("INGESTA_TAMANO_LOTE", "500"))
+MAX_ERRORES_REPORTADOS = 1000
+
+Filas = List[Tuple[int, BaseModel]]
+# Cada función de inserción devuelve (insertadas, actualizadas, errores, fechas insertadas)
+ResultadoLote = Tuple[int, int, List[Dict[str, Any]], Iterable[datetime]]
+
+
+class ResultadoIngesta:
+    """Totales de una carga y errores por fila (se guardan los primeros MAX_ERRORES_REPORTADOS)."""
+
+    def __init__(self):
+        self.recibidas = 0
+        self.insertadas = 0
+        self.actualizadas = 0
+        self.con_error = 0
+        self.lotes = 0
+        self.errores: List[Dict[str, Any]] = []
+        self.dias: Set[datetime] = set()
+
+    def error(self, fila: int, mensaje: str) -> None:
+        self.con_error += 1
+        if len(self.errores) < MAX_ERRORES_REPORTADOS:
+            self.errores.append({"fila": fila, "error": mensaje})
+
+    def sumar(self, parcial: ResultadoLote) -> None:
+        insertadas, actualizadas, errores, fechas = parcial
+        self.insertadas += insertadas
+        self.actualizadas += actualizadas
+        for e in errores:
+            self.error(e["fila"], e["error"])
+        self.dias.update(inicio_dia(f) for f in fechas)
+
+    def dias_cerrados(self) -> List[datetime]:
+        hoy = inicio_dia(datetime.utcnow())
+        return sorted(d for d in self.dias if d < hoy)
+
+    def como_dict(self) -> Dict[str, Any]:
+        return {
+            "recibidas": self.recibidas,
+            "insertadas": self.insertadas,
+            "actualizadas": self.actualizadas,
+            "con_error": self.con_error,
+            "lotes": self.lotes,
+            "dias_a_replegar": len(self.dias_cerrados()),
+            "errores": self.errores
+        }
+
+
+def _mensaje_validacion(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'fila'}: {e['msg']}" for e in error.errors())
+
+
+def _decodificar(linea: bytes) -> Any:
+    try:
+        return json.loads(linea)
+    except ValueError as e:
+        return ValueError(f"JSON inválido: {e}")
+
+
+async def leer_filas(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """Entrega (número de fila, objeto) desde un arreglo JSON o un cuerpo NDJSON.
+    Una línea NDJSON ilegible se entrega como ValueError para informarla como error de esa fila.
+    """
+    tipo = request.headers.get("content-type", "")
+    if "ndjson" in tipo or "jsonlines" in tipo:
+        n = 0
+        pendiente = b""
+        async for trozo in request.stream():
+            pendiente += trozo
+            *lineas, pendiente = pendiente.split(b"\n")
+            for linea in lineas:
+                if linea.strip():
+                    yield n, _decodificar(linea)
+                    n += 1
+        if pendiente.strip():
+            yield n, _decodificar(pendiente)
+        return
+
+    try:
+        datos = json.loads(await request.body())
+    except ValueError as e:
+        raise ValueError(f"El cuerpo no es JSON válido: {e}")
+    if not isinstance(datos, list):
+        raise ValueError("Se esperaba un arreglo JSON o NDJSON (Content-Type: application/x-ndjson)")
+    for n, obj in enumerate(datos):
+        yield n, obj
+
+
+def _estudiantes_existentes(db: Session, filas: Filas) -> Tuple[Filas, List[Dict[str, Any]]]:
+    """Separa las filas cuyo estudiante_id no existe (SQLite no valida las claves foráneas)."""
+    ids = {f.estudiante_id for _, f in filas}
+    existentes = set(db.scalars(select(Estudiante.id).where(Estudiante.id.in_(ids))))
+    validas = [(n, f) for n, f in filas if f.estudiante_id in existentes]
+    errores = [{"fila": n, "error": f"Estudiante {f.estudiante_id} no existe"}
+               for n, f in filas if f.estudiante_id not in existentes]
+    return validas, errores
+
+
+def _insert_upsert(db: Session):
+    """insert() del dialecto con soporte ON CONFLICT, o None si la base no lo tiene."""
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    elif dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        return None
+    return insert_dialecto
+
+
+def insertar_estudiantes(db: Session, filas: Filas) -> ResultadoLote:
+    # Si un email se repite dentro del lote gana la última fila
+    por_email = {f.email: f for _, f in filas}
+    existentes = set(db.scalars(select(Estudiante.email).where(Estudiante.email.in_(por_email))))
+    ahora = datetime.utcnow()
+    valores = [{"nombre": f.nombre, "email": f.email, "grupo": f.grupo, "fecha_registro": ahora}
+               for f in por_email.values()]
+
+    insert_dialecto = _insert_upsert(db)
+    if insert_dialecto is not None:
+        stmt = insert_dialecto(Estudiante)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Estudiante.email],
+            set_={"nombre": stmt.excluded.nombre, "grupo": stmt.excluded.grupo}
+        )
+        db.execute(stmt, valores)
+    else:
+        nuevos = [v for v in valores if v["email"] not in existentes]
+        if nuevos:
+            db.execute(insert(Estudiante), nuevos)
+        for v in valores:
+            if v["email"] in existentes:
+                db.execute(update(Estudiante).where(Estudiante.email == v["email"])
+                           .values(nombre=v["nombre"], grupo=v["grupo"]))
+
+    actualizadas = len(existentes)
+    return len(por_email) - actualizadas, actualizadas, [], []
+
+
+def insertar_sesiones(db: Session, filas: Filas) -> ResultadoLote:
+    validas, errores = _estudiantes_existentes(db, filas)
+    ahora = datetime.utcnow()
+    valores = []
+    for _, s in validas:
+        fecha_inicio = s.fecha_inicio or ahora
+        duracion = s.duracion_minutos
+        if duracion is None:
+            duracion = int((s.fecha_fin - fecha_inicio).total_seconds() / 60) if s.fecha_fin else 0
+        valores.append({
+            "estudiante_id": s.estudiante_id,
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": s.fecha_fin,
+            "duracion_minutos": duracion,
+            "preguntas_realizadas": s.preguntas_realizadas
+        })
+    if valores:
+        db.execute(insert(Sesion), valores)
+    return len(valores), 0, errores, [v["fecha_inicio"] for v in valores]
+
+
+def insertar_resultados_quiz(db: Session, filas: Filas) -> ResultadoLote:
+    validas, errores = _estudiantes_existentes(db, filas)
+    ahora = datetime.utcnow()
+    valores = [{
+        "estudiante_id": r.estudiante_id,
+        "puntaje": r.puntaje,
+        "preguntas_correctas": r.preguntas_correctas,
+        "total_preguntas": r.total_preguntas,
+        "tiempo_completado_minutos": r.tiempo_completado_minutos,
+        "fecha": r.fecha or ahora
+    } for _, r in validas]
+    if valores:
+        db.execute(insert(ResultadoQuiz), valores)
+    return len(valores), 0, errores, [v["fecha"] for v in valores]
+
+
+def _procesar_lote(session_factory: Callable[[], Session], insertar: Callable[[Session, Filas], ResultadoLote],
+                   filas: Filas, resultado: ResultadoIngesta) -> None:
+    """Inserta el lote en una transacción; si falla, reintenta fila por fila para aislar las que fallan."""
+    db = session_factory()
+    try:
+        try:
+            parcial = insertar(db, filas)
+            db.commit()
+            resultado.sumar(parcial)
+            resultado.lotes += 1
+            return
+        except SQLAlchemyError:
+            db.rollback()
+
+        for n, fila in filas:
+            try:
+                parcial = insertar(db, [(n, fila)])
+                db.commit()
+                resultado.sumar(parcial)
+            except SQLAlchemyError as e:
+                db.rollback()
+                resultado.error(n, str(getattr(e, "orig", None) or e))
+        resultado.lotes += 1
+    finally:
+        db.close()
+
+
+def _replegar_agregados(session_factory: Callable[[], Session], dias: List[datetime]) -> None:
+    db = session_factory()
+    try:
+        plegados = replegar_dias(db, dias)
+        print(f"📊 Agregados replegados tras la carga: {plegados} días")
+    except Exception as e:
+        print(f"⚠️ No se pudieron replegar los agregados de {len(dias)} días: {e}")
+    finally:
+        db.close()
+
+
+async def ingerir(request: Request, modelo: Type[BaseModel], insertar: Callable[[Session, Filas], ResultadoLote],
+                  session_factory: Callable[[], Session]) -> Dict[str, Any]:
+    """Lee, valida e inserta por lotes; el trabajo de base de datos corre en el threadpool."""
+    resultado = ResultadoIngesta()
+    lote: Filas = []
+    async for n, obj in leer_filas(request):
+        resultado.recibidas += 1
+        if isinstance(obj, Exception):
+            resultado.error(n, str(obj))
+            continue
+        try:
+            lote.append((n, modelo.model_validate(obj)))
+        except ValidationError as e:
+            resultado.error(n, _mensaje_validacion(e))
+        if len(lote) >= INGESTA_TAMANO_LOTE:
+            await run_in_threadpool(_procesar_lote, session_factory, insertar, lote, resultado)
+            lote = []
+    if lote:
+        await run_in_threadpool(_procesar_lote, session_factory, insertar, lote, resultado)
+
+    # Filas de días ya cerrados: se repliegan solo esos días, sin retrasar la respuesta
+    dias = resultado.dias_cerrados()
+    if dias:
+        asyncio.get_running_loop().run_in_executor(None, _replegar_agregados, session_factory, dias)
+    return resultado.como_dict()
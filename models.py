@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, Index, inspect
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database_config import Base
@@ -22,7 +22,7 @@ class Sesion(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     estudiante_id = Column(Integer, ForeignKey("estudiantes.id"))
-    fecha_inicio = Column(DateTime, default=datetime.utcnow)
+    fecha_inicio = Column(DateTime, default=datetime.utcnow, index=True)
     fecha_fin = Column(DateTime)
     duracion_minutos = Column(Integer, default=0)
     preguntas_realizadas = Column(Integer, default=0)
@@ -30,22 +30,31 @@ class Sesion(Base):
     # Relaciones
     estudiante = relationship("Estudiante", back_populates="sesiones")
     preguntas = relationship("Pregunta", back_populates="sesion")
+    
+    __table_args__ = (
+        Index("ix_sesiones_estudiante_fecha", "estudiante_id", "fecha_inicio"),
+    )
 
 class Pregunta(Base):
     __tablename__ = "preguntas"
     
     id = Column(Integer, primary_key=True, index=True)
     estudiante_id = Column(Integer, ForeignKey("estudiantes.id"))
-    sesion_id = Column(Integer, ForeignKey("sesiones.id"))
+    sesion_id = Column(Integer, ForeignKey("sesiones.id"), index=True)
     pregunta = Column(Text, nullable=False)
     respuesta = Column(Text)
     categoria = Column(String(50))
-    fecha = Column(DateTime, default=datetime.utcnow)
+    fecha = Column(DateTime, default=datetime.utcnow, index=True)
     tiempo_respuesta_ms = Column(Integer)
     
     # Relaciones
     estudiante = relationship("Estudiante", back_populates="preguntas")
     sesion = relationship("Sesion", back_populates="preguntas")
+    
+    __table_args__ = (
+        Index("ix_preguntas_estudiante_categoria", "estudiante_id", "categoria"),
+        Index("ix_preguntas_estudiante_fecha", "estudiante_id", "fecha"),
+    )
 
 class ResultadoQuiz(Base):
     __tablename__ = "resultados_quiz"
@@ -55,11 +64,15 @@ class ResultadoQuiz(Base):
     puntaje = Column(Integer)
     preguntas_correctas = Column(Integer)
     total_preguntas = Column(Integer)
-    fecha = Column(DateTime, default=datetime.utcnow)
+    fecha = Column(DateTime, default=datetime.utcnow, index=True)
     tiempo_completado_minutos = Column(Integer)
     
     # Relaciones
     estudiante = relationship("Estudiante", back_populates="resultados_quiz")
+    
+    __table_args__ = (
+        Index("ix_resultados_quiz_estudiante_fecha", "estudiante_id", "fecha"),
+    )
 
 class AnalyticsDiario(Base):
     __tablename__ = "analytics_diarios"
@@ -70,4 +83,34 @@ class AnalyticsDiario(Base):
     total_preguntas = Column(Integer, default=0)
     promedio_puntaje_quiz = Column(Float, default=0.0)
     categoria_mas_consultada = Column(String(50))
-    pregunta_mas_frecuente = Column(Text) 
\ No newline at end of file
+    pregunta_mas_frecuente = Column(Text)
+    total_quiz = Column(Integer, default=0)
+    total_sesiones = Column(Integer, default=0)
+    fecha_calculo = Column(DateTime)
+
+class AnalyticsDiarioCategoria(Base):
+    __tablename__ = "analytics_diarios_categorias"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    fecha = Column(DateTime, nullable=False)
+    categoria = Column(String(50), nullable=False)
+    total = Column(Integer, default=0)
+    
+    __table_args__ = (
+        Index("ix_analytics_diarios_categorias_fecha_categoria", "fecha", "categoria", unique=True),
+    )
+
+def crear_tablas_e_indices(engine):
+    """Crea las tablas que falten, agrega columnas nuevas a tablas que ya existían
+    y sus índices nuevos (create_all solo crea columnas e índices junto con su tabla)."""
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    for tabla in Base.metadata.sorted_tables:
+        existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+        with engine.begin() as conn:
+            for columna in tabla.columns:
+                if columna.name not in existentes:
+                    tipo = columna.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}")
+        for indice in tabla.indexes:
+            indice.create(bind=engine, checkfirst=True)
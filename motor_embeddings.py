@@ -0,0 +1,154 @@
+"""
+Motor asíncrono de embeddings para construir el índice.
+Envía lotes en paralelo (con límite de concurrencia), arma los lotes por
+tokens estimados en vez de por cantidad fija, reintenta con backoff
+exponencial ante 429/5xx y guarda cada lote terminado en disco para que una
+construcción interrumpida continúe donde quedó.
+
+Para probarlo sin red basta con apuntar OPENAI_BASE_URL al servidor local
+de servidor_embeddings_falso.py.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+import numpy as np
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+
+class MotorEmbeddings:
+    """Genera embeddings de muchos textos con lotes concurrentes, reintentos y checkpoints."""
+
+    def __init__(self, modelo: str, api_key: Optional[str] = None, concurrencia: int = 4,
+                 max_tokens_lote: int = 20000, max_textos_lote: int = 2048, reintentos: int = 6,
+                 espera_base: float = 1.0, dir_checkpoint: Optional[str] = None, base_url: Optional[str] = None):
+        self.modelo = modelo
+        self.api_key = api_key
+        self.base_url = base_url
+        self.concurrencia = concurrencia
+        self.max_tokens_lote = max_tokens_lote
+        self.max_textos_lote = max_textos_lote
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.dir_checkpoint = dir_checkpoint
+        self._codificador: Any = None
+        if tiktoken is not None:
+            try:
+                self._codificador = tiktoken.encoding_for_model(modelo)
+            except Exception:
+                self._codificador = None
+        self.estadisticas = {"lotes": 0, "lotes_desde_checkpoint": 0, "reintentos": 0}
+
+    def _contar_tokens(self, texto: str) -> int:
+        if self._codificador is not None:
+            return len(self._codificador.encode(texto))
+        # Estimación conservadora para español sin tiktoken
+        return len(texto) // 3 + 1
+
+    def armar_lotes(self, textos: List[str]) -> List[List[str]]:
+        """Agrupa textos consecutivos sin pasar max_tokens_lote ni max_textos_lote."""
+        lotes: List[List[str]] = []
+        actual: List[str] = []
+        tokens = 0
+        for texto in textos:
+            n = self._contar_tokens(texto)
+            if actual and (tokens + n > self.max_tokens_lote or len(actual) >= self.max_textos_lote):
+                lotes.append(actual)
+                actual, tokens = [], 0
+            actual.append(texto)
+            tokens += n
+        if actual:
+            lotes.append(actual)
+        return lotes
+
+    def _ruta_checkpoint(self, lote: List[str]) -> Optional[str]:
+        if not self.dir_checkpoint:
+            return None
+        h = hashlib.sha256(self.modelo.encode("utf-8"))
+        for texto in lote:
+            h.update(b"\0" + texto.encode("utf-8"))
+        return os.path.join(self.dir_checkpoint, f"{h.hexdigest()}.npy")
+
+    def _espera(self, intento: int, error: Exception) -> float:
+        respuesta = getattr(error, "response", None)
+        retry_after = respuesta.headers.get("retry-after") if respuesta is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.espera_base * (2 ** intento) + random.uniform(0, self.espera_base)
+
+    async def _embeber_lote(self, cliente: AsyncOpenAI, semaforo: asyncio.Semaphore, lote: List[str]) -> np.ndarray:
+        ruta = self._ruta_checkpoint(lote)
+        if ruta and os.path.exists(ruta):
+            try:
+                self.estadisticas["lotes_desde_checkpoint"] += 1
+                return np.load(ruta)
+            except Exception:
+                pass
+
+        async with semaforo:
+            for intento in range(self.reintentos + 1):
+                try:
+                    resp = await cliente.embeddings.create(model=self.modelo, input=lote)
+                    break
+                except (RateLimitError, APIConnectionError, APITimeoutError, APIStatusError) as e:
+                    reintentable = not isinstance(e, APIStatusError) or isinstance(e, RateLimitError) or e.status_code >= 500
+                    if not reintentable or intento == self.reintentos:
+                        raise
+                    self.estadisticas["reintentos"] += 1
+                    await asyncio.sleep(self._espera(intento, e))
+
+        datos = sorted(resp.data, key=lambda d: d.index)
+        arr = np.array([d.embedding for d in datos], dtype="float32")
+        self.estadisticas["lotes"] += 1
+        if ruta:
+            os.makedirs(self.dir_checkpoint, exist_ok=True)
+            tmp = ruta + ".tmp.npy"
+            np.save(tmp, arr)
+            os.replace(tmp, ruta)
+        return arr
+
+    async def embeber(self, textos: List[str]) -> np.ndarray:
+        """Embeddings (sin normalizar) de todos los textos, en el mismo orden."""
+        if not textos:
+            return np.zeros((0, 0), dtype="float32")
+        semaforo = asyncio.Semaphore(self.concurrencia)
+        cliente = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        try:
+            partes = await asyncio.gather(*[
+                self._embeber_lote(cliente, semaforo, lote) for lote in self.armar_lotes(textos)
+            ])
+        finally:
+            await cliente.close()
+        return np.vstack(partes)
+
+    def embeber_sync(self, textos: List[str]) -> np.ndarray:
+        """Versión bloqueante de embeber(); funciona aunque ya haya un event loop en el hilo."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.embeber(textos))
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            return ex.submit(asyncio.run, self.embeber(textos)).result()
+
+    def limpiar_checkpoints(self) -> None:
+        """Borra los lotes guardados una vez que el índice quedó persistido."""
+        if not self.dir_checkpoint or not os.path.isdir(self.dir_checkpoint):
+            return
+        for nombre in os.listdir(self.dir_checkpoint):
+            if nombre.endswith(".npy"):
+                try:
+                    os.remove(os.path.join(self.dir_checkpoint, nombre))
+                except OSError:
+                    pass
@@ -0,0 +1,78 @@
+"""
+Registro de plantillas de prompt.
+Carga los archivos al inicio y los recarga cuando cambia su fecha de
+modificación (el panel de administración edita prompt.txt), así /preguntar
+no abre ni lee el archivo en cada pregunta. Cada plantilla lleva una versión
+(hash del contenido) para invalidar respuestas cacheadas.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+
+class Plantilla(NamedTuple):
+    texto: str
+    version: str
+    mtime: float
+
+
+class RegistroPlantillas:
+    """Plantillas en memoria con recarga por mtime, revisada como máximo cada 'intervalo' segundos."""
+
+    def __init__(self, intervalo: float = 2.0):
+        self.intervalo = intervalo
+        self._rutas: Dict[str, str] = {}
+        self._respaldos: Dict[str, str] = {}
+        self._plantillas: Dict[str, Plantilla] = {}
+        self._ultima_revision: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre: str, ruta: str, respaldo: str = "") -> Plantilla:
+        """Registra una plantilla y la carga de inmediato."""
+        self._rutas[nombre] = ruta
+        self._respaldos[nombre] = respaldo
+        return self.recargar(nombre)
+
+    def _leer(self, nombre: str) -> Plantilla:
+        ruta = self._rutas[nombre]
+        try:
+            mtime = os.path.getmtime(ruta)
+            with open(ruta, "r", encoding="utf-8") as f:
+                texto = f.read()
+        except (FileNotFoundError, OSError):
+            # Fallback si no se encuentra el archivo
+            mtime, texto = 0.0, self._respaldos.get(nombre, "")
+        version = hashlib.sha256(texto.encode("utf-8")).hexdigest()[:12]
+        return Plantilla(texto, version, mtime)
+
+    def recargar(self, nombre: Optional[str] = None) -> Plantilla:
+        """Vuelve a leer una plantilla (o todas) y la reemplaza de forma atómica."""
+        nombres = [nombre] if nombre else list(self._rutas)
+        with self._lock:
+            for n in nombres:
+                nueva = self._leer(n)
+                anterior = self._plantillas.get(n)
+                if anterior is None or anterior.version != nueva.version:
+                    print(f"📝 Plantilla '{n}' cargada (versión {nueva.version})")
+                self._plantillas[n] = nueva
+                self._ultima_revision[n] = time.monotonic()
+        return self._plantillas[nombres[-1]] if nombres else None
+
+    def obtener(self, nombre: str) -> Plantilla:
+        """Plantilla vigente; revisa el mtime del archivo si pasó el intervalo."""
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision.get(nombre, 0.0) >= self.intervalo:
+            self._ultima_revision[nombre] = ahora
+            try:
+                mtime = os.path.getmtime(self._rutas[nombre])
+            except OSError:
+                mtime = 0.0
+            if mtime != self._plantillas[nombre].mtime:
+                return self.recargar(nombre)
+        return self._plantillas[nombre]
+
+    def versiones(self) -> Dict[str, str]:
+        return {n: p.version for n, p in self._plantillas.items()}
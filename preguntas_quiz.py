@@ -0,0 +1,171 @@
+"""
+Preguntas sugeridas y banco de preguntas de quiz (con su respuesta correcta).
+Las usan los endpoints de api.py y el benchmark de recuperación.
+"""
+
+# --- PREGUNTAS SUGERIDAS ---
+PREGUNTAS_SUGERIDAS = [
+    "¿Cuáles son las funciones del auxiliar de farmacia?",
+    "¿Qué es el Decreto 405?",
+    "¿Cómo se almacenan los medicamentos termolábiles?",
+    "¿Qué son los psicotrópicos?",
+    "¿Cuáles son las formas farmacéuticas más comunes?",
+    "¿Qué es la cadena de frío?",
+    "¿Cómo se debe atender al cliente en una farmacia?",
+    "¿Qué es el Decreto 79?",
+    "¿Qué son los medicamentos de venta libre?"
+]
+
+# --- PREGUNTAS DE QUIZ ---
+PREGUNTAS_QUIZ = [
+    {
+        "pregunta": "¿Cuál es la función principal del auxiliar de farmacia?",
+        "opciones": [
+            "Vender medicamentos sin receta",
+            "Asistir al farmacéutico en la dispensación y venta de medicamentos",
+            "Recetar medicamentos",
+            "Realizar diagnósticos médicos"
+        ],
+        "correcta": "Asistir al farmacéutico en la dispensación y venta de medicamentos"
+    },
+    {
+        "pregunta": "¿Qué establece el Decreto 405?",
+        "opciones": [
+            "Reglamento de farmacias",
+            "Control de psicotrópicos y estupefacientes",
+            "Venta de medicamentos",
+            "Almacenamiento de productos"
+        ],
+        "correcta": "Control de psicotrópicos y estupefacientes"
+    },
+    {
+        "pregunta": "¿A qué temperatura se deben almacenar los medicamentos termolábiles?",
+        "opciones": [
+            "Entre 2°C y 8°C",
+            "A temperatura ambiente",
+            "En congelador",
+            "Al sol"
+        ],
+        "correcta": "Entre 2°C y 8°C"
+    },
+    {
+        "pregunta": "¿Qué son los medicamentos de venta libre?",
+        "opciones": [
+            "Medicamentos que requieren receta médica",
+            "Medicamentos que se pueden vender sin receta",
+            "Medicamentos controlados",
+            "Medicamentos psicotrópicos"
+        ],
+        "correcta": "Medicamentos que se pueden vender sin receta"
+    },
+    {
+        "pregunta": "¿Qué documento regula la dispensación de psicotrópicos en Chile?",
+        "opciones": [
+            "Decreto 405",
+            "Decreto 79",
+            "Decreto 466",
+            "Ley 20.000"
+        ],
+        "correcta": "Decreto 405"
+    },
+    {
+        "pregunta": "¿Cuál es la temperatura recomendada para la cadena de frío?",
+        "opciones": [
+            "Entre 2°C y 8°C",
+            "Entre 15°C y 25°C",
+            "Menos de 0°C",
+            "Más de 30°C"
+        ],
+        "correcta": "Entre 2°C y 8°C"
+    },
+    {
+        "pregunta": "¿Qué debe hacer el auxiliar si un cliente presenta una receta ilegible?",
+        "opciones": [
+            "Interpretarla como pueda",
+            "Consultar al farmacéutico o al médico que la emitió",
+            "Entregar cualquier medicamento",
+            "No entregar nada y guardar la receta"
+        ],
+        "correcta": "Consultar al farmacéutico o al médico que la emitió"
+    },
+    {
+        "pregunta": "¿Cuál de las siguientes es una forma farmacéutica sólida?",
+        "opciones": [
+            "Jarabe",
+            "Comprimido",
+            "Solución",
+            "Suspensión"
+        ],
+        "correcta": "Comprimido"
+    },
+    {
+        "pregunta": "¿Qué es la farmacovigilancia?",
+        "opciones": [
+            "El estudio de la cadena de frío",
+            "La vigilancia de los efectos adversos de los medicamentos",
+            "El control de inventario en farmacia",
+            "La venta de medicamentos sin receta"
+        ],
+        "correcta": "La vigilancia de los efectos adversos de los medicamentos"
+    },
+    {
+        "pregunta": "¿Qué valor es fundamental en la ética profesional del auxiliar de farmacia?",
+        "opciones": [
+            "La confidencialidad",
+            "La rapidez",
+            "La simpatía",
+            "La creatividad"
+        ],
+        "correcta": "La confidencialidad"
+    },
+    {
+        "pregunta": "¿Qué debe hacer el auxiliar si detecta un medicamento vencido en el stock?",
+        "opciones": [
+            "Venderlo rápidamente",
+            "Retirarlo del stock y notificar al responsable",
+            "Mezclarlo con otros medicamentos",
+            "Ignorarlo"
+        ],
+        "correcta": "Retirarlo del stock y notificar al responsable"
+    },
+    {
+        "pregunta": "¿Cuál es el objetivo principal de la cadena de frío en farmacia?",
+        "opciones": [
+            "Evitar robos",
+            "Mantener la potencia y seguridad de los medicamentos termolábiles",
+            "Reducir costos",
+            "Aumentar la venta"
+        ],
+        "correcta": "Mantener la potencia y seguridad de los medicamentos termolábiles"
+    },
+    {
+        "pregunta": "¿Qué significa ATC en el contexto farmacéutico?",
+        "opciones": [
+            "Análisis Técnico de Cadena",
+            "Clasificación Anatómica, Terapéutica y Química",
+            "Atención Total al Cliente",
+            "Almacenamiento Técnico de Cadena"
+        ],
+        "correcta": "Clasificación Anatómica, Terapéutica y Química"
+    },
+    {
+        "pregunta": "¿Qué debe hacer el auxiliar si un cliente solicita información sobre un medicamento que no conoce?",
+        "opciones": [
+            "Inventar una respuesta",
+            "Consultar fuentes oficiales o al farmacéutico",
+            "Decir que no sabe y no ayudar",
+            "Vender el medicamento igual"
+        ],
+        "correcta": "Consultar fuentes oficiales o al farmacéutico"
+    },
+    {
+        "pregunta": "¿Cuál es la principal función del Decreto 79?",
+        "opciones": [
+            "Regular la venta de psicotrópicos",
+            "Normar los recetarios farmacéuticos",
+            "Controlar la temperatura de almacenamiento",
+            "Definir la ética profesional"
+        ],
+        "correcta": "Normar los recetarios farmacéuticos"
+    }
+]
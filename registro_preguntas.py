@@ -0,0 +1,99 @@
+"""
+Registro de preguntas en la base de datos con escritura diferida.
+/preguntar solo encola la fila (sin tocar la base de datos); un hilo en
+segundo plano las inserta por lotes con bulk_insert_mappings cuando se junta
+un lote o pasa el intervalo, lo que ocurra primero.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from models import Pregunta
+
+
+class RegistroPreguntas:
+    """Cola de escritura diferida hacia la tabla 'preguntas'."""
+
+    def __init__(self, session_factory: Callable[[], Any], tamano_lote: int = 50,
+                 intervalo: float = 2.0, max_cola: int = 10000):
+        self.session_factory = session_factory
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self._cola: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_cola)
+        self._hilo: Optional[threading.Thread] = None
+        self.estadisticas = {"encoladas": 0, "escritas": 0, "lotes": 0, "descartadas": 0, "errores": 0,
+                             "rechazadas": 0}
+
+    def iniciar(self) -> None:
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._bucle, name="registro-preguntas", daemon=True)
+            self._hilo.start()
+
+    def registrar(self, **fila: Any) -> None:
+        """Encola una fila de Pregunta sin bloquear; si la cola está llena se descarta."""
+        try:
+            self._cola.put_nowait(fila)
+            self.estadisticas["encoladas"] += 1
+        except queue.Full:
+            self.estadisticas["descartadas"] += 1
+
+    def detener(self, timeout: float = 10.0) -> None:
+        """Escribe lo pendiente y termina el hilo."""
+        if self._hilo is not None and self._hilo.is_alive():
+            self._cola.put(None)
+            self._hilo.join(timeout)
+
+    def _bucle(self) -> None:
+        lote: List[Dict[str, Any]] = []
+        limite = None
+        while True:
+            espera = self.intervalo if limite is None else max(0.0, limite - time.monotonic())
+            try:
+                fila = self._cola.get(timeout=espera)
+            except queue.Empty:
+                fila = False
+            if fila is None:
+                self._escribir(lote)
+                return
+            if fila:
+                if not lote:
+                    limite = time.monotonic() + self.intervalo
+                lote.append(fila)
+            if lote and (len(lote) >= self.tamano_lote or time.monotonic() >= limite):
+                self._escribir(lote)
+                lote, limite = [], None
+
+    def _escribir(self, lote: List[Dict[str, Any]]) -> None:
+        if not lote:
+            return
+        db = self.session_factory()
+        try:
+            db.bulk_insert_mappings(Pregunta, lote)
+            db.commit()
+            self.estadisticas["escritas"] += len(lote)
+            self.estadisticas["lotes"] += 1
+        except Exception as e:
+            db.rollback()
+            self.estadisticas["errores"] += 1
+            print(f"⚠️ Falló el lote de {len(lote)} preguntas ({getattr(e, 'orig', None) or e}), "
+                  "se reintenta fila por fila")
+            self._escribir_por_fila(db, lote)
+        finally:
+            db.close()
+
+    def _escribir_por_fila(self, db: Any, lote: List[Dict[str, Any]]) -> None:
+        """Inserta una por una para aislar las filas inválidas (p. ej. estudiante_id o sesion_id
+        inexistentes en Postgres); las rechazadas se informan y el resto se guarda."""
+        for fila in lote:
+            try:
+                db.bulk_insert_mappings(Pregunta, [fila])
+                db.commit()
+                self.estadisticas["escritas"] += 1
+            except Exception as e:
+                db.rollback()
+                self.estadisticas["rechazadas"] += 1
+                print(f"⚠️ Pregunta rechazada (estudiante_id={fila.get('estudiante_id')}, "
+                      f"sesion_id={fila.get('sesion_id')}): {getattr(e, 'orig', None) or e}")
+        self.estadisticas["lotes"] += 1
@@ -0,0 +1,233 @@
+"""
+Consultas de analytics resueltas con agregados SQL.
+Las sumas, conteos y promedios se calculan en la base de datos (apoyadas en
+los índices compuestos por estudiante) en vez de cargar todas las filas como
+objetos ORM y recorrerlas en Python.
+
+Es la única capa de acceso a las tablas de analytics: la usan la API y el
+panel de administración (app.py), así ambos leen las mismas tablas de
+models.py. La actividad reciente se lee con ORDER BY fecha DESC LIMIT sobre
+las columnas 'fecha' indexadas (recorrido del índice, sin ordenar la tabla).
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.orm import Session
+
+from agregados_diarios import UN_DIA, dia_pendiente, inicio_dia, totales_dia
+from models import (AnalyticsDiario, AnalyticsDiarioCategoria, Estudiante, Sesion, Pregunta, ResultadoQuiz,
+                    crear_tablas_e_indices)
+
+
+def analytics_estudiante(db: Session, estudiante_id: int) -> Optional[Dict[str, Any]]:
+    """Datos del estudiante y sus estadísticas en una consulta, más el top 5 de categorías.
+    Devuelve None si el estudiante no existe.
+    """
+    total_sesiones = select(func.count(Sesion.id)).where(Sesion.estudiante_id == estudiante_id).scalar_subquery()
+    tiempo_total = select(func.coalesce(func.sum(Sesion.duracion_minutos), 0)).where(
+        Sesion.estudiante_id == estudiante_id).scalar_subquery()
+    total_preguntas = select(func.count(Pregunta.id)).where(Pregunta.estudiante_id == estudiante_id).scalar_subquery()
+    categorias_distintas = select(func.count(func.distinct(Pregunta.categoria))).where(
+        Pregunta.estudiante_id == estudiante_id).scalar_subquery()
+    promedio_quiz = select(func.coalesce(func.avg(ResultadoQuiz.puntaje), 0)).where(
+        ResultadoQuiz.estudiante_id == estudiante_id).scalar_subquery()
+
+    fila = db.execute(
+        select(
+            Estudiante.id, Estudiante.nombre, Estudiante.email, Estudiante.grupo,
+            total_sesiones, tiempo_total, total_preguntas, categorias_distintas, promedio_quiz
+        ).where(Estudiante.id == estudiante_id)
+    ).first()
+    if fila is None:
+        return None
+
+    categorias = db.execute(
+        select(Pregunta.categoria, func.count(Pregunta.id).label("consultas"))
+        .where(Pregunta.estudiante_id == estudiante_id, Pregunta.categoria.isnot(None))
+        .group_by(Pregunta.categoria)
+        .order_by(func.count(Pregunta.id).desc())
+        .limit(5)
+    ).all()
+
+    return {
+        "estudiante": {
+            "id": fila[0],
+            "nombre": fila[1],
+            "email": fila[2],
+            "grupo": fila[3]
+        },
+        "estadisticas": {
+            "total_sesiones": fila[4],
+            "tiempo_total_minutos": int(fila[5] or 0),
+            "total_preguntas": fila[6],
+            "promedio_quiz": round(float(fila[8] or 0), 2),
+            "categorias_consultadas": fila[7]
+        },
+        "categorias_mas_consultadas": [
+            {"categoria": cat, "consultas": count} for cat, count in categorias
+        ]
+    }
+
+
+def dashboard_general(db: Session) -> Dict[str, Any]:
+    """Métricas generales a partir de los agregados diarios más el delta de hoy (UTC).
+    Solo lee: los días cerrados que todavía no se plegaron se suman en crudo con una
+    consulta por rango (el plegado lo hace el job periódico, no esta petición).
+    """
+    hoy = inicio_dia(datetime.utcnow())
+    pendiente = dia_pendiente(db)
+    corte = min(pendiente, hoy) if pendiente is not None else hoy
+    delta = totales_dia(db, hoy, hoy + UN_DIA)
+    sin_plegar = [delta]
+    if corte < hoy:
+        sin_plegar.append(totales_dia(db, corte, hoy))
+
+    historico = db.execute(select(
+        func.coalesce(func.sum(AnalyticsDiario.total_preguntas), 0),
+        func.coalesce(func.sum(AnalyticsDiario.total_quiz), 0),
+        func.coalesce(func.sum(AnalyticsDiario.promedio_puntaje_quiz * AnalyticsDiario.total_quiz), 0)
+    ).where(AnalyticsDiario.fecha < corte)).one()
+    total_estudiantes = db.execute(select(func.count(Estudiante.id))).scalar()
+
+    total_preguntas = int(historico[0]) + sum(t["total_preguntas"] for t in sin_plegar)
+    total_quiz = historico[1] + sum(t["total_quiz"] for t in sin_plegar)
+    suma_puntajes = float(historico[2]) + sum(t["promedio_quiz"] * t["total_quiz"] for t in sin_plegar)
+    promedio_quiz = suma_puntajes / total_quiz if total_quiz else 0
+
+    categorias = dict(db.execute(
+        select(AnalyticsDiarioCategoria.categoria, func.sum(AnalyticsDiarioCategoria.total))
+        .where(AnalyticsDiarioCategoria.fecha < corte)
+        .group_by(AnalyticsDiarioCategoria.categoria)
+    ).all())
+    for totales in sin_plegar:
+        for cat, total in totales["categorias"].items():
+            categorias[cat] = categorias.get(cat, 0) + total
+    categorias_populares = [
+        {"categoria": cat, "total": int(total)}
+        for cat, total in sorted(categorias.items(), key=lambda x: x[1], reverse=True)
+    ]
+
+    return {
+        "metricas_generales": {
+            "total_estudiantes": total_estudiantes,
+            "sesiones_hoy": delta["total_sesiones"],
+            "total_preguntas": total_preguntas,
+            "promedio_quiz_general": round(float(promedio_quiz), 2)
+        },
+        "categorias_populares": categorias_populares[:5]
+    }
+
+
+def estadisticas_generales(db: Session) -> Dict[str, Any]:
+    """Totales del panel de administración y la última actividad (MAX sobre columnas indexadas)."""
+    fila = db.execute(select(
+        select(func.count(Sesion.id)).scalar_subquery(),
+        select(func.count(Pregunta.id)).scalar_subquery(),
+        select(func.count(ResultadoQuiz.id)).scalar_subquery(),
+        select(func.max(Pregunta.fecha)).scalar_subquery(),
+        select(func.max(ResultadoQuiz.fecha)).scalar_subquery()
+    )).one()
+    actividad = [f for f in fila[3:] if f is not None]
+    return {
+        "sesiones": fila[0],
+        "preguntas": fila[1],
+        "resultados_quiz": fila[2],
+        "ultima_actividad": max(actividad) if actividad else None
+    }
+
+
+def preguntas_recientes(db: Session, limite: int = 10) -> List[Dict[str, Any]]:
+    filas = db.execute(
+        select(Pregunta.pregunta, Pregunta.respuesta, Pregunta.categoria, Pregunta.fecha)
+        .order_by(Pregunta.fecha.desc())
+        .limit(limite)
+    ).all()
+    return [dict(f._mapping) for f in filas]
+
+
+def resultados_quiz_recientes(db: Session, limite: int = 10) -> List[Dict[str, Any]]:
+    filas = db.execute(
+        select(ResultadoQuiz.puntaje, ResultadoQuiz.preguntas_correctas, ResultadoQuiz.total_preguntas,
+               ResultadoQuiz.tiempo_completado_minutos, ResultadoQuiz.fecha)
+        .order_by(ResultadoQuiz.fecha.desc())
+        .limit(limite)
+    ).all()
+    return [dict(f._mapping) for f in filas]
+
+
+def _fecha(valor: Any) -> Optional[datetime]:
+    """Las tablas antiguas guardaban TIMESTAMP como texto ISO."""
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    try:
+        return datetime.fromisoformat(str(valor))
+    except ValueError:
+        return None
+
+
+# Tablas que creaba antes app.py con SQL propio; la API nunca escribió en ellas
+TABLAS_ANTIGUAS = ("sessions", "questions", "quiz_results")
+
+
+def migrar_tablas_antiguas(engine) -> Dict[str, int]:
+    """Copia las filas de sessions/questions/quiz_results a sesiones/preguntas/resultados_quiz
+    y renombra las tablas antiguas con el sufijo '_migrada' para no volver a copiarlas.
+    """
+    existentes = set(inspect(engine).get_table_names())
+    if not existentes.intersection(TABLAS_ANTIGUAS):
+        return {}
+
+    copiadas = {}
+    with engine.begin() as conn:
+        sesiones_por_codigo = {}
+        if "sessions" in existentes:
+            for codigo, inicio, fin in conn.execute(text("SELECT session_id, start_time, end_time FROM sessions")).all():
+                duracion = 0
+                if inicio and fin:
+                    duracion = int((_fecha(fin) - _fecha(inicio)).total_seconds() / 60)
+                nuevo_id = conn.execute(
+                    Sesion.__table__.insert().values(fecha_inicio=_fecha(inicio), fecha_fin=_fecha(fin),
+                                                     duracion_minutos=duracion)
+                ).inserted_primary_key[0]
+                sesiones_por_codigo[codigo] = nuevo_id
+            copiadas["sesiones"] = len(sesiones_por_codigo)
+
+        if "questions" in existentes:
+            filas = [{
+                "sesion_id": sesiones_por_codigo.get(codigo),
+                "pregunta": pregunta or "",
+                "respuesta": respuesta,
+                "fecha": _fecha(momento),
+                "tiempo_respuesta_ms": int(tiempo * 1000) if tiempo is not None else None
+            } for codigo, pregunta, respuesta, momento, tiempo in conn.execute(text(
+                "SELECT session_id, question, response, timestamp, response_time FROM questions")).all()]
+            if filas:
+                conn.execute(Pregunta.__table__.insert(), filas)
+            copiadas["preguntas"] = len(filas)
+
+        if "quiz_results" in existentes:
+            filas = [{
+                "puntaje": puntaje,
+                "total_preguntas": total,
+                "tiempo_completado_minutos": int(tiempo) if tiempo is not None else None,
+                "fecha": _fecha(momento)
+            } for puntaje, total, tiempo, momento in conn.execute(text(
+                "SELECT score, total_questions, completion_time, timestamp FROM quiz_results")).all()]
+            if filas:
+                conn.execute(ResultadoQuiz.__table__.insert(), filas)
+            copiadas["resultados_quiz"] = len(filas)
+
+        for tabla in TABLAS_ANTIGUAS:
+            if tabla in existentes:
+                conn.execute(text(f"ALTER TABLE {tabla} RENAME TO {tabla}_migrada"))
+    print(f"🔀 Tablas antiguas migradas: {copiadas}")
+    return copiadas
+
+
+
+def preparar_base(engine) -> None:
+    """Esquema único de analytics: tablas, columnas e índices de models.py y migración de las tablas antiguas."""
+    crear_tablas_e_indices(engine)
+    migrar_tablas_antiguas(engine)
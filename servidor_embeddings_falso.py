@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita POST /v1/embeddings de OpenAI para probar la
+construcción del índice sin red ni costo.
+Los vectores son deterministas (bolsa de palabras con hashing), así que
+textos con palabras en común quedan cerca.
+
+Uso:
+    python servidor_embeddings_falso.py [--puerto 8001] [--tasa-429 0.2] [--tasa-500 0.05]
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=falsa uvicorn api:app
+"""
+
+import argparse
+import base64
+import hashlib
+import random
+import re
+from typing import List, Union
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+DIMENSION = 256
+
+app = FastAPI()
+config = {"tasa_429": 0.0, "tasa_500": 0.0}
+contadores = {"solicitudes": 0, "textos": 0, "errores_429": 0, "errores_500": 0}
+
+
+def vector_determinista(texto: str, dimension: int = DIMENSION) -> np.ndarray:
+    """Vector normalizado a partir de las palabras del texto (hashing trick)."""
+    vec = np.zeros(dimension, dtype="float32")
+    for palabra in re.findall(r"\w+", texto.lower()):
+        h = int.from_bytes(hashlib.md5(palabra.encode("utf-8")).digest()[:8], "little")
+        vec[h % dimension] += 1.0 if (h >> 63) == 0 else -1.0
+    norma = np.linalg.norm(vec)
+    if norma == 0:
+        vec[0] = 1.0
+        return vec
+    return vec / norma
+
+
+class EmbeddingsRequest(BaseModel):
+    model: str
+    input: Union[str, List[str]]
+    encoding_format: str = "float"
+
+
+@app.post("/v1/embeddings")
+def embeddings(req: EmbeddingsRequest):
+    contadores["solicitudes"] += 1
+    if random.random() < config["tasa_429"]:
+        contadores["errores_429"] += 1
+        return JSONResponse(status_code=429, headers={"retry-after": "0.1"},
+                            content={"error": {"message": "Rate limit (simulado)", "type": "rate_limit_error"}})
+    if random.random() < config["tasa_500"]:
+        contadores["errores_500"] += 1
+        return JSONResponse(status_code=500, content={"error": {"message": "Error interno (simulado)", "type": "server_error"}})
+
+    textos = [req.input] if isinstance(req.input, str) else req.input
+    contadores["textos"] += len(textos)
+    datos = []
+    for i, texto in enumerate(textos):
+        vec = vector_determinista(texto)
+        if req.encoding_format == "base64":
+            embedding = base64.b64encode(vec.astype("<f4").tobytes()).decode("ascii")
+        else:
+            embedding = vec.tolist()
+        datos.append({"object": "embedding", "index": i, "embedding": embedding})
+    tokens = sum(len(t.split()) for t in textos)
+    return {
+        "object": "list",
+        "data": datos,
+        "model": req.model,
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    }
+
+
+@app.get("/contadores")
+def obtener_contadores():
+    return contadores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor falso de embeddings")
+    parser.add_argument("--puerto", type=int, default=8001)
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--tasa-500", type=float, default=0.0)
+    args = parser.parse_args()
+    config["tasa_429"] = args.tasa_429
+    config["tasa_500"] = args.tasa_500
+    uvicorn.run(app, host="127.0.0.1", port=args.puerto)
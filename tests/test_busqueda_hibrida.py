@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+# embedding_utils abre el caché de consultas en INDEX_DIR al importarse
+os.environ.setdefault("INDEX_DIR", tempfile.mkdtemp())
+
+import embedding_utils  # noqa: E402
+from embedding_utils import buscar_con_umbrales, estadisticas_embeddings  # noqa: E402
+
+TEXTOS = [
+    {"texto": "Decreto 405 sobre almacenamiento de medicamentos", "archivo": "normas.pdf", "pagina": 1},
+    {"texto": "Cadena de frío para vacunas entre 2 y 8 grados", "archivo": "frio.pdf", "pagina": 2},
+    {"texto": "Registro de temperaturas del refrigerador", "archivo": "frio.pdf", "pagina": 3},
+]
+
+
+@pytest.fixture
+def indice(monkeypatch):
+    monkeypatch.setattr(embedding_utils, "BUSQUEDA_HIBRIDA", True)
+    monkeypatch.setattr(embedding_utils, "BUSQUEDA_BM25_MIN", 0.2)
+    embedding_utils.indice_lexico(TEXTOS)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(4))
+    index.add_with_ids(np.eye(3, 4, dtype="float32"), np.arange(3, dtype="int64"))
+    return index
+
+
+def consulta():
+    # Similitud 0.6 con el chunk del decreto y 0.8 con el de cadena de frío
+    return np.array([[0.6, 0.8, 0.0, 0.0]], dtype="float32")
+
+
+def test_umbral_alto_sin_resultados(indice):
+    resultados, umbral = buscar_con_umbrales("dosis pediátrica", indice, TEXTOS, k=3, umbrales=(0.99,), vector=consulta())
+    assert resultados == []
+    assert umbral is None
+
+
+def test_bm25_debil_no_salta_el_umbral(indice):
+    resultados, umbral = buscar_con_umbrales("cadena dosis pediátrica ajuste", indice, TEXTOS, k=3,
+                                             umbrales=(0.99,), vector=consulta())
+    assert resultados == []
+    assert umbral is None
+
+
+def test_coincidencia_exacta_se_conserva_con_umbral_alto(indice):
+    resultados, umbral = buscar_con_umbrales("Decreto 405", indice, TEXTOS, k=3, umbrales=(0.99,), vector=consulta())
+    assert umbral == 0.99
+    assert [r["id"] for r in resultados] == [0]
+    assert resultados[0]["bm25"] > 0
+    assert resultados[0]["similitud"] == pytest.approx(0.6)
+
+
+def test_umbral_secundario(indice):
+    antes = estadisticas_embeddings["llamadas_ahorradas"]
+    resultados, umbral = buscar_con_umbrales("dosis pediátrica", indice, TEXTOS, k=3, umbrales=(0.99, 0.7), vector=consulta())
+    assert umbral == 0.7
+    assert [r["id"] for r in resultados] == [1]
+    assert estadisticas_embeddings["llamadas_ahorradas"] == antes + 1
+
+
+def test_fusion_ordenada_por_rrf(indice):
+    resultados, _ = buscar_con_umbrales("Decreto 405", indice, TEXTOS, k=3, umbrales=(0.5,), vector=consulta())
+    # El decreto está en ambas listas y supera al de cadena de frío, que solo trae FAISS
+    assert [r["id"] for r in resultados] == [0, 1]
+    assert resultados[0]["rrf"] > resultados[1]["rrf"]
+
+
+def test_modo_vectorial_por_llamada(indice):
+    resultados, _ = buscar_con_umbrales("Decreto 405", indice, TEXTOS, k=3, umbrales=(0.5,), vector=consulta(),
+                                        hibrida=False)
+    assert [r["id"] for r in resultados] == [1, 0]
+    assert all("bm25" not in r for r in resultados)
+    assert embedding_utils.BUSQUEDA_HIBRIDA is True
+
+
+def test_bm25_en_segundo_plano(indice):
+    textos = list(TEXTOS)
+    resultados, _ = buscar_con_umbrales("Decreto 405", indice, textos, k=3, umbrales=(0.99,), vector=consulta())
+    # Mientras el BM25 de estos textos se arma, la consulta usa solo FAISS
+    assert resultados == []
+    limite = time.monotonic() + 5
+    while embedding_utils.indice_lexico(textos, esperar=False) is None and time.monotonic() < limite:
+        time.sleep(0.01)
+    resultados, _ = buscar_con_umbrales("Decreto 405", indice, textos, k=3, umbrales=(0.99,), vector=consulta())
+    assert [r["id"] for r in resultados] == [0]
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+from carga_indice import ERROR, CargaIndice
+
+
+def carga_bloqueada():
+    liberar = threading.Event()
+
+    def cargar():
+        liberar.wait(5)
+        if getattr(cargar, "falla", False):
+            raise RuntimeError("sin material")
+        return "indice"
+
+    return CargaIndice(cargar), liberar, cargar
+
+
+def test_esperas_sin_ocupar_hilos():
+    carga, liberar, _ = carga_bloqueada()
+
+    async def escenario():
+        carga.iniciar()
+        hilos = threading.active_count()
+        esperas = [asyncio.create_task(carga.esperar(5)) for _ in range(50)]
+        await asyncio.sleep(0.1)
+        assert threading.active_count() == hilos
+        assert not any(e.done() for e in esperas)
+        inicio = time.perf_counter()
+        liberar.set()
+        resultados = await asyncio.gather(*esperas)
+        return resultados, time.perf_counter() - inicio
+
+    resultados, demora = asyncio.run(escenario())
+    assert all(resultados)
+    assert demora < 1
+    assert carga._esperando == []
+
+
+def test_espera_vence_y_error_despierta():
+    carga, liberar, cargar = carga_bloqueada()
+    cargar.falla = True
+
+    async def escenario():
+        carga.iniciar()
+        vencida = await carga.esperar(0.05)
+        espera = asyncio.create_task(carga.esperar(5))
+        await asyncio.sleep(0.05)
+        inicio = time.perf_counter()
+        liberar.set()
+        return vencida, await espera, time.perf_counter() - inicio
+
+    vencida, lista, demora = asyncio.run(escenario())
+    assert vencida is False
+    assert lista is False
+    assert demora < 1
+    assert carga.estado == ERROR
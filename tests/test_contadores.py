@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from contadores import ContadoresMemoria, ContadoresSQLite, crear_contadores
+
+
+def test_memoria_suma_los_fragmentos_de_cada_hilo():
+    contadores = ContadoresMemoria(top_k=5)
+    preguntas = [("¿Qué es la cadena de frío?", "almacenamiento")] * 300 + [("¿Qué es un genérico?", "farmacologia")] * 100
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(lambda par: contadores.registrar(*par), preguntas))
+
+    reporte = contadores.reporte(limite=2)
+    assert reporte["preguntas_totales"] == 400
+    assert reporte["preguntas_frecuentes"] == [
+        {"pregunta": "¿Qué es la cadena de frío?", "frecuencia": 300, "categoria": "almacenamiento"},
+        {"pregunta": "¿Qué es un genérico?", "frecuencia": 100, "categoria": "farmacologia"},
+    ]
+    assert {c["categoria"]: c["total"] for c in reporte["categorias_populares"]} == {"almacenamiento": 300, "farmacologia": 100}
+
+
+def test_backend_por_defecto_segun_workers(monkeypatch, tmp_path):
+    ruta = str(tmp_path / "contadores.sqlite")
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert isinstance(crear_contadores(ruta=ruta), ContadoresMemoria)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert isinstance(crear_contadores(ruta=ruta), ContadoresSQLite)
+    assert isinstance(crear_contadores("memoria", ruta=ruta), ContadoresMemoria)
@@ -0,0 +1,89 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from agregados_diarios import actualizar_agregados
+from esquemas import QuizResultLoteRequest, SesionLoteRequest
+from ingesta_masiva import ingerir, insertar_resultados_quiz, insertar_sesiones
+from models import AnalyticsDiario, Base, Estudiante, ResultadoQuiz, Sesion
+
+
+@pytest.fixture
+def entorno():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        db.add(Estudiante(nombre="Ana", email="ana@ejemplo.cl", grupo="A"))
+        db.commit()
+
+    app = FastAPI()
+
+    @app.post("/quiz")
+    async def quiz(request: Request):
+        return await ingerir(request, QuizResultLoteRequest, insertar_resultados_quiz, SessionLocal)
+
+    @app.post("/sesiones")
+    async def sesiones(request: Request):
+        return await ingerir(request, SesionLoteRequest, insertar_sesiones, SessionLocal)
+
+    return TestClient(app), SessionLocal
+
+
+def quiz(fecha):
+    return {"estudiante_id": 1, "puntaje": 80, "preguntas_correctas": 8, "total_preguntas": 10,
+            "tiempo_completado_minutos": 5, "fecha": fecha}
+
+
+def test_quiz_con_fecha_z_se_guarda_en_utc_sin_zona(entorno):
+    cliente, SessionLocal = entorno
+    respuesta = cliente.post("/quiz", json=[quiz("2025-01-01T10:00:00Z"), quiz("2025-01-01T10:00:00-03:00")])
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["insertadas"] == 2
+    with SessionLocal() as db:
+        fechas = sorted(db.scalars(select(ResultadoQuiz.fecha)))
+    assert fechas == [datetime(2025, 1, 1, 10), datetime(2025, 1, 1, 13)]
+
+
+def test_sesion_con_solo_fecha_fin_con_zona(entorno):
+    cliente, SessionLocal = entorno
+    fin = (datetime.utcnow() + timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    respuesta = cliente.post("/sesiones", json=[{"estudiante_id": 1, "fecha_fin": fin}])
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["insertadas"] == 1
+    with SessionLocal() as db:
+        sesion = db.scalars(select(Sesion)).one()
+    assert sesion.fecha_fin.tzinfo is None
+    assert 29 <= sesion.duracion_minutos <= 30
+
+
+def test_fila_atrasada_solo_repliega_su_dia(entorno):
+    cliente, SessionLocal = entorno
+    hace_diez = datetime.utcnow() - timedelta(days=10)
+    with SessionLocal() as db:
+        db.add(ResultadoQuiz(estudiante_id=1, puntaje=50, preguntas_correctas=5, total_preguntas=10,
+                             tiempo_completado_minutos=5, fecha=hace_diez))
+        db.commit()
+        actualizar_agregados(db)
+
+    respuesta = cliente.post("/quiz", json=[quiz(hace_diez.strftime("%Y-%m-%dT%H:%M:%SZ"))])
+
+    assert respuesta.json()["dias_a_replegar"] == 1
+    # El repliegue corre en segundo plano después de responder
+    limite = time.monotonic() + 5
+    while True:
+        with SessionLocal() as db:
+            dias = db.scalars(select(AnalyticsDiario).order_by(AnalyticsDiario.fecha)).all()
+        if dias[0].total_quiz == 2 or time.monotonic() > limite:
+            break
+        time.sleep(0.05)
+    assert dias[0].total_quiz == 2
+    assert len(dias) == 10
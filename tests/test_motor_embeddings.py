@@ -0,0 +1,102 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+import uvicorn
+from openai import RateLimitError
+
+import servidor_embeddings_falso as servidor
+from motor_embeddings import MotorEmbeddings
+from servidor_embeddings_falso import vector_determinista
+
+TEXTOS = [f"chunk {i} sobre cadena de frío y almacenamiento de vacunas" for i in range(12)]
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(servidor.app, host="127.0.0.1", port=puerto, log_level="error"))
+    hilo = threading.Thread(target=server.run, daemon=True)
+    hilo.start()
+    limite = time.monotonic() + 10
+    while not server.started and time.monotonic() < limite:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{puerto}/v1"
+    server.should_exit = True
+    hilo.join(timeout=5)
+
+
+@pytest.fixture(autouse=True)
+def servidor_limpio(monkeypatch):
+    for clave in servidor.contadores:
+        monkeypatch.setitem(servidor.contadores, clave, 0)
+    monkeypatch.setitem(servidor.config, "tasa_429", 0.0)
+    monkeypatch.setitem(servidor.config, "tasa_500", 0.0)
+
+
+class Azar:
+    """Sustituye a random en el servidor: 0 (error simulado) en las primeras 'fallas' consultas."""
+
+    def __init__(self, fallas):
+        self.fallas = fallas
+
+    def random(self):
+        if self.fallas:
+            self.fallas -= 1
+            return 0.0
+        return 1.0
+
+
+def test_lotes_por_tokens_en_orden(base_url):
+    motor = MotorEmbeddings("modelo-falso", api_key="falsa", base_url=base_url, concurrencia=3,
+                            max_tokens_lote=60, espera_base=0.01)
+    lotes = motor.armar_lotes(TEXTOS)
+    assert len(lotes) > 1
+    assert all(sum(motor._contar_tokens(t) for t in lote) <= 60 for lote in lotes if len(lote) > 1)
+
+    vectores = motor.embeber_sync(TEXTOS)
+
+    np.testing.assert_allclose(vectores, np.vstack([vector_determinista(t) for t in TEXTOS]), rtol=1e-6)
+    assert servidor.contadores["solicitudes"] == len(lotes)
+    assert servidor.contadores["textos"] == len(TEXTOS)
+    assert motor.estadisticas["lotes"] == len(lotes)
+
+
+def test_reintenta_429(base_url, monkeypatch):
+    monkeypatch.setattr(servidor, "random", Azar(2))
+    monkeypatch.setitem(servidor.config, "tasa_429", 0.5)
+    motor = MotorEmbeddings("modelo-falso", api_key="falsa", base_url=base_url, max_tokens_lote=10000,
+                            reintentos=3, espera_base=0.01)
+
+    vectores = motor.embeber_sync(TEXTOS[:3])
+
+    assert vectores.shape == (3, servidor.DIMENSION)
+    assert servidor.contadores["errores_429"] == 2
+    assert motor.estadisticas["reintentos"] == 2
+
+
+def test_agota_reintentos(base_url, monkeypatch):
+    monkeypatch.setattr(servidor, "random", Azar(100))
+    monkeypatch.setitem(servidor.config, "tasa_429", 0.5)
+    motor = MotorEmbeddings("modelo-falso", api_key="falsa", base_url=base_url, reintentos=2, espera_base=0.01)
+
+    with pytest.raises(RateLimitError):
+        motor.embeber_sync(TEXTOS[:1])
+    assert servidor.contadores["solicitudes"] == 3
+
+
+def test_continua_desde_checkpoint(base_url, tmp_path):
+    motor = MotorEmbeddings("modelo-falso", api_key="falsa", base_url=base_url, max_tokens_lote=60,
+                            dir_checkpoint=str(tmp_path))
+    primera = motor.embeber_sync(TEXTOS)
+    solicitudes = servidor.contadores["solicitudes"]
+
+    segunda = MotorEmbeddings("modelo-falso", api_key="falsa", base_url=base_url, max_tokens_lote=60,
+                              dir_checkpoint=str(tmp_path))
+    np.testing.assert_array_equal(segunda.embeber_sync(TEXTOS), primera)
+    assert servidor.contadores["solicitudes"] == solicitudes
+    assert segunda.estadisticas["lotes_desde_checkpoint"] == solicitudes
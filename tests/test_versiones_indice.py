@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+# embedding_utils abre el caché de consultas en INDEX_DIR al importarse
+os.environ.setdefault("INDEX_DIR", tempfile.mkdtemp())
+
+import embedding_utils  # noqa: E402
+from servidor_embeddings_falso import vector_determinista  # noqa: E402
+
+
+@pytest.fixture
+def directorios(monkeypatch, tmp_path):
+    material, store = tmp_path / "material", tmp_path / "index_store"
+    material.mkdir()
+    store.mkdir()
+    for nombre, valor in {
+        "MATERIAL_DIR": str(material),
+        "INDEX_DIR": str(store),
+        "INDEX_PATH": str(store / "indice.faiss"),
+        "METADATA_PATH": str(store / "textos.json"),
+        "METADATA_DB_PATH": str(store / "metadatos.sqlite"),
+        "MANIFEST_PATH": str(store / "manifiesto.json"),
+        "EXTRACCION_PROCESOS": 1,
+        "_indice_mapeado": None,
+        "_almacen_publicado": None,
+        "_embed_texts": lambda textos: np.vstack([vector_determinista(t) for t in textos]),
+    }.items():
+        monkeypatch.setattr(embedding_utils, nombre, valor)
+    return material, store
+
+
+def textos_de(metadatos):
+    return sorted(md["texto"] for md in metadatos if md is not None)
+
+
+def test_recarga_publica_version_nueva_sin_tocar_la_anterior(directorios):
+    material, store = directorios
+    (material / "frio.txt").write_text("Cadena de frío entre 2 y 8 grados", encoding="utf-8")
+    (material / "normas.txt").write_text("Decreto 405 sobre almacenamiento", encoding="utf-8")
+
+    indice, metadatos = embedding_utils.cargar_o_crear_indice([])
+    version = embedding_utils.rutas_publicadas()
+    assert all(os.path.exists(r) for r in version)
+    # Sin cambios en el material se reutiliza la misma versión
+    assert embedding_utils.cargar_o_crear_indice([])[1] is metadatos
+
+    (material / "normas.txt").unlink()
+    (material / "receta.txt").write_text("Receta médica retenida", encoding="utf-8")
+    nuevo_indice, nuevos = embedding_utils.cargar_o_crear_indice([])
+
+    assert nuevos is not metadatos
+    assert embedding_utils.rutas_publicadas() != version
+    assert not any(os.path.exists(r) for r in version)
+    assert sorted(os.listdir(store)) == sorted(["manifiesto.json", *map(os.path.basename, embedding_utils.rutas_publicadas())])
+    # Las consultas en curso siguen leyendo la versión anterior completa
+    assert textos_de(metadatos) == ["Cadena de frío entre 2 y 8 grados", "Decreto 405 sobre almacenamiento"]
+    assert textos_de(nuevos) == ["Cadena de frío entre 2 y 8 grados", "Receta médica retenida"]
+    assert indice.ntotal == nuevo_indice.ntotal == 2
+
+    # Cuando la última consulta suelta la versión anterior, su conexión se cierra
+    conexion = metadatos._conn
+    del metadatos
+    with pytest.raises(sqlite3.ProgrammingError):
+        conexion.execute("SELECT 1")